@@ -21,10 +21,47 @@ class Settings(BaseSettings):
     gaming_data_file: str = "gaming.json"
     config_data_file: str = "config.json"
 
+    # Storage settings
+    storage_backend: str = "json"  # "json" or "sqlite"
+    sqlite_db_file: str = "console.db"
+    # Data file format for the JSON backend: "json" (indented), "json-compact",
+    # "orjson" or "msgpack". Existing files are read in any format.
+    data_format: str = "json"
+
+    # Journal settings (JSON backend): append mutations to <file>.journal
+    journal_enabled: bool = False
+    journal_max_bytes: int = 1024 * 1024  # Compact once the journal is this large
+    journal_compact_interval: int = 300  # Seconds between compactions
+
+    io_workers: int = 4  # Threads running file I/O for the async DataManager API
+
+    # Group commit: coalesce async writes to the same file within this window
+    group_commit_window_ms: float = 0  # 0 disables group commit
+
     # Backup settings
     backup_enabled: bool = True
     backup_dir: Path = Path(__file__).parent.parent / "data" / "backups"
-    max_backups: int = 30
+    backup_compression: str = "gzip"  # "gzip" or "zstd" (requires zstandard)
+    # Retention tiers: the newest N snapshots, plus the newest snapshot of
+    # each of the last N hours / days / weeks
+    backup_keep_recent: int = 10
+    backup_keep_hourly: int = 24
+    backup_keep_daily: int = 7
+    backup_keep_weekly: int = 4
+
+    # Response compression (gzip; brotli / zstd when installed)
+    compression_min_bytes: int = 1024  # Smaller responses are sent uncompressed
+    compression_cache_bytes: int = 32 * 1024 * 1024  # Compressed bodies kept per ETag
+
+    # Bulk import
+    import_max_rows: int = 100000  # Larger uploads are rejected
+
+    # Change feed (/api/events)
+    events_buffer_size: int = 1000  # Recent events kept for reconnecting clients
+    events_keepalive_seconds: float = 15  # Comment line sent on idle streams
+
+    # Ad hoc finance queries (/api/finance/query)
+    finance_query_cache_size: int = 256  # Results kept per spec and data version
 
     class Config:
         env_file = ".env"
@@ -4,6 +4,12 @@ from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from app.config import settings
 from app.services.data_manager import data_manager
+from app.services.finance_columns import finance_columns
+from app.services.finance_query import query_cache
+from app.services.model_cache import model_cache
+from app.utils.compression import CompressionMiddleware, get_compression_stats
+from app.utils.etag import ETagMiddleware
+from app.utils.singleflight import get_singleflight_stats
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -19,8 +25,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# ETag / Cache-Control headers for conditional GETs (see app.utils.etag)
+app.add_middleware(ETagMiddleware)
+
+# Negotiated gzip/brotli/zstd compression; outermost so it sees the ETag
+app.add_middleware(CompressionMiddleware)
+
 
 @app.on_event("startup")
 async def startup_event():
@@ -68,6 +81,12 @@ async def startup_event():
     })
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush pending storage state (e.g. compact journals) on shutdown"""
+    data_manager.close()
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -84,14 +103,30 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/api/health/storage")
+async def storage_health():
+    """Storage layer metrics (document cache, group commit batches, backups, validation, compression, coalesced calls, columnar mirror, query cache)"""
+    return {
+        "cache": data_manager.get_cache_stats(),
+        "group_commit": data_manager.get_group_commit_stats(),
+        "backups": data_manager.backups.get_stats() if data_manager.backups else None,
+        "models": model_cache.get_stats(),
+        "compression": get_compression_stats(),
+        "singleflight": get_singleflight_stats(),
+        "columns": finance_columns.get_stats(),
+        "finance_query": query_cache.get_stats()
+    }
+
+
 # Import and include routers
-from app.routers import finance, travel, portfolio, ai_assistant, config, gaming
+from app.routers import finance, travel, portfolio, ai_assistant, config, gaming, events
 app.include_router(finance.router, prefix="/api/finance", tags=["finance"])
 app.include_router(travel.router, prefix="/api/travel", tags=["travel"])
 app.include_router(portfolio.router, prefix="/api/portfolio", tags=["portfolio"])
 app.include_router(ai_assistant.router, prefix="/api/ai", tags=["ai"])
 app.include_router(config.router, prefix="/api/config", tags=["config"])
 app.include_router(gaming.router, prefix="/api/gaming", tags=["gaming"])
+app.include_router(events.router, prefix="/api/events", tags=["events"])
 
 # Mount static files for gaming cache
 cache_dir = Path(__file__).parent.parent / "data" / "gaming_cache"
@@ -0,0 +1,40 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+
+class ImportRowError(BaseModel):
+    """Validation errors of one imported row"""
+    row: int  # 1-based position of the record in the upload
+    errors: List[str]
+
+
+class ImportResult(BaseModel):
+    """Outcome of a bulk import"""
+    imported: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+
+
+class BulkDelete(BaseModel):
+    """Records to delete in bulk"""
+    ids: List[str]
+
+
+class BulkUpdate(BaseModel):
+    """Patch applied to the records given by `ids` or matching `filter`.
+
+    A filter maps field names to a value or a list of values (equality, as
+    in the list endpoint's filters) or to {"from": ..., "to": ...} for an
+    inclusive range on a range field.
+    """
+    ids: Optional[List[str]] = None
+    filter: Optional[Dict[str, Any]] = None
+    patch: Dict[str, Any]
+
+
+class BulkResult(BaseModel):
+    """Outcome of a bulk update or delete"""
+    matched: int = 0
+    updated: int = 0
+    deleted: int = 0
+    not_found: List[str] = []
@@ -85,9 +85,71 @@ class Budget(BaseModel):
 
 class FinanceStatistics(BaseModel):
     """Finance statistics model"""
-    total_expenses: float = 0
-    total_income: float = 0
-    net_balance: float = 0
+    # Converted totals; None when exchange rates are unavailable (see rates_available)
+    total_expenses: Optional[float] = 0
+    total_income: Optional[float] = 0
+    net_balance: Optional[float] = 0
+    currency: str = "USD"  # Base currency of the totals
     expenses_by_category: dict = {}
+    by_currency: dict = {}  # Subtotals in each record currency, with the rate used
+    rates_available: bool = True  # False: only the by_currency subtotals are filled in
+    rates_as_of: Optional[str] = None  # When the rates used were fetched (None if nothing was converted)
     monthly_trend: dict = {}
     budget_status: dict = {}
+
+
+class TrendBucket(BaseModel):
+    """Expense and income totals of one period"""
+    period: str
+    expenses: float = 0
+    income: float = 0
+    net: float = 0
+    expense_count: int = 0
+    income_count: int = 0
+    expenses_by_category: dict = {}
+    expenses_by_currency: dict = {}
+    income_by_currency: dict = {}
+
+
+class FinanceTrends(BaseModel):
+    """Time series of expense and income totals"""
+    granularity: str
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    buckets: List[TrendBucket] = []
+
+
+class FinanceQuery(BaseModel):
+    """Declarative aggregation over expenses or income (POST /api/finance/query).
+
+    List filters match any of their values; `tag` matches records with any of
+    the tags. `group_by` takes day, week, month, year, category, merchant,
+    currency, tag (type and source for income); `measures` sum, count, avg,
+    min, max and percentiles such as p50, p95. `sort` names a group key or
+    measure, prefixed with "-" for descending order. Amount measures are never
+    computed across currencies: unless `measures` is only count, groups are
+    split by currency too (see FinanceQueryResult.group_by).
+    """
+    collection: str = "expenses"
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    category: List[str] = []
+    merchant: List[str] = []
+    tag: List[str] = []
+    currency: List[str] = []
+    type: List[str] = []
+    source: List[str] = []
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    group_by: List[str] = []
+    measures: List[str] = ["sum", "count"]
+    sort: Optional[str] = None
+    limit: Optional[int] = Field(None, ge=1)
+
+
+class FinanceQueryResult(BaseModel):
+    """Groups of a finance query, each with its group keys and measures"""
+    group_by: List[str]
+    measures: List[str]
+    groups: List[dict] = []
+    cached: bool = False
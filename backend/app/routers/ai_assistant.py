@@ -1,6 +1,6 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import StreamingResponse
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 import uuid
 import json
@@ -16,11 +16,15 @@ from app.models.finance import Expense, Income
 from app.models.travel import Flight
 from app.models.portfolio import Investment
 from app.services.llm_service import llm_service
-from app.services.data_manager import data_manager
+from app.services.data_manager import data_manager, Transaction
+from app.services.model_cache import model_cache
+from app.services.export_service import export_collection
 from app.services.finance_service import finance_service
 from app.services.travel_service import travel_service
 from app.services.portfolio_service import portfolio_service
 from app.config import settings
+from app.utils.export import stream_export
+from app.utils.pages import json_page
 
 router = APIRouter()
 
@@ -30,7 +34,7 @@ async def chat(request: ChatRequest):
     """发送聊天消息"""
     try:
         # 获取当前激活的配置
-        config_data = data_manager.read_data(settings.config_data_file)
+        config_data = await data_manager.aread(settings.config_data_file)
         configs = config_data.get("llm_configs", [])
 
         # 找到默认配置
@@ -71,10 +75,10 @@ async def chat(request: ChatRequest):
                 print(f"[DEBUG] Data: {data}")
 
                 if data_type == "expense":
-                    finance_service.create_expense(Expense(**data))
+                    await finance_service.create_expense(Expense(**data))
                     submission_result = {"success": True, "message": "Expense added successfully!"}
                 elif data_type == "income":
-                    finance_service.create_income(Income(**data))
+                    await finance_service.create_income(Income(**data))
                     submission_result = {"success": True, "message": "Income added successfully!"}
                 elif data_type == "flight":
                     # 字段名映射：兼容旧字段名，处理None值
@@ -88,10 +92,10 @@ async def chat(request: ChatRequest):
                         "travel_class": data.get("travel_class") or data.get("class") or "economy"
                     }
                     print(f"[DEBUG] Mapped flight data: {flight_data}")
-                    travel_service.create_flight(Flight(**flight_data))
+                    await travel_service.create_flight(Flight(**flight_data))
                     submission_result = {"success": True, "message": "Flight added successfully!"}
                 elif data_type == "investment":
-                    portfolio_service.create_investment(Investment(**data))
+                    await portfolio_service.create_investment(Investment(**data))
                     submission_result = {"success": True, "message": "Investment added successfully!"}
                 else:
                     submission_result = {"success": False, "message": f"Unknown data type: {data_type}"}
@@ -116,7 +120,7 @@ async def chat(request: ChatRequest):
 @router.post("/chat/stream")
 async def chat_stream(request: ChatRequest):
     """流式发送聊天消息"""
-    config_data = data_manager.read_data(settings.config_data_file)
+    config_data = await data_manager.aread(settings.config_data_file)
     configs = config_data.get("llm_configs", [])
 
     active_config = None
@@ -185,10 +189,10 @@ async def submit_data(request: dict):
                 "date": data.get("date") or "",
                 "notes": data.get("notes"),
             }
-            finance_service.create_expense(Expense(**expense_data))
+            await finance_service.create_expense(Expense(**expense_data))
             return {"success": True, "message": "支出已记录"}
         elif data_type == "income":
-            finance_service.create_income(Income(**data))
+            await finance_service.create_income(Income(**data))
             return {"success": True, "message": "收入已记录"}
         elif data_type == "flight":
             flight_data = {
@@ -200,10 +204,10 @@ async def submit_data(request: dict):
                 "cost": data.get("cost"),
                 "travel_class": data.get("travel_class") or "economy"
             }
-            travel_service.create_flight(Flight(**flight_data))
+            await travel_service.create_flight(Flight(**flight_data))
             return {"success": True, "message": "航班已记录"}
         elif data_type == "investment":
-            portfolio_service.create_investment(Investment(**data))
+            await portfolio_service.create_investment(Investment(**data))
             return {"success": True, "message": "投资已记录"}
         else:
             return {"success": False, "message": f"未知数据类型: {data_type}"}
@@ -214,7 +218,7 @@ async def submit_data(request: dict):
 @router.post("/chat/vision")
 async def chat_vision(request: VisionRequest):
     """发送带图片的聊天消息"""
-    config_data = data_manager.read_data(settings.config_data_file)
+    config_data = await data_manager.aread(settings.config_data_file)
     configs = config_data.get("llm_configs", [])
 
     active_config = None
@@ -251,7 +255,7 @@ async def chat_vision(request: VisionRequest):
 async def test_connection():
     """测试 LLM 连接"""
     try:
-        config_data = data_manager.read_data(settings.config_data_file)
+        config_data = await data_manager.aread(settings.config_data_file)
         configs = config_data.get("llm_configs", [])
 
         active_config = None
@@ -275,48 +279,50 @@ async def test_connection():
 @router.get("/configs", response_model=List[LLMConfigProfile])
 async def get_configs():
     """获取所有 LLM 配置"""
-    data = data_manager.read_data(settings.config_data_file)
-    return data.get("llm_configs", [])
+    return json_page(await model_cache.json_array(settings.config_data_file, "llm_configs", LLMConfigProfile))
 
 
 @router.post("/configs", response_model=LLMConfigProfile)
 async def create_config(config: LLMConfigProfile):
     """创建新的 LLM 配置"""
-    data = data_manager.read_data(settings.config_data_file)
-    if "llm_configs" not in data:
-        data["llm_configs"] = []
-
     config.id = str(uuid.uuid4())
     config.created_at = datetime.now().isoformat()
 
-    # 如果是第一个配置或标记为默认，设为默认
-    if len(data["llm_configs"]) == 0 or config.is_default:
-        for c in data["llm_configs"]:
-            c["is_default"] = False
-        config.is_default = True
+    def apply(txn: Transaction):
+        configs = txn.data.get("llm_configs", [])
+
+        # 如果是第一个配置或标记为默认，设为默认
+        if len(configs) == 0 or config.is_default:
+            for c in list(configs):
+                if c.get("is_default"):
+                    txn.patch("llm_configs", c["id"], {"is_default": False})
+            config.is_default = True
+
+        txn.insert("llm_configs", config.dict())
 
-    data["llm_configs"].append(config.dict())
-    data_manager.write_data(settings.config_data_file, data)
+    await data_manager.aupdate(settings.config_data_file, apply)
     return config
 
 
 @router.put("/configs/{config_id}", response_model=LLMConfigProfile)
 async def update_config_profile(config_id: str, config: LLMConfigProfile):
     """更新 LLM 配置"""
-    data = data_manager.read_data(settings.config_data_file)
-    configs = data.get("llm_configs", [])
-
-    for i, c in enumerate(configs):
-        if c["id"] == config_id:
-            config.id = config_id
-            config.created_at = c.get("created_at")
-            if config.is_default:
-                for other in configs:
-                    other["is_default"] = False
-            configs[i] = config.dict()
-            data["llm_configs"] = configs
-            data_manager.write_data(settings.config_data_file, data)
-            return config
+    def apply(txn: Transaction) -> bool:
+        existing = txn.get("llm_configs", config_id)
+        if existing is None:
+            return False
+
+        config.id = config_id
+        config.created_at = existing.get("created_at")
+        if config.is_default:
+            for other in list(txn.data.get("llm_configs", [])):
+                if other.get("is_default") and other["id"] != config_id:
+                    txn.patch("llm_configs", other["id"], {"is_default": False})
+        txn.replace("llm_configs", config_id, config.dict())
+        return True
+
+    if await data_manager.aupdate(settings.config_data_file, apply):
+        return config
 
     raise HTTPException(status_code=404, detail="Config not found")
 
@@ -324,32 +330,26 @@ async def update_config_profile(config_id: str, config: LLMConfigProfile):
 @router.delete("/configs/{config_id}")
 async def delete_config(config_id: str):
     """删除 LLM 配置"""
-    data = data_manager.read_data(settings.config_data_file)
-    configs = data.get("llm_configs", [])
-    data["llm_configs"] = [c for c in configs if c["id"] != config_id]
-    data_manager.write_data(settings.config_data_file, data)
+    await data_manager.adelete_record(settings.config_data_file, "llm_configs", config_id)
     return {"message": "Config deleted"}
 
 
 @router.post("/configs/{config_id}/activate")
 async def activate_config(config_id: str):
     """激活指定配置为当前使用"""
-    data = data_manager.read_data(settings.config_data_file)
-    configs = data.get("llm_configs", [])
+    def apply(txn: Transaction) -> bool:
+        if txn.get("llm_configs", config_id) is None:
+            return False
 
-    target = None
-    for c in configs:
-        if c["id"] == config_id:
-            target = c
-            c["is_default"] = True
-        else:
-            c["is_default"] = False
+        for c in list(txn.data.get("llm_configs", [])):
+            is_target = c["id"] == config_id
+            if c.get("is_default") != is_target:
+                txn.patch("llm_configs", c["id"], {"is_default": is_target})
+        return True
 
-    if not target:
+    if not await data_manager.aupdate(settings.config_data_file, apply):
         raise HTTPException(status_code=404, detail="Config not found")
 
-    data["llm_configs"] = configs
-    data_manager.write_data(settings.config_data_file, data)
     return {"message": "Config activated"}
 
 
@@ -358,51 +358,61 @@ async def activate_config(config_id: str):
 @router.get("/conversations", response_model=List[Conversation])
 async def get_conversations():
     """获取所有对话"""
-    data = data_manager.read_data(settings.config_data_file)
-    return data.get("conversations", [])
+    return json_page(await model_cache.json_array(settings.config_data_file, "conversations", Conversation))
 
 
 @router.post("/conversations", response_model=Conversation)
 async def create_conversation(conversation: Conversation):
     """创建新对话"""
-    data = data_manager.read_data(settings.config_data_file)
-    if "conversations" not in data:
-        data["conversations"] = []
-
     conversation.id = str(uuid.uuid4())
     conversation.created_at = datetime.now().isoformat()
     conversation.updated_at = conversation.created_at
 
-    data["conversations"].append(conversation.dict())
-    data_manager.write_data(settings.config_data_file, data)
+    await data_manager.ainsert_record(settings.config_data_file, "conversations", conversation.dict())
     return conversation
 
 
+@router.get("/export/conversations")
+async def export_conversations(
+    format: str = Query("ndjson", description="ndjson or csv"),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+):
+    """Stream all conversations (optionally by creation date) as NDJSON or CSV"""
+    try:
+        export = export_collection(
+            settings.config_data_file, "conversations", Conversation, format, "created_at", date_from, date_to
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return stream_export(export)
+
+
 @router.get("/conversations/{conv_id}", response_model=Conversation)
 async def get_conversation(conv_id: str):
     """获取单个对话"""
-    data = data_manager.read_data(settings.config_data_file)
-    for conv in data.get("conversations", []):
-        if conv["id"] == conv_id:
-            return Conversation(**conv)
+    conv = await data_manager.aget_record(settings.config_data_file, "conversations", conv_id)
+    if conv:
+        return Conversation(**conv)
     raise HTTPException(status_code=404, detail="Conversation not found")
 
 
 @router.put("/conversations/{conv_id}", response_model=Conversation)
 async def update_conversation(conv_id: str, conversation: Conversation):
     """更新对话"""
-    data = data_manager.read_data(settings.config_data_file)
-    convs = data.get("conversations", [])
-
-    for i, c in enumerate(convs):
-        if c["id"] == conv_id:
-            conversation.id = conv_id
-            conversation.created_at = c.get("created_at")
-            conversation.updated_at = datetime.now().isoformat()
-            convs[i] = conversation.dict()
-            data["conversations"] = convs
-            data_manager.write_data(settings.config_data_file, data)
-            return conversation
+    def apply(txn: Transaction) -> bool:
+        existing = txn.get("conversations", conv_id)
+        if existing is None:
+            return False
+
+        conversation.id = conv_id
+        conversation.created_at = existing.get("created_at")
+        conversation.updated_at = datetime.now().isoformat()
+        txn.replace("conversations", conv_id, conversation.dict())
+        return True
+
+    if await data_manager.aupdate(settings.config_data_file, apply):
+        return conversation
 
     raise HTTPException(status_code=404, detail="Conversation not found")
 
@@ -410,25 +420,17 @@ async def update_conversation(conv_id: str, conversation: Conversation):
 @router.delete("/conversations/{conv_id}")
 async def delete_conversation(conv_id: str):
     """删除对话"""
-    data = data_manager.read_data(settings.config_data_file)
-    convs = data.get("conversations", [])
-    data["conversations"] = [c for c in convs if c["id"] != conv_id]
-    data_manager.write_data(settings.config_data_file, data)
+    await data_manager.adelete_record(settings.config_data_file, "conversations", conv_id)
     return {"message": "Conversation deleted"}
 
 
 @router.post("/conversations/{conv_id}/generate-title")
 async def generate_conversation_title(conv_id: str):
     """使用 LLM 生成对话标题"""
-    data = data_manager.read_data(settings.config_data_file)
+    data = await data_manager.aread(settings.config_data_file)
 
     # 获取对话
-    conv = None
-    for c in data.get("conversations", []):
-        if c["id"] == conv_id:
-            conv = c
-            break
-
+    conv = await data_manager.aget_record(settings.config_data_file, "conversations", conv_id)
     if not conv:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
@@ -463,14 +465,11 @@ Reply with ONLY the title, no quotes or explanation."""
         title = await llm_service.chat(prompt, [], active_config)
         title = title.strip().strip('"\'')[:30]
 
-        # 更新对话标题
-        for i, c in enumerate(data["conversations"]):
-            if c["id"] == conv_id:
-                data["conversations"][i]["title"] = title
-                data["conversations"][i]["updated_at"] = datetime.now().isoformat()
-                break
-
-        data_manager.write_data(settings.config_data_file, data)
+        # 更新对话标题（只修改标题字段，避免覆盖并发更新的消息）
+        await data_manager.apatch_record(settings.config_data_file, "conversations", conv_id, {
+            "title": title,
+            "updated_at": datetime.now().isoformat()
+        })
         return {"title": title}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
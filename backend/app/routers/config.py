@@ -1,7 +1,7 @@
 """Configuration API routes"""
 from fastapi import APIRouter
 from app.models.config import APIKeysConfig
-from app.services.data_manager import data_manager
+from app.services.data_manager import data_manager, Transaction
 from app.config import settings
 
 router = APIRouter()
@@ -17,7 +17,7 @@ def mask_key(key: str) -> str:
 @router.get("/api-keys")
 async def get_api_keys():
     """Get API keys (masked for security)"""
-    data = data_manager.read_data(settings.config_data_file)
+    data = await data_manager.aread(settings.config_data_file)
     api_keys = data.get("api_keys", {})
 
     return {
@@ -43,39 +43,39 @@ async def get_api_keys():
 @router.put("/api-keys")
 async def update_api_keys(config: APIKeysConfig):
     """Update API keys"""
-    data = data_manager.read_data(settings.config_data_file)
-
-    if "api_keys" not in data:
-        data["api_keys"] = {}
-
-    # Only update non-empty values
-    if config.alpha_vantage_key:
-        data["api_keys"]["alpha_vantage_key"] = config.alpha_vantage_key
-    if config.coingecko_key:
-        data["api_keys"]["coingecko_key"] = config.coingecko_key
-    if config.exchange_rate_key:
-        data["api_keys"]["exchange_rate_key"] = config.exchange_rate_key
-    # Flight APIs
-    if config.aerodatabox_key:
-        data["api_keys"]["aerodatabox_key"] = config.aerodatabox_key
-    if config.airlabs_key:
-        data["api_keys"]["airlabs_key"] = config.airlabs_key
-    if config.aviationstack_key:
-        data["api_keys"]["aviationstack_key"] = config.aviationstack_key
-    if config.opensky_username:
-        data["api_keys"]["opensky_username"] = config.opensky_username
-    if config.opensky_password:
-        data["api_keys"]["opensky_password"] = config.opensky_password
-    # Maps
-    if config.google_maps_key:
-        data["api_keys"]["google_maps_key"] = config.google_maps_key
-    # Steam
-    if config.steam_api_key:
-        data["api_keys"]["steam_api_key"] = config.steam_api_key
-    if config.steam_id:
-        data["api_keys"]["steam_id"] = config.steam_id
-
-    data_manager.write_data(settings.config_data_file, data)
+    def apply(txn: Transaction):
+        api_keys = dict(txn.data.get("api_keys", {}))
+
+        # Only update non-empty values
+        if config.alpha_vantage_key:
+            api_keys["alpha_vantage_key"] = config.alpha_vantage_key
+        if config.coingecko_key:
+            api_keys["coingecko_key"] = config.coingecko_key
+        if config.exchange_rate_key:
+            api_keys["exchange_rate_key"] = config.exchange_rate_key
+        # Flight APIs
+        if config.aerodatabox_key:
+            api_keys["aerodatabox_key"] = config.aerodatabox_key
+        if config.airlabs_key:
+            api_keys["airlabs_key"] = config.airlabs_key
+        if config.aviationstack_key:
+            api_keys["aviationstack_key"] = config.aviationstack_key
+        if config.opensky_username:
+            api_keys["opensky_username"] = config.opensky_username
+        if config.opensky_password:
+            api_keys["opensky_password"] = config.opensky_password
+        # Maps
+        if config.google_maps_key:
+            api_keys["google_maps_key"] = config.google_maps_key
+        # Steam
+        if config.steam_api_key:
+            api_keys["steam_api_key"] = config.steam_api_key
+        if config.steam_id:
+            api_keys["steam_id"] = config.steam_id
+
+        txn.set("api_keys", api_keys)
+
+    await data_manager.aupdate(settings.config_data_file, apply)
 
     return {"message": "API keys updated successfully"}
 
@@ -83,11 +83,12 @@ async def update_api_keys(config: APIKeysConfig):
 @router.delete("/api-keys/{key_name}")
 async def delete_api_key(key_name: str):
     """Delete a specific API key"""
-    data = data_manager.read_data(settings.config_data_file)
+    def apply(txn: Transaction):
+        api_keys = txn.data.get("api_keys", {})
+        if key_name in api_keys:
+            txn.set("api_keys", {k: v for k, v in api_keys.items() if k != key_name})
 
-    if "api_keys" in data and key_name in data["api_keys"]:
-        del data["api_keys"][key_name]
-        data_manager.write_data(settings.config_data_file, data)
+    await data_manager.aupdate(settings.config_data_file, apply)
 
     return {"message": f"API key '{key_name}' deleted"}
 
@@ -95,6 +96,6 @@ async def delete_api_key(key_name: str):
 @router.get("/google-maps-key")
 async def get_google_maps_key():
     """Get Google Maps API key for frontend use"""
-    data = data_manager.read_data(settings.config_data_file)
+    data = await data_manager.aread(settings.config_data_file)
     api_keys = data.get("api_keys", {})
     return {"key": api_keys.get("google_maps_key", "")}
@@ -0,0 +1,68 @@
+"""Server-Sent Events change feed"""
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from app.config import settings
+from app.services.event_service import event_bus, matches
+
+router = APIRouter()
+
+
+@router.get("")
+async def stream_events(
+    request: Request,
+    topics: Optional[str] = Query(None, description="Comma-separated topics, e.g. expense,gaming.cache"),
+    last_event_id: Optional[str] = Query(None, description="Resume after this event id"),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """Stream change events; reconnecting clients resume after Last-Event-ID"""
+    topic_set = {topic.strip() for topic in topics.split(",") if topic.strip()} if topics else None
+    resume = last_event_id_header or last_event_id
+
+    async def generate():
+        # Subscribe before reading the buffer so no event falls in between
+        subscription = event_bus.subscribe(topic_set)
+        try:
+            yield "retry: 3000\n\n"
+            if resume:
+                missed = event_bus.since(resume)
+                if missed is None:
+                    stats = event_bus.get_stats()
+                    payload = json.dumps({"type": "stream.reset", "data": {}})
+                    yield f"id: {stats['last_id'] or ''}\nevent: stream.reset\ndata: {payload}\n\n"
+                else:
+                    for event in missed:
+                        if matches(topic_set, event.type):
+                            yield event.encode()
+            while True:
+                if subscription.overflowed and subscription.queue.empty():
+                    # Too slow: end the stream, the client resumes from the buffer
+                    break
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), settings.events_keepalive_seconds)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield event.encode()
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+
+@router.get("/stats")
+async def get_event_stats():
+    """Change feed counters"""
+    return event_bus.get_stats()
@@ -1,25 +1,125 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from typing import List, Optional
 from app.models.finance import (
-    Expense, Income, Bill, Budget, Category, FinanceStatistics
+    Expense, Income, Bill, Budget, Category, FinanceStatistics, FinanceTrends,
+    FinanceQuery, FinanceQueryResult
 )
+from app.models.bulk import BulkDelete, BulkResult, BulkUpdate, ImportResult
+from app.services.bulk_service import InvalidRecordsError
 from app.services.finance_service import finance_service
+from app.services.import_service import ImportSource
+from app.services.record_query import ListQuery, parse_fields
 from app.services.exchange_rate_service import exchange_rate_service
+from app.utils.export import stream_export
+from app.utils.imports import import_source, run_import
+from app.utils.pages import json_page
+from app.utils.etag import check_etag, etag_for
 
 router = APIRouter()
 
+# 304 Not Modified while the data file is unchanged
+conditional_get = [Depends(etag_for(finance_service.data_file))]
+
+
+async def statistics_etag(request: Request):
+    """ETag of the data file and of the exchange rates the statistics are converted with"""
+    base = request.query_params.get("currency", "USD").upper()
+    rates = await exchange_rate_service.rates_version(base)
+    await check_etag(request, finance_service.data_file, extra=f"rates:{rates}")
+
 
 # Expense endpoints
-@router.get("/expenses", response_model=List[Expense])
-async def get_expenses():
-    """Get all expenses"""
-    return finance_service.get_expenses()
+@router.get("/expenses", response_model=List[Expense], dependencies=conditional_get)
+async def get_expenses(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    category: Optional[List[str]] = Query(None),
+    currency: Optional[List[str]] = Query(None),
+    merchant: Optional[List[str]] = Query(None),
+    tag: Optional[List[str]] = Query(None),
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    sort: Optional[str] = Query(None, description="Sort key, prefix with - for descending"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page")
+):
+    """Get expenses; all of them unless filters, sort or limit are given.
+
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    query = ListQuery(
+        filters={"category": category, "currency": currency, "merchant": merchant, "tags": tag},
+        ranges={"date": (date_from, date_to), "amount": (min_amount, max_amount)},
+        sort=sort, limit=limit, cursor=cursor, fields=parse_fields(fields)
+    )
+    try:
+        content, next_cursor = await finance_service.get_expenses_page(query)
+        return json_page(content, next_cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/export/expenses")
+async def export_expenses(
+    format: str = Query("ndjson", description="ndjson or csv"),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+):
+    """Stream all expenses (optionally within a date range) as NDJSON or CSV"""
+    try:
+        export = finance_service.export_expenses(format, date_from, date_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return stream_export(export)
+
+
+@router.get("/export/income")
+async def export_income(
+    format: str = Query("ndjson", description="ndjson or csv"),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+):
+    """Stream all income (optionally within a date range) as NDJSON or CSV"""
+    try:
+        export = finance_service.export_income(format, date_from, date_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return stream_export(export)
+
 
+@router.post("/import/expenses", response_model=ImportResult)
+async def import_expenses(
+    source: ImportSource = Depends(import_source),
+    skip_invalid: bool = Query(False, description="Import the valid rows even if some are invalid")
+):
+    """Import expenses in bulk
 
-@router.get("/expenses/{expense_id}", response_model=Expense)
+    Send a JSON array, NDJSON or CSV as the body or as a multipart `file`
+    upload. Invalid rows are reported per row; unless skip_invalid is set
+    they reject the whole import.
+    """
+    return await run_import(finance_service.import_expenses(source, skip_invalid))
+
+
+@router.post("/import/income", response_model=ImportResult)
+async def import_income(
+    source: ImportSource = Depends(import_source),
+    skip_invalid: bool = Query(False, description="Import the valid rows even if some are invalid")
+):
+    """Import income in bulk
+
+    Send a JSON array, NDJSON or CSV as the body or as a multipart `file`
+    upload. Invalid rows are reported per row; unless skip_invalid is set
+    they reject the whole import.
+    """
+    return await run_import(finance_service.import_income(source, skip_invalid))
+
+
+@router.get("/expenses/{expense_id}", response_model=Expense, dependencies=conditional_get)
 async def get_expense(expense_id: str):
     """Get expense by ID"""
-    expense = finance_service.get_expense(expense_id)
+    expense = await finance_service.get_expense(expense_id)
     if not expense:
         raise HTTPException(status_code=404, detail="Expense not found")
     return expense
@@ -28,13 +128,13 @@ async def get_expense(expense_id: str):
 @router.post("/expenses", response_model=Expense)
 async def create_expense(expense: Expense):
     """Create new expense"""
-    return finance_service.create_expense(expense)
+    return await finance_service.create_expense(expense)
 
 
 @router.put("/expenses/{expense_id}", response_model=Expense)
 async def update_expense(expense_id: str, expense: Expense):
     """Update expense"""
-    updated = finance_service.update_expense(expense_id, expense)
+    updated = await finance_service.update_expense(expense_id, expense)
     if not updated:
         raise HTTPException(status_code=404, detail="Expense not found")
     return updated
@@ -43,63 +143,195 @@ async def update_expense(expense_id: str, expense: Expense):
 @router.delete("/expenses/{expense_id}")
 async def delete_expense(expense_id: str):
     """Delete expense"""
-    success = finance_service.delete_expense(expense_id)
+    success = await finance_service.delete_expense(expense_id)
     if not success:
         raise HTTPException(status_code=404, detail="Expense not found")
     return {"message": "Expense deleted successfully"}
 
 
+@router.post("/expenses/bulk-update", response_model=BulkResult)
+async def bulk_update_expenses(update: BulkUpdate):
+    """Apply a patch to the expenses given by ids or matching a filter, in one transaction"""
+    try:
+        return await finance_service.bulk_update_expenses(update)
+    except InvalidRecordsError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "errors": e.errors})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/expenses/bulk-delete", response_model=BulkResult)
+async def bulk_delete_expenses(delete: BulkDelete):
+    """Delete the expenses with the given ids in one transaction"""
+    return await finance_service.bulk_delete_expenses(delete.ids)
+
+
 # Income endpoints
-@router.get("/income", response_model=List[Income])
-async def get_income():
-    """Get all income"""
-    return finance_service.get_income()
+@router.get("/income", response_model=List[Income], dependencies=conditional_get)
+async def get_income(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    type: Optional[List[str]] = Query(None),
+    source: Optional[List[str]] = Query(None),
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    sort: Optional[str] = Query(None, description="Sort key, prefix with - for descending"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page")
+):
+    """Get income; all of it unless filters, sort or limit are given"""
+    query = ListQuery(
+        filters={"type": type, "source": source},
+        ranges={"date": (date_from, date_to), "amount": (min_amount, max_amount)},
+        sort=sort, limit=limit, cursor=cursor, fields=parse_fields(fields)
+    )
+    try:
+        content, next_cursor = await finance_service.get_income_page(query)
+        return json_page(content, next_cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/income", response_model=Income)
 async def create_income(income: Income):
     """Create new income"""
-    return finance_service.create_income(income)
+    return await finance_service.create_income(income)
+
+
+@router.post("/income/bulk-update", response_model=BulkResult)
+async def bulk_update_income(update: BulkUpdate):
+    """Apply a patch to the income given by ids or matching a filter, in one transaction"""
+    try:
+        return await finance_service.bulk_update_income(update)
+    except InvalidRecordsError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "errors": e.errors})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/income/bulk-delete", response_model=BulkResult)
+async def bulk_delete_income(delete: BulkDelete):
+    """Delete the income with the given ids in one transaction"""
+    return await finance_service.bulk_delete_income(delete.ids)
 
 
 # Bill endpoints
-@router.get("/bills", response_model=List[Bill])
-async def get_bills():
+@router.get("/bills", response_model=List[Bill], dependencies=conditional_get)
+async def get_bills(fields: Optional[str] = Query(None, description="Comma-separated fields to return")):
     """Get all bills"""
-    return finance_service.get_bills()
+    try:
+        return json_page(await finance_service.get_bills_json(parse_fields(fields)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/bills", response_model=Bill)
 async def create_bill(bill: Bill):
     """Create new bill"""
-    return finance_service.create_bill(bill)
+    return await finance_service.create_bill(bill)
 
 
 # Budget endpoints
-@router.get("/budgets", response_model=List[Budget])
-async def get_budgets():
+@router.get("/budgets", response_model=List[Budget], dependencies=conditional_get)
+async def get_budgets(fields: Optional[str] = Query(None, description="Comma-separated fields to return")):
     """Get all budgets"""
-    return finance_service.get_budgets()
+    try:
+        return json_page(await finance_service.get_budgets_json(parse_fields(fields)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/budgets", response_model=Budget)
 async def create_budget(budget: Budget):
     """Create new budget"""
-    return finance_service.create_budget(budget)
+    return await finance_service.create_budget(budget)
 
 
 # Category endpoints
-@router.get("/categories", response_model=List[Category])
-async def get_categories():
+@router.get("/categories", response_model=List[Category], dependencies=conditional_get)
+async def get_categories(fields: Optional[str] = Query(None, description="Comma-separated fields to return")):
     """Get all categories"""
-    return finance_service.get_categories()
+    try:
+        return json_page(await finance_service.get_categories_json(parse_fields(fields)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 # Statistics endpoint
-@router.get("/statistics", response_model=FinanceStatistics)
-async def get_statistics():
-    """Get finance statistics"""
-    return finance_service.get_statistics()
+@router.get("/statistics", response_model=FinanceStatistics, dependencies=[Depends(statistics_etag)])
+async def get_statistics(date_from: Optional[str] = None, date_to: Optional[str] = None, currency: str = "USD"):
+    """Get finance statistics in a base currency, optionally for a date range"""
+    try:
+        return await finance_service.get_statistics(date_from, date_to, currency)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/trends", response_model=FinanceTrends, dependencies=conditional_get)
+async def get_trends(
+    granularity: str = "month",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    category: Optional[List[str]] = Query(None),
+    currency: Optional[List[str]] = Query(None)
+):
+    """Get expense and income totals per day, week, month or year"""
+    try:
+        return await finance_service.get_trends(granularity, date_from, date_to, category, currency)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/reports/{collection}", dependencies=conditional_get)
+async def get_report(
+    collection: str,
+    group_by: Optional[str] = Query(None, description="Comma-separated keys, e.g. month,merchant"),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    category: Optional[List[str]] = Query(None),
+    merchant: Optional[List[str]] = Query(None),
+    currency: Optional[List[str]] = Query(None),
+    tag: Optional[List[str]] = Query(None),
+    type: Optional[List[str]] = Query(None),
+    source: Optional[List[str]] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, description="Top groups to keep (per period)")
+):
+    """Get expense or income totals grouped by category, merchant, currency, tag, type, source, day, week, month or year"""
+    keys = tuple(key.strip() for key in (group_by or "").split(",") if key.strip())
+    filters = {
+        "category": category, "merchant": merchant, "currency": currency,
+        "tag": tag, "type": type, "source": source
+    }
+    try:
+        return await finance_service.get_report(collection, keys, date_from, date_to, filters, limit)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/query", response_model=FinanceQueryResult)
+async def query(spec: FinanceQuery):
+    """Run an ad hoc aggregation over expenses or income: filters, group-by dimensions and measures"""
+    try:
+        return await finance_service.query(spec)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/statistics/rebuild")
+async def rebuild_statistics():
+    """Recompute the stored running totals from every record"""
+    return await finance_service.rebuild_totals()
+
+
+@router.get("/statistics/check")
+async def check_statistics():
+    """Compare the stored running totals with a full recompute"""
+    return await finance_service.check_totals()
 
 
 # Exchange rate endpoints
@@ -1,33 +1,44 @@
 """Gaming API routes for Steam integration"""
-import asyncio
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query, Request
 from app.services.gaming_service import gaming_service
 from app.services.gaming_cache_service import gaming_cache_service
+from app.services.record_query import parse_fields, project
 from app.models.gaming import GamingStatistics
+from app.config import settings
+from app.utils.export import stream_export
+from app.utils.etag import check_etag, etag_for
 
 router = APIRouter()
 
-# Background cache task state
-_cache_task_state = {
-    "running": False,
-    "total": 0,
-    "completed": 0,
-    "current_game": None,
-    "errors": []
-}
+# 304 Not Modified while the games and the Steam settings are unchanged
+etag_files = (gaming_service.data_file, settings.config_data_file)
+conditional_get = [Depends(etag_for(*etag_files))]
 
 
 @router.get("/games")
-async def get_games():
+async def get_games(request: Request, fields: Optional[str] = Query(None, description="Comma-separated fields to return")):
     """Get all games from cache or fetch from Steam"""
     games = await gaming_service.fetch_owned_games()
-    return {"games": games, "count": len(games)}
+    # After the Steam poll, so a refreshed game list is never answered with 304
+    await check_etag(request, *etag_files)
+    return {"games": project(games, parse_fields(fields)), "count": len(games)}
 
 
-@router.get("/statistics")
+@router.get("/export/games")
+async def export_games(format: str = Query("ndjson", description="ndjson or csv")):
+    """Stream the cached games as NDJSON or CSV"""
+    try:
+        export = gaming_service.export_games(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return stream_export(export)
+
+
+@router.get("/statistics", dependencies=conditional_get)
 async def get_statistics():
     """Get gaming statistics"""
-    return gaming_service.get_statistics()
+    return await gaming_service.get_statistics()
 
 
 @router.post("/sync")
@@ -48,14 +59,15 @@ async def sync_games(background_tasks: BackgroundTasks):
             uncached.append(game)
 
     # Start background caching if there are uncached games
-    if uncached and not _cache_task_state["running"]:
-        background_tasks.add_task(cache_games_background, uncached)
+    running = gaming_service.cache_state["running"]
+    if uncached and not running:
+        background_tasks.add_task(gaming_service.cache_games, uncached)
 
     return {
         "message": "Sync completed",
         "games_count": len(games),
         "uncached_count": len(uncached),
-        "caching_started": len(uncached) > 0 and not _cache_task_state["running"]
+        "caching_started": len(uncached) > 0 and not running
     }
 
 
@@ -89,10 +101,10 @@ async def get_game_news(appid: int, count: int = 10):
     return {"news": news, "count": len(news)}
 
 
-@router.get("/games/{appid}")
+@router.get("/games/{appid}", dependencies=conditional_get)
 async def get_game(appid: int):
     """Get a specific game by appid"""
-    game = gaming_service.get_game(appid)
+    game = await gaming_service.get_game(appid)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     return game
@@ -126,31 +138,5 @@ async def refresh_game_cache(appid: int):
 
 @router.get("/cache/sync-status")
 async def get_cache_sync_status():
-    """Get background cache sync status"""
-    return _cache_task_state.copy()
-
-
-async def cache_games_background(games: list):
-    """Background task to cache all uncached games"""
-    global _cache_task_state
-    _cache_task_state["running"] = True
-    _cache_task_state["total"] = len(games)
-    _cache_task_state["completed"] = 0
-    _cache_task_state["errors"] = []
-
-    for game in games:
-        appid = game.get("appid")
-        name = game.get("name", f"Game {appid}")
-        _cache_task_state["current_game"] = name
-
-        try:
-            await gaming_service.fetch_game_details(appid)
-            await gaming_service.fetch_detailed_achievements(appid)
-        except Exception as e:
-            _cache_task_state["errors"].append({"appid": appid, "error": str(e)})
-
-        _cache_task_state["completed"] += 1
-        await asyncio.sleep(0.5)  # Rate limiting
-
-    _cache_task_state["running"] = False
-    _cache_task_state["current_game"] = None
+    """Get background cache sync status (also streamed as gaming.cache.* events)"""
+    return gaming_service.cache_state.copy()
@@ -1,24 +1,83 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import List, Optional
 from app.models.portfolio import Investment, Project, Experience, PortfolioStatistics
+from app.models.bulk import BulkDelete, BulkResult, BulkUpdate, ImportResult
+from app.services.bulk_service import InvalidRecordsError
 from app.services.portfolio_service import portfolio_service
+from app.services.import_service import ImportSource
 from app.services.price_service import price_service
+from app.services.record_query import ListQuery, parse_fields
+from app.utils.export import stream_export
+from app.utils.imports import import_source, run_import
+from app.utils.pages import json_page
+from app.utils.etag import etag_for
 
 router = APIRouter()
 
-
-# Investment endpoints
-@router.get("/investments", response_model=List[Investment])
-async def get_investments():
-    """Get all investments"""
-    return portfolio_service.get_investments()
+# 304 Not Modified while the data file is unchanged
+conditional_get = [Depends(etag_for(portfolio_service.data_file))]
 
 
-@router.get("/investments/{investment_id}", response_model=Investment)
+# Investment endpoints
+@router.get("/investments", response_model=List[Investment], dependencies=conditional_get)
+async def get_investments(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    type: Optional[List[str]] = Query(None),
+    symbol: Optional[List[str]] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    sort: Optional[str] = Query(None, description="Sort key, prefix with - for descending"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page")
+):
+    """Get investments; all of them unless filters, sort or limit are given.
+
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    query = ListQuery(
+        filters={"type": type, "symbol": symbol},
+        ranges={"purchase_date": (date_from, date_to)},
+        sort=sort, limit=limit, cursor=cursor, fields=parse_fields(fields)
+    )
+    try:
+        content, next_cursor = await portfolio_service.get_investments_page(query)
+        return json_page(content, next_cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/export/investments")
+async def export_investments(
+    format: str = Query("ndjson", description="ndjson or csv"),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+):
+    """Stream all investments (optionally by purchase date range) as NDJSON or CSV"""
+    try:
+        export = portfolio_service.export_investments(format, date_from, date_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return stream_export(export)
+
+
+@router.post("/import/investments", response_model=ImportResult)
+async def import_investments(
+    source: ImportSource = Depends(import_source),
+    skip_invalid: bool = Query(False, description="Import the valid rows even if some are invalid")
+):
+    """Import investments in bulk
+
+    Send a JSON array, NDJSON or CSV as the body or as a multipart `file`
+    upload. Invalid rows are reported per row; unless skip_invalid is set
+    they reject the whole import.
+    """
+    return await run_import(portfolio_service.import_investments(source, skip_invalid))
+
+
+@router.get("/investments/{investment_id}", response_model=Investment, dependencies=conditional_get)
 async def get_investment(investment_id: str):
     """Get investment by ID"""
-    investment = portfolio_service.get_investment(investment_id)
+    investment = await portfolio_service.get_investment(investment_id)
     if not investment:
         raise HTTPException(status_code=404, detail="Investment not found")
     return investment
@@ -27,13 +86,13 @@ async def get_investment(investment_id: str):
 @router.post("/investments", response_model=Investment)
 async def create_investment(investment: Investment):
     """Create new investment"""
-    return portfolio_service.create_investment(investment)
+    return await portfolio_service.create_investment(investment)
 
 
 @router.put("/investments/{investment_id}", response_model=Investment)
 async def update_investment(investment_id: str, investment: Investment):
     """Update investment"""
-    updated = portfolio_service.update_investment(investment_id, investment)
+    updated = await portfolio_service.update_investment(investment_id, investment)
     if not updated:
         raise HTTPException(status_code=404, detail="Investment not found")
     return updated
@@ -42,43 +101,66 @@ async def update_investment(investment_id: str, investment: Investment):
 @router.delete("/investments/{investment_id}")
 async def delete_investment(investment_id: str):
     """Delete investment"""
-    success = portfolio_service.delete_investment(investment_id)
+    success = await portfolio_service.delete_investment(investment_id)
     if not success:
         raise HTTPException(status_code=404, detail="Investment not found")
     return {"message": "Investment deleted successfully"}
 
 
+@router.post("/investments/bulk-update", response_model=BulkResult)
+async def bulk_update_investments(update: BulkUpdate):
+    """Apply a patch to the investments given by ids or matching a filter, in one transaction"""
+    try:
+        return await portfolio_service.bulk_update_investments(update)
+    except InvalidRecordsError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "errors": e.errors})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/investments/bulk-delete", response_model=BulkResult)
+async def bulk_delete_investments(delete: BulkDelete):
+    """Delete the investments with the given ids in one transaction"""
+    return await portfolio_service.bulk_delete_investments(delete.ids)
+
+
 # Project endpoints
-@router.get("/projects", response_model=List[Project])
-async def get_projects():
+@router.get("/projects", response_model=List[Project], dependencies=conditional_get)
+async def get_projects(fields: Optional[str] = Query(None, description="Comma-separated fields to return")):
     """Get all projects"""
-    return portfolio_service.get_projects()
+    try:
+        return json_page(await portfolio_service.get_projects_json(parse_fields(fields)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/projects", response_model=Project)
 async def create_project(project: Project):
     """Create new project"""
-    return portfolio_service.create_project(project)
+    return await portfolio_service.create_project(project)
 
 
 # Experience endpoints
-@router.get("/experience", response_model=List[Experience])
-async def get_experiences():
+@router.get("/experience", response_model=List[Experience], dependencies=conditional_get)
+async def get_experiences(fields: Optional[str] = Query(None, description="Comma-separated fields to return")):
     """Get all professional experiences"""
-    return portfolio_service.get_experiences()
+    try:
+        return json_page(await portfolio_service.get_experiences_json(parse_fields(fields)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/experience", response_model=Experience)
 async def create_experience(experience: Experience):
     """Create new experience"""
-    return portfolio_service.create_experience(experience)
+    return await portfolio_service.create_experience(experience)
 
 
 # Statistics endpoint
-@router.get("/statistics", response_model=PortfolioStatistics)
+@router.get("/statistics", response_model=PortfolioStatistics, dependencies=conditional_get)
 async def get_statistics():
     """Get portfolio statistics"""
-    return portfolio_service.get_statistics()
+    return await portfolio_service.get_statistics()
 
 
 # Price endpoints
@@ -94,7 +176,7 @@ async def get_price(symbol: str, asset_type: str = "stock"):
 @router.post("/investments/{investment_id}/refresh-price")
 async def refresh_investment_price(investment_id: str):
     """Refresh price for a specific investment"""
-    investment = portfolio_service.get_investment(investment_id)
+    investment = await portfolio_service.get_investment(investment_id)
     if not investment:
         raise HTTPException(status_code=404, detail="Investment not found")
 
@@ -105,12 +187,12 @@ async def refresh_investment_price(investment_id: str):
     if not price_data:
         raise HTTPException(status_code=404, detail="Could not fetch price")
 
-    investment.current_price = price_data["price"]
-    investment.last_price_update = datetime.now().isoformat()
-    updated = portfolio_service.update_investment(investment_id, investment)
+    updated = await portfolio_service.update_investment_price(investment_id, price_data["price"])
+    if not updated:
+        raise HTTPException(status_code=404, detail="Investment not found")
 
     return {
         "investment_id": investment_id,
         "new_price": price_data["price"],
-        "updated_at": investment.last_price_update
+        "updated_at": updated.last_price_update
     }
@@ -1,26 +1,90 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import List, Dict, Any, Optional
 from app.models.travel import Flight, AirlineStats, Achievement, TravelStatistics
+from app.models.bulk import BulkDelete, BulkResult, BulkUpdate, ImportResult
+from app.services.bulk_service import InvalidRecordsError
 from app.services.travel_service import travel_service
 from app.services.flight_lookup_service import flight_lookup_service
 from app.services.airport_data_service import airport_data_service
-from app.services.data_manager import DataManager
+from app.services.data_manager import data_manager
+from app.services.import_service import ImportSource
+from app.services.record_query import ListQuery, parse_fields
+from app.utils.export import stream_export
+from app.utils.imports import import_source, run_import
+from app.utils.pages import json_page
+from app.utils.etag import etag_for
+from app.utils.singleflight import singleflight
 
 router = APIRouter()
-data_manager = DataManager()
+
+# 304 Not Modified while the data file is unchanged
+conditional_get = [Depends(etag_for(travel_service.data_file))]
 
 
 # Flight endpoints
-@router.get("/flights", response_model=List[Flight])
-async def get_flights():
-    """Get all flights"""
-    return travel_service.get_flights()
+@router.get("/flights", response_model=List[Flight], dependencies=conditional_get)
+async def get_flights(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    airline: Optional[List[str]] = Query(None),
+    origin: Optional[List[str]] = Query(None),
+    destination: Optional[List[str]] = Query(None),
+    travel_class: Optional[List[str]] = Query(None),
+    min_distance: Optional[float] = None,
+    max_distance: Optional[float] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    sort: Optional[str] = Query(None, description="Sort key, prefix with - for descending"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page")
+):
+    """Get flights; all of them unless filters, sort or limit are given.
 
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    query = ListQuery(
+        filters={"airline": airline, "origin": origin, "destination": destination, "travel_class": travel_class},
+        ranges={"date": (date_from, date_to), "distance": (min_distance, max_distance)},
+        sort=sort, limit=limit, cursor=cursor, fields=parse_fields(fields)
+    )
+    try:
+        content, next_cursor = await travel_service.get_flights_page(query)
+        return json_page(content, next_cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/export/flights")
+async def export_flights(
+    format: str = Query("ndjson", description="ndjson or csv"),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+):
+    """Stream all flights (optionally within a date range) as NDJSON or CSV"""
+    try:
+        export = travel_service.export_flights(format, date_from, date_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return stream_export(export)
+
+
+@router.post("/import/flights", response_model=ImportResult)
+async def import_flights(
+    source: ImportSource = Depends(import_source),
+    skip_invalid: bool = Query(False, description="Import the valid rows even if some are invalid")
+):
+    """Import flights in bulk, recomputing airline statistics once
 
-@router.get("/flights/{flight_id}", response_model=Flight)
+    Send a JSON array, NDJSON or CSV as the body or as a multipart `file`
+    upload. Invalid rows are reported per row; unless skip_invalid is set
+    they reject the whole import.
+    """
+    return await run_import(travel_service.import_flights(source, skip_invalid))
+
+
+@router.get("/flights/{flight_id}", response_model=Flight, dependencies=conditional_get)
 async def get_flight(flight_id: str):
     """Get flight by ID"""
-    flight = travel_service.get_flight(flight_id)
+    flight = await travel_service.get_flight(flight_id)
     if not flight:
         raise HTTPException(status_code=404, detail="Flight not found")
     return flight
@@ -29,13 +93,13 @@ async def get_flight(flight_id: str):
 @router.post("/flights", response_model=Flight)
 async def create_flight(flight: Flight):
     """Create new flight"""
-    return travel_service.create_flight(flight)
+    return await travel_service.create_flight(flight)
 
 
 @router.put("/flights/{flight_id}", response_model=Flight)
 async def update_flight(flight_id: str, flight: Flight):
     """Update flight"""
-    updated = travel_service.update_flight(flight_id, flight)
+    updated = await travel_service.update_flight(flight_id, flight)
     if not updated:
         raise HTTPException(status_code=404, detail="Flight not found")
     return updated
@@ -44,31 +108,48 @@ async def update_flight(flight_id: str, flight: Flight):
 @router.delete("/flights/{flight_id}")
 async def delete_flight(flight_id: str):
     """Delete flight"""
-    success = travel_service.delete_flight(flight_id)
+    success = await travel_service.delete_flight(flight_id)
     if not success:
         raise HTTPException(status_code=404, detail="Flight not found")
     return {"message": "Flight deleted successfully"}
 
 
+@router.post("/flights/bulk-update", response_model=BulkResult)
+async def bulk_update_flights(update: BulkUpdate):
+    """Apply a patch to the flights given by ids or matching a filter, in one transaction"""
+    try:
+        return await travel_service.bulk_update_flights(update)
+    except InvalidRecordsError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "errors": e.errors})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/flights/bulk-delete", response_model=BulkResult)
+async def bulk_delete_flights(delete: BulkDelete):
+    """Delete the flights with the given ids in one transaction"""
+    return await travel_service.bulk_delete_flights(delete.ids)
+
+
 # Airline statistics endpoints
-@router.get("/airlines", response_model=List[AirlineStats])
+@router.get("/airlines", response_model=List[AirlineStats], dependencies=conditional_get)
 async def get_airline_stats():
     """Get airline statistics"""
-    return travel_service.get_airline_stats()
+    return await travel_service.get_airline_stats()
 
 
 # Achievements endpoint
-@router.get("/achievements", response_model=List[Achievement])
+@router.get("/achievements", response_model=List[Achievement], dependencies=conditional_get)
 async def get_achievements():
     """Get travel achievements"""
-    return travel_service.get_achievements()
+    return await travel_service.get_achievements()
 
 
 # Statistics endpoint
-@router.get("/statistics", response_model=TravelStatistics)
+@router.get("/statistics", response_model=TravelStatistics, dependencies=conditional_get)
 async def get_statistics():
     """Get travel statistics"""
-    return travel_service.get_statistics()
+    return await travel_service.get_statistics()
 
 
 # Flight lookup endpoint
@@ -82,7 +163,7 @@ async def lookup_flight(
     级联查询: AeroDataBox -> OpenSky -> AirLabs -> AviationStack
     """
     # 从配置加载 API 密钥
-    config = data_manager.read_data("config.json")
+    config = await data_manager.aread("config.json")
     api_keys = config.get("api_keys", {})
     flight_lookup_service.set_api_keys(
         aerodatabox_key=api_keys.get("aerodatabox_key"),
@@ -96,10 +177,11 @@ async def lookup_flight(
     return result
 
 
-@router.get("/map-data")
+@router.get("/map-data", dependencies=conditional_get)
+@singleflight
 async def get_map_data() -> Dict[str, Any]:
     """Get flight data formatted for map display"""
-    flights = travel_service.get_flights()
+    flights = await travel_service.get_flights()
 
     airports = {}
     routes = []
@@ -0,0 +1,287 @@
+"""Background backup worker for DataManager.
+
+Writes only enqueue the file name; a daemon thread takes the snapshot off the
+request path. Snapshots whose content hash matches the previous one for the
+file are skipped, the rest are stored compressed as
+`<stem>_<YYYYmmdd_HHMMSS>.json.gz` (or `.json.zst` when zstandard is
+installed and selected). A SQLite database (`.db`) is copied with SQLite's
+online backup API, so the snapshot is consistent while other connections
+write, and stored as `<stem>_<YYYYmmdd_HHMMSS>.db.gz`.
+
+Retention is tiered instead of a flat count: the newest `backup_keep_recent`
+snapshots are always kept, plus the newest snapshot of each of the last
+`backup_keep_hourly` hours, `backup_keep_daily` days and `backup_keep_weekly`
+ISO weeks. Existing backups are indexed with a single directory scan and the
+index is maintained in memory afterwards, so pruning never re-globs the
+backup directory.
+"""
+import gzip
+import hashlib
+import os
+import queue
+import re
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+from app.config import settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# <stem>_<timestamp>.<ext>; journal archives carry microseconds
+BACKUP_NAME = re.compile(
+    r"^(?P<stem>.+)_(?P<stamp>\d{8}_\d{6}(?:_\d{6})?)\.(?:json|journal|db)(?:\.gz|\.zst)?$"
+)
+# Suffixes of full snapshots (journal archives pair a snapshot with a .journal)
+SNAPSHOT_SUFFIXES = {".json", ".db"}
+
+
+class BackupEntry:
+    """One backup point: a snapshot, or an archived snapshot/journal pair"""
+
+    def __init__(self, taken_at: datetime, paths: List[Path]):
+        self.taken_at = taken_at
+        self.paths = paths
+
+
+def _parse_stamp(stamp: str) -> datetime:
+    fmt = "%Y%m%d_%H%M%S_%f" if stamp.count("_") == 2 else "%Y%m%d_%H%M%S"
+    return datetime.strptime(stamp, fmt)
+
+
+def select_retained(entries: List[BackupEntry], now: Optional[datetime] = None) -> Set[int]:
+    """Indexes of the entries (sorted newest first) kept by the retention tiers"""
+    keep = set(range(min(settings.backup_keep_recent, len(entries))))
+    tiers = [
+        (settings.backup_keep_hourly, lambda t: (t.date(), t.hour)),
+        (settings.backup_keep_daily, lambda t: t.date()),
+        (settings.backup_keep_weekly, lambda t: t.isocalendar()[:2]),
+    ]
+    for limit, bucket_of in tiers:
+        buckets = set()
+        for i, entry in enumerate(entries):
+            bucket = bucket_of(entry.taken_at)
+            if bucket in buckets:
+                continue
+            if len(buckets) >= limit:
+                break
+            buckets.add(bucket)
+            keep.add(i)
+    return keep
+
+
+class BackupWorker:
+    """Takes compressed, deduplicated snapshots of data files in the background"""
+
+    def __init__(self, backup_dir: Path, compression: str = None):
+        self.backup_dir = backup_dir
+        self.compression = compression or settings.backup_compression
+        if self.compression == "zstd" and zstandard is None:
+            print("Warning: zstandard is not installed, falling back to gzip backups")
+            self.compression = "gzip"
+
+        self._queue: "queue.Queue[Optional[Path]]" = queue.Queue()
+        self._queued: Set[Path] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        # stem -> backups sorted newest first; built lazily by one scan
+        self._index: Optional[Dict[str, List[BackupEntry]]] = None
+        self._hashes: Dict[str, str] = {}
+        self.stats = {
+            "snapshots": 0,
+            "unchanged": 0,
+            "pruned": 0,
+            "failed": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+        }
+
+    def submit(self, file_path: Path):
+        """Queue a snapshot of a data file; repeated submits coalesce"""
+        with self._lock:
+            if file_path in self._queued:
+                return
+            self._queued.add(file_path)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="backup-worker", daemon=True)
+                self._thread.start()
+        self._queue.put(file_path)
+
+    def track(self, stem: str, stamp: str, paths: List[Path]):
+        """Register a backup written elsewhere (journal archives) and apply retention"""
+        with self._lock:
+            self._add_entry(stem, BackupEntry(_parse_stamp(stamp), paths))
+            self._prune(stem)
+
+    def flush(self):
+        """Block until every queued snapshot has been taken"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Finish queued snapshots and stop the worker thread"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            file_path = self._queue.get()
+            try:
+                if file_path is None:
+                    return
+                with self._lock:
+                    self._queued.discard(file_path)
+                self._snapshot(file_path)
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"Warning: Failed to create backup: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _snapshot(self, file_path: Path):
+        """Compress a snapshot of the file unless its content is unchanged"""
+        try:
+            content = _read_sqlite(file_path) if file_path.suffix == ".db" else file_path.read_bytes()
+        except FileNotFoundError:
+            return
+
+        stem = file_path.stem
+        digest = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            self._load_index()
+            if digest == self._last_hash(stem):
+                self.stats["unchanged"] += 1
+                return
+
+        taken_at = datetime.now()
+        kind = ".db" if file_path.suffix == ".db" else ".json"
+        suffix = kind + (".zst" if self.compression == "zstd" else ".gz")
+        backup_path = self.backup_dir / f"{stem}_{taken_at.strftime('%Y%m%d_%H%M%S')}{suffix}"
+        compressed = self._compress(content)
+        temp_path = backup_path.with_name(backup_path.name + ".tmp")
+        temp_path.write_bytes(compressed)
+        temp_path.replace(backup_path)
+
+        with self._lock:
+            self._hashes[stem] = digest
+            self._add_entry(stem, BackupEntry(taken_at, [backup_path]))
+            self._prune(stem)
+            self.stats["snapshots"] += 1
+            self.stats["bytes_in"] += len(content)
+            self.stats["bytes_out"] += len(compressed)
+
+    def _compress(self, content: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor().compress(content)
+        return gzip.compress(content, compresslevel=6)
+
+    def _last_hash(self, stem: str) -> Optional[str]:
+        """Hash of the newest snapshot of a file (read once per process)"""
+        if stem not in self._hashes:
+            self._hashes[stem] = None
+            for entry in self._index.get(stem, []):
+                snapshot = next((p for p in entry.paths if SNAPSHOT_SUFFIXES & set(p.suffixes)), None)
+                if snapshot is None:
+                    continue
+                try:
+                    self._hashes[stem] = hashlib.sha256(read_backup(snapshot)).hexdigest()
+                except Exception:
+                    pass
+                break
+        return self._hashes[stem]
+
+    def _load_index(self):
+        """Index the backup directory with a single scan"""
+        if self._index is not None:
+            return
+        self._index = {}
+        grouped: Dict[Tuple[str, str], List[Path]] = {}
+        if self.backup_dir.exists():
+            with os.scandir(self.backup_dir) as it:
+                for item in it:
+                    match = BACKUP_NAME.match(item.name)
+                    if match:
+                        key = (match.group("stem"), match.group("stamp"))
+                        grouped.setdefault(key, []).append(Path(item.path))
+        for (stem, stamp), paths in grouped.items():
+            self._index.setdefault(stem, []).append(BackupEntry(_parse_stamp(stamp), paths))
+        for entries in self._index.values():
+            entries.sort(key=lambda e: e.taken_at, reverse=True)
+
+    def _add_entry(self, stem: str, entry: BackupEntry):
+        self._load_index()
+        entries = self._index.setdefault(stem, [])
+        # Two snapshots in the same second share a name: the newer one replaced it
+        entries[:] = [e for e in entries if e.paths != entry.paths]
+        entries.insert(0, entry)
+        entries.sort(key=lambda e: e.taken_at, reverse=True)
+
+    def _prune(self, stem: str):
+        """Delete the backups of a file that no retention tier keeps"""
+        entries = self._index.get(stem, [])
+        keep = select_retained(entries)
+        for i, entry in enumerate(entries):
+            if i in keep:
+                continue
+            for path in entry.paths:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    print(f"Warning: Failed to remove backup {path.name}: {str(e)}")
+            self.stats["pruned"] += 1
+        self._index[stem] = [entry for i, entry in enumerate(entries) if i in keep]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get backup worker counters and index size"""
+        with self._lock:
+            indexed = {stem: len(entries) for stem, entries in (self._index or {}).items()}
+        return {
+            "compression": self.compression,
+            "queued": self._queue.qsize(),
+            "indexed": indexed,
+            **self.stats,
+        }
+
+
+def _read_sqlite(db_path: Path) -> bytes:
+    """Consistent copy of a SQLite database, taken with the online backup API"""
+    if not db_path.exists():
+        raise FileNotFoundError(db_path)
+    fd, temp_name = tempfile.mkstemp(suffix=".db", dir=db_path.parent)
+    os.close(fd)
+    temp_path = Path(temp_name)
+    try:
+        # A separate read connection: WAL mode lets writers carry on meanwhile
+        source = sqlite3.connect(str(db_path))
+        target = sqlite3.connect(temp_name)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        return temp_path.read_bytes()
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+def read_backup(path: Path) -> bytes:
+    """Read a backup file, decompressing it if needed"""
+    content = path.read_bytes()
+    if path.suffix == ".gz":
+        return gzip.decompress(content)
+    if path.suffix == ".zst":
+        if zstandard is None:
+            raise Exception("zstandard is required to read .zst backups")
+        return zstandard.ZstdDecompressor().decompress(content)
+    return content
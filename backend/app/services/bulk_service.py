@@ -0,0 +1,148 @@
+"""Bulk update and delete of records.
+
+Each call is one DataManager update: the targeted records are located,
+checked and changed in a single transaction, so a bulk operation costs one
+write however many records it touches. A bulk update validates every patched
+record against the collection's model before changing any of them; if one
+is invalid, nothing is written.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pydantic import ValidationError
+from app.models.bulk import BulkResult, BulkUpdate
+from app.services.data_manager import Transaction, data_manager, record_key
+from app.services.event_service import bulk_event, event_bus
+from app.services.record_query import CollectionSpec, ListQuery, run_query
+
+# Fields a patch may not change
+PROTECTED_FIELDS = ("id", "created_at")
+
+
+class InvalidRecordsError(ValueError):
+    """Patched records failed validation; nothing was updated"""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        super().__init__(f"{len(errors)} records would be invalid, nothing was updated")
+        self.errors = errors
+
+
+def _filter_query(spec: CollectionSpec, expression: Dict[str, Any]) -> ListQuery:
+    """Translate a filter expression into a list query on the collection"""
+    if not expression:
+        raise ValueError("filter must name at least one field")
+    filters, ranges = {}, {}
+    for field, value in expression.items():
+        if isinstance(value, dict):
+            if field not in spec.ranges:
+                raise ValueError(f"Cannot filter {field} by range")
+            unknown = set(value) - {"from", "to"}
+            if unknown:
+                raise ValueError(f"Unknown range bounds: {', '.join(sorted(unknown))}")
+            ranges[field] = (value.get("from"), value.get("to"))
+        else:
+            if field not in spec.filters and field not in spec.multi_filters:
+                raise ValueError(f"Cannot filter by {field}")
+            filters[field] = value if isinstance(value, list) else [value]
+    return ListQuery(filters=filters, ranges=ranges)
+
+
+def _check_patch(spec: CollectionSpec, patch: Dict[str, Any]):
+    if not patch:
+        raise ValueError("patch is empty")
+    unknown = [field for field in patch if field not in spec.model.model_fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    protected = [field for field in patch if field in PROTECTED_FIELDS]
+    if protected:
+        raise ValueError(f"Cannot update {', '.join(protected)}")
+
+
+def _matching_ids(spec: CollectionSpec, query: Optional[ListQuery]) -> List[Any]:
+    """Keys of the records matched by a filter query (call with the file locked)"""
+    if query is None:
+        return []
+    items, _ = run_query(spec, query)
+    key = record_key(spec.collection)
+    return [item[0].get(key) for item in items]
+
+
+async def bulk_update(
+    spec: CollectionSpec,
+    update: BulkUpdate,
+    finish: Optional[Callable[[Transaction], None]] = None,
+    event: Optional[str] = None
+) -> BulkResult:
+    """Patch the records given by id or matching a filter, in one transaction.
+
+    `finish` runs once after the changes in the same transaction, e.g. to
+    recompute derived statistics. `event` names the record type of the
+    `<event>.bulk_updated` event published for the change. An invalid request
+    raises ValueError, patched records failing validation InvalidRecordsError.
+    """
+    if (update.ids is None) == (update.filter is None):
+        raise ValueError("Give either ids or filter")
+    _check_patch(spec, update.patch)
+    query = _filter_query(spec, update.filter) if update.filter is not None else None
+
+    def apply(txn: Transaction) -> Tuple[BulkResult, List[Any], List[Dict[str, Any]]]:
+        result = BulkResult()
+        ids = update.ids if query is None else _matching_ids(spec, query)
+        changes, errors = [], []
+        for record_id in dict.fromkeys(ids):
+            record = txn.get(spec.collection, record_id)
+            if record is None:
+                result.not_found.append(record_id)
+                continue
+            result.matched += 1
+            try:
+                instance = spec.model.model_validate({**record, **update.patch})
+            except ValidationError as e:
+                errors.append({"id": record_id, "errors": [
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+                ]})
+                continue
+            # Store the patched fields as validated (e.g. "5" -> 5.0)
+            dumped = instance.model_dump(mode="json", include=set(update.patch))
+            fields = {field: dumped[field] for field in update.patch if record.get(field) != dumped[field]}
+            if fields:
+                changes.append((record_id, fields))
+        if errors:
+            # Reported after the transaction; nothing has been changed
+            return result, [], errors
+        for record_id, fields in changes:
+            txn.patch(spec.collection, record_id, fields)
+        result.updated = len(changes)
+        if changes and finish is not None:
+            finish(txn)
+        return result, [record_id for record_id, _ in changes], []
+
+    result, changed, errors = await data_manager.aupdate(spec.filename, apply)
+    if errors:
+        raise InvalidRecordsError(errors)
+    if changed and event is not None:
+        event_bus.publish(f"{event}.bulk_updated", bulk_event(changed))
+    return result
+
+
+async def bulk_delete(
+    spec: CollectionSpec,
+    ids: List[str],
+    finish: Optional[Callable[[Transaction], None]] = None,
+    event: Optional[str] = None
+) -> BulkResult:
+    """Delete the records with the given ids in one transaction, publishing `<event>.bulk_deleted`"""
+    def apply(txn: Transaction) -> List[Any]:
+        deleted = txn.delete_many(spec.collection, unique)
+        if deleted and finish is not None:
+            finish(txn)
+        return deleted
+
+    unique = list(dict.fromkeys(ids))
+    deleted = await data_manager.aupdate(spec.filename, apply)
+    if deleted and event is not None:
+        event_bus.publish(f"{event}.bulk_deleted", bulk_event(deleted))
+    found = set(deleted)
+    return BulkResult(
+        matched=len(deleted),
+        deleted=len(deleted),
+        not_found=[record_id for record_id in unique if record_id not in found]
+    )
@@ -1,9 +1,31 @@
+import asyncio
+import functools
 import json
-import shutil
+import os
+import threading
+import uuid
+from bisect import bisect_left, bisect_right, insort
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, date
-from typing import Any, Dict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from app.config import settings
+from app.services.backup_service import BackupWorker
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 
 class DateTimeEncoder(json.JSONEncoder):
@@ -16,13 +38,710 @@ class DateTimeEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+def _encode_default(obj):
+    """Fallback encoder for orjson/msgpack (dates as ISO strings)"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+class JSONSerializer:
+    """Stdlib JSON, indented (human-readable) or compact"""
+
+    def __init__(self, name: str, indent: Optional[int]):
+        self.name = name
+        self.indent = indent
+        self.separators = None if indent else (",", ":")
+
+    def dumps(self, data: Any) -> bytes:
+        return json.dumps(
+            data, indent=self.indent, separators=self.separators,
+            ensure_ascii=False, cls=DateTimeEncoder
+        ).encode('utf-8')
+
+    def loads(self, content: bytes) -> Any:
+        return json.loads(content)
+
+
+class OrjsonSerializer:
+    """Compact JSON through orjson (optional dependency)"""
+
+    name = "orjson"
+
+    def dumps(self, data: Any) -> bytes:
+        return orjson.dumps(data, default=_encode_default, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, content: bytes) -> Any:
+        return orjson.loads(content)
+
+
+class MsgpackSerializer:
+    """Binary msgpack (optional dependency), smallest and fastest for large collections"""
+
+    name = "msgpack"
+
+    def dumps(self, data: Any) -> bytes:
+        return msgpack.packb(data, default=_encode_default, use_bin_type=True)
+
+    def loads(self, content: bytes) -> Any:
+        return msgpack.unpackb(content, raw=False, strict_map_key=False)
+
+
+def get_serializer(name: str):
+    """Get the serializer for a data_format setting value"""
+    if name == "json":
+        return JSONSerializer("json", 2)
+    if name == "json-compact":
+        return JSONSerializer("json-compact", None)
+    if name == "orjson":
+        if orjson is not None:
+            return OrjsonSerializer()
+        print("Warning: orjson is not installed, writing compact JSON instead")
+        return JSONSerializer("json-compact", None)
+    if name == "msgpack":
+        if msgpack is not None:
+            return MsgpackSerializer()
+        print("Warning: msgpack is not installed, writing compact JSON instead")
+        return JSONSerializer("json-compact", None)
+    raise ValueError(f"Unknown data format: {name}")
+
+
+# First byte of a msgpack document (fixmap, map16, map32); JSON starts with
+# whitespace, '{' or '['
+MSGPACK_MAP_MARKERS = set(range(0x80, 0x90)) | {0xde, 0xdf}
+
+
+def load_document(content: bytes) -> Any:
+    """Decode a data file in any supported format, detected from its content"""
+    if content and content[0] in MSGPACK_MAP_MARKERS:
+        if msgpack is None:
+            raise Exception("msgpack is required to read this data file")
+        return msgpack.unpackb(content, raw=False, strict_map_key=False)
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+# Field that identifies a record in each collection (default: "id")
+COLLECTION_KEYS = {
+    "games": "appid",
+}
+
+
+def record_key(collection: str) -> str:
+    """Get the identifying field for records of a collection"""
+    return COLLECTION_KEYS.get(collection, "id")
+
+
+# Field that records of dated collections are ordered by (see DateIndex)
+DATE_FIELDS = {
+    "expenses": "date",
+    "income": "date",
+    "flights": "date",
+}
+
+
+def sort_key(value: Any, record_id: Any) -> tuple:
+    """Total order over field values: None sorts last, ties broken by record key"""
+    if value is None:
+        return (1, 0, record_id or "")
+    return (0, value, record_id or "")
+
+
+class _Top:
+    """Compares greater than any record key (upper bound for inclusive ranges)"""
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+
+_TOP = _Top()
+
+
+def key_span(keys: List[tuple], low: Any = None, high: Any = None) -> Tuple[int, int]:
+    """Slice of sorted sort_key()s whose value lies in [low, high].
+
+    Either bound may be None for an open end; keys without a value are only
+    part of the slice when both are.
+    """
+    if low is None and high is None:
+        return 0, len(keys)
+    lo = bisect_left(keys, (0, low)) if low is not None else 0
+    hi = bisect_right(keys, (0, high, _TOP)) if high is not None else bisect_left(keys, (1,))
+    return lo, max(lo, hi)
+
+
+class DateIndex:
+    """Sort keys (date, record key) of a dated collection, in order.
+
+    Maintained incrementally by RecordIndex as mutations are applied, so a
+    date range is two bisects plus the matching records: O(log n + k).
+    """
+
+    def __init__(self, field: str, key: str, records: list):
+        self.field = field
+        self.key = key
+        self.keys = sorted(self.key_of(record) for record in records)
+
+    def key_of(self, record: Dict[str, Any]) -> tuple:
+        return sort_key(record.get(self.field), record.get(self.key))
+
+    def add(self, record: Dict[str, Any]):
+        insort(self.keys, self.key_of(record))
+
+    def add_many(self, records: List[Dict[str, Any]]):
+        """Add a batch of records with one merge instead of an insort each"""
+        self.keys.extend(sorted(self.key_of(record) for record in records))
+        # Timsort merges the two sorted runs in linear time
+        self.keys.sort()
+
+    def remove(self, record: Dict[str, Any]):
+        key = self.key_of(record)
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i]
+
+    def span(self, start: Any = None, end: Any = None) -> Tuple[int, int]:
+        """Slice of keys dated within [start, end]"""
+        return key_span(self.keys, start, end)
+
+
+class RecordIndex:
+    """Record key -> list position maps for the collections of one document.
+
+    Maps are built on first use and kept up to date by apply_mutation(), so
+    looking up a record is O(1). A position is always checked against the
+    record it points to, and a map is rebuilt when its collection was replaced
+    or changed size behind its back (e.g. by in-place edits), so a stale map
+    can cost a rebuild but never returns the wrong record.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        # collection -> (records list, its length when last synced, key -> position)
+        self._maps: Dict[str, Tuple[list, int, Dict[Any, int]]] = {}
+        # dated collection -> (records list, its length when last synced, DateIndex)
+        self._dates: Dict[str, Tuple[list, int, DateIndex]] = {}
+
+    def _map(self, collection: str) -> Optional[Dict[Any, int]]:
+        records = self.data.get(collection)
+        if not isinstance(records, list):
+            return None
+        entry = self._maps.get(collection)
+        if entry is None or entry[0] is not records or entry[1] != len(records):
+            return self._rebuild(collection, records)
+        return entry[2]
+
+    def _rebuild(self, collection: str, records: list) -> Dict[Any, int]:
+        key = record_key(collection)
+        positions = {}
+        for i, record in enumerate(records):
+            positions.setdefault(record.get(key), i)
+        self._maps[collection] = (records, len(records), positions)
+        return positions
+
+    def position(self, collection: str, record_id: Any) -> Optional[int]:
+        """Position of the record with the given key, or None"""
+        positions = self._map(collection)
+        if positions is None:
+            return None
+        pos = positions.get(record_id)
+        if pos is None:
+            return None
+        records = self.data[collection]
+        if pos < len(records) and records[pos].get(record_key(collection)) == record_id:
+            return pos
+        return self._rebuild(collection, records).get(record_id)
+
+    def get(self, collection: str, record_id: Any) -> Optional[Dict[str, Any]]:
+        """Get a record by its key"""
+        pos = self.position(collection, record_id)
+        return None if pos is None else self.data[collection][pos]
+
+    def dates(self, collection: str) -> Optional[DateIndex]:
+        """Date index of a dated collection, built on first use"""
+        field = DATE_FIELDS.get(collection)
+        if field is None:
+            return None
+        records = self.data.get(collection)
+        if not isinstance(records, list):
+            return DateIndex(field, record_key(collection), [])
+        entry = self._dates.get(collection)
+        if entry is None or entry[0] is not records or entry[1] != len(records):
+            entry = self._dates[collection] = (
+                records, len(records), DateIndex(field, record_key(collection), records)
+            )
+        return entry[2]
+
+    def _synced(self, collection: str, records: list, positions: Dict[Any, int]):
+        self._maps[collection] = (records, len(records), positions)
+
+    def _dates_synced(self, collection: str, expected: int) -> Optional[DateIndex]:
+        """The date index of a collection if it was in sync before the change"""
+        records = self.data[collection]
+        entry = self._dates.get(collection)
+        if entry is None or entry[0] is not records or entry[1] != expected:
+            self._dates.pop(collection, None)
+            return None
+        self._dates[collection] = (records, len(records), entry[2])
+        return entry[2]
+
+    def inserted(self, collection: str):
+        """Account for a record appended to a collection"""
+        records = self.data[collection]
+        dates = self._dates_synced(collection, len(records) - 1)
+        if dates is not None:
+            dates.add(records[-1])
+        entry = self._maps.get(collection)
+        if entry is None or entry[0] is not records or entry[1] != len(records) - 1:
+            self._maps.pop(collection, None)
+            return
+        positions = entry[2]
+        positions.setdefault(records[-1].get(record_key(collection)), len(records) - 1)
+        self._synced(collection, records, positions)
+
+    def extended(self, collection: str, count: int):
+        """Account for `count` records appended to a collection at once"""
+        records = self.data[collection]
+        dates = self._dates_synced(collection, len(records) - count)
+        if dates is not None:
+            dates.add_many(records[len(records) - count:])
+        entry = self._maps.get(collection)
+        if entry is None or entry[0] is not records or entry[1] != len(records) - count:
+            self._maps.pop(collection, None)
+            return
+        positions = entry[2]
+        key = record_key(collection)
+        for i in range(len(records) - count, len(records)):
+            positions.setdefault(records[i].get(key), i)
+        self._synced(collection, records, positions)
+
+    def replaced(self, collection: str, pos: int, old: Dict[str, Any]):
+        """Account for a record whose key or date may have changed"""
+        records = self.data[collection]
+        dates = self._dates_synced(collection, len(records))
+        if dates is not None and dates.key_of(old) != dates.key_of(records[pos]):
+            dates.remove(old)
+            dates.add(records[pos])
+        positions = self._maps[collection][2]
+        key = record_key(collection)
+        old_id, new_id = old.get(key), records[pos].get(key)
+        if new_id != old_id:
+            positions.pop(old_id, None)
+            positions.setdefault(new_id, pos)
+
+    def deleted(self, collection: str, pos: int, old: Dict[str, Any]):
+        """Account for a removed record; later records move up one position"""
+        records = self.data[collection]
+        dates = self._dates_synced(collection, len(records) + 1)
+        if dates is not None:
+            dates.remove(old)
+        positions = self._maps[collection][2]
+        key = record_key(collection)
+        positions.pop(old.get(key), None)
+        for i in range(pos, len(records)):
+            positions[records[i].get(key)] = i
+        self._synced(collection, records, positions)
+
+    def reset(self, collection: Optional[str] = None):
+        """Forget the indexes of a collection (or all) that was replaced or edited in place"""
+        if collection is None:
+            self._maps.clear()
+            self._dates.clear()
+            return
+        self._maps.pop(collection, None)
+        self._dates.pop(collection, None)
+
+
+def apply_mutation(data: Dict[str, Any], mutation: Dict[str, Any], index: Optional[RecordIndex] = None) -> Any:
+    """Apply a single mutation record to a document in place.
+
+    Supported ops:
+      insert  - append `record` to `collection`
+      replace - replace the record with key `id` in `collection` by `record`
+      patch   - update `fields` of the record with key `id` in `collection`
+      delete  - remove the record with key `id` from `collection`
+      set     - set top-level `key` to `value`
+
+    Records are located through `index` when given (O(1)), which is kept up to
+    date along with its date indexes; otherwise by a linear scan.
+
+    Returns the stored record (insert/replace/patch), True (delete/set), or a falsy
+    value when the targeted record does not exist.
+    """
+    op = mutation["op"]
+
+    if op == "set":
+        data[mutation["key"]] = mutation["value"]
+        if index is not None:
+            index.reset(mutation["key"])
+        return True
+
+    collection = mutation["collection"]
+    records = data.setdefault(collection, [])
+
+    if op == "insert":
+        records.append(mutation["record"])
+        if index is not None:
+            index.inserted(collection)
+        return mutation["record"]
+
+    if op not in ("replace", "patch", "delete"):
+        raise ValueError(f"Unknown mutation op: {op}")
+
+    record_id = mutation["id"]
+    if index is not None:
+        pos = index.position(collection, record_id)
+    else:
+        key = record_key(collection)
+        pos = next((i for i, record in enumerate(records) if record.get(key) == record_id), None)
+    if pos is None:
+        return None
+
+    old = records[pos]
+    if op == "delete":
+        records.pop(pos)
+        if index is not None:
+            index.deleted(collection, pos, old)
+        return True
+
+    if op == "replace":
+        records[pos] = mutation["record"]
+    else:
+        records[pos] = {**old, **mutation["fields"]}
+    if index is not None:
+        index.replaced(collection, pos, old)
+    return records[pos]
+
+
+def insert_mutation(collection: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    return {"op": "insert", "collection": collection, "record": record}
+
+
+def replace_mutation(collection: str, record_id: Any, record: Dict[str, Any]) -> Dict[str, Any]:
+    return {"op": "replace", "collection": collection, "id": record_id, "record": record}
+
+
+def patch_mutation(collection: str, record_id: Any, fields: Dict[str, Any]) -> Dict[str, Any]:
+    return {"op": "patch", "collection": collection, "id": record_id, "fields": fields}
+
+
+def delete_mutation(collection: str, record_id: Any) -> Dict[str, Any]:
+    return {"op": "delete", "collection": collection, "id": record_id}
+
+
+def set_mutation(key: str, value: Any) -> Dict[str, Any]:
+    return {"op": "set", "key": key, "value": value}
+
+
+class TransactionObserver:
+    """Sees the changes of every transaction on a data file (see DataManager.observe).
+
+    Used to maintain derived values incrementally: changed() and key_set()
+    are called as mutations are applied, committing() once before a
+    transaction that changed anything is persisted; it may add mutations of
+    its own. Per-transaction state belongs in `txn.context`.
+    """
+
+    def changed(self, txn: "Transaction", collection: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        """A record was inserted (old is None), replaced or patched, or deleted (new is None)"""
+
+    def key_set(self, txn: "Transaction", key: str):
+        """A top-level key was replaced as a whole"""
+
+    def committing(self, txn: "Transaction"):
+        """The transaction is about to be persisted"""
+
+
+class Transaction:
+    """Read-modify-write view of a document, passed to DataManager.update callbacks.
+
+    Record methods apply to `data` immediately and are recorded as mutations,
+    so backends can persist them incrementally. Callbacks that edit `data`
+    directly must call mark_dirty() to have the whole document written.
+    """
+
+    def __init__(
+        self,
+        data: Dict[str, Any],
+        index: Optional[RecordIndex] = None,
+        observers: Tuple[TransactionObserver, ...] = ()
+    ):
+        self.data = data
+        self.index = index if index is not None else RecordIndex(data)
+        self.mutations: List[Dict[str, Any]] = []
+        self.dirty = False
+        self.observers = observers
+        # Per-transaction state of the observers
+        self.context: Dict[Any, Any] = {}
+
+    def apply(self, mutation: Dict[str, Any]) -> Any:
+        """Apply a mutation record and remember it if it changed anything"""
+        old = None
+        if self.observers and mutation["op"] in ("replace", "patch", "delete"):
+            old = self.index.get(mutation["collection"], mutation["id"])
+        result = apply_mutation(self.data, mutation, self.index)
+        if result:
+            self.mutations.append(mutation)
+            if self.observers:
+                self._notify(mutation, old, result)
+        return result
+
+    def _notify(self, mutation: Dict[str, Any], old: Optional[Dict[str, Any]], result: Any):
+        op = mutation["op"]
+        for observer in self.observers:
+            if op == "set":
+                observer.key_set(self, mutation["key"])
+            elif op == "delete":
+                observer.changed(self, mutation["collection"], old, None)
+            else:
+                observer.changed(self, mutation["collection"], old, result)
+
+    def get(self, collection: str, record_id: Any) -> Optional[Dict[str, Any]]:
+        """Get a single record from a collection by its key"""
+        return self.index.get(collection, record_id)
+
+    def insert(self, collection: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        return self.apply(insert_mutation(collection, record))
+
+    def insert_many(self, collection: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Append a batch of records, updating the indexes once for the whole batch"""
+        if not records:
+            return records
+        self.data.setdefault(collection, []).extend(records)
+        self.mutations.extend(insert_mutation(collection, record) for record in records)
+        self.index.extended(collection, len(records))
+        for observer in self.observers:
+            for record in records:
+                observer.changed(self, collection, None, record)
+        return records
+
+    def delete_many(self, collection: str, record_ids: List[Any]) -> List[Any]:
+        """Delete a batch of records in one pass over the collection; returns the deleted keys"""
+        records = self.data.get(collection)
+        wanted = set(record_ids)
+        if not isinstance(records, list) or not wanted:
+            return []
+        key = record_key(collection)
+        kept, deleted, removed = [], [], []
+        for record in records:
+            record_id = record.get(key)
+            if record_id in wanted:
+                wanted.discard(record_id)
+                deleted.append(record_id)
+                removed.append(record)
+            else:
+                kept.append(record)
+        if deleted:
+            # Same list object, so readers holding the collection stay valid
+            records[:] = kept
+            self.index.reset(collection)
+            self.mutations.extend(delete_mutation(collection, record_id) for record_id in deleted)
+            for observer in self.observers:
+                for record in removed:
+                    observer.changed(self, collection, record, None)
+        return deleted
+
+    def replace(self, collection: str, record_id: Any, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self.apply(replace_mutation(collection, record_id, record))
+
+    def patch(self, collection: str, record_id: Any, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self.apply(patch_mutation(collection, record_id, fields))
+
+    def delete(self, collection: str, record_id: Any) -> bool:
+        return bool(self.apply(delete_mutation(collection, record_id)))
+
+    def set(self, key: str, value: Any):
+        self.apply(set_mutation(key, value))
+
+    def mark_dirty(self):
+        """Flag in-place edits of `data` that need a full document write"""
+        self.dirty = True
+
+
+class _FileLock:
+    """Re-entrant per-file lock: a thread lock in-process plus an fcntl
+    advisory lock on a sidecar lock file across worker processes"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+        self._pid: Optional[int] = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            if self._fd is None or self._pid != os.getpid():
+                # A forked worker must not share the parent's lock descriptor
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                self._pid = os.getpid()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._depth -= 1
+        if self._depth == 0 and fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+        return False
+
+    @property
+    def local(self) -> threading.RLock:
+        """The in-process lock alone, which writers in this process also hold"""
+        return self._lock
+
+
+class JSONFileBackend:
+    """Stores each data file as a standalone document (JSON or msgpack)"""
+
+    name = "json"
+
+    def __init__(self, data_dir: Path, serializer=None):
+        self.data_dir = data_dir
+        self.serializer = serializer or get_serializer(settings.data_format)
+
+    def _get_file_path(self, filename: str) -> Path:
+        """Get full path for a data file"""
+        return self.data_dir / filename
+
+    def exists(self, filename: str) -> bool:
+        """Check whether the data file exists"""
+        return self._get_file_path(filename).exists()
+
+    def needs_backup(self, mutations: Optional[List[Dict[str, Any]]]) -> bool:
+        """Every write replaces the file, so back it up first"""
+        return True
+
+    def backup_path(self, filename: str) -> Path:
+        """The file the backup worker snapshots after a write"""
+        return self._get_file_path(filename)
+
+    def signature(self, filename: str) -> Optional[Tuple[int, int, int]]:
+        """Get the (mtime, size, inode) signature used to validate the cache"""
+        try:
+            stat = os.stat(self._get_file_path(filename))
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def load(self, filename: str) -> Dict[str, Any]:
+        """Load the whole document from disk, in whichever format it was written"""
+        return load_document(self._get_file_path(filename).read_bytes())
+
+    def save(self, filename: str, data: Dict[str, Any], mutations: Optional[List[Dict[str, Any]]] = None):
+        """Rewrite the whole document; a JSON file cannot be patched in place"""
+        file_path = self._get_file_path(filename)
+
+        # Atomic write: write to temp file, then rename
+        temp_path = file_path.with_suffix('.tmp')
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(self.serializer.dumps(data))
+
+            # Rename temp file to actual file (atomic on most systems)
+            temp_path.replace(file_path)
+        except Exception:
+            if temp_path.exists():
+                temp_path.unlink()
+            raise
+
+    def close(self):
+        """Nothing to release for plain data files"""
+
+
+def create_backend(data_dir: Path, backups: Optional[BackupWorker] = None):
+    """Create the storage backend selected by settings.storage_backend"""
+    if settings.storage_backend == "sqlite":
+        from app.services.sqlite_storage import SQLiteBackend
+        return SQLiteBackend(data_dir / settings.sqlite_db_file)
+    if settings.storage_backend == "json":
+        if settings.journal_enabled:
+            from app.services.journal_storage import JournaledJSONBackend
+            return JournaledJSONBackend(data_dir, backups)
+        return JSONFileBackend(data_dir)
+    raise ValueError(f"Unknown storage backend: {settings.storage_backend}")
+
+
+class _PendingBatch:
+    """Mutations applied in memory and waiting for a group commit flush"""
+
+    def __init__(self, data: Dict[str, Any], loop: asyncio.AbstractEventLoop):
+        self.data = data
+        self.loop = loop
+        self.mutations: List[Dict[str, Any]] = []
+        self.futures: List[asyncio.Future] = []
+        self.task: Optional[asyncio.Task] = None
+
+
+def _settle(future: asyncio.Future, error: Optional[Exception]):
+    """Resolve a waiter future (runs on its event loop)"""
+    if future.done():
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+
+
 class DataManager:
-    """Manages JSON file operations with atomic writes and backups"""
+    """Manages data file operations with atomic writes and backups.
+
+    Storage is delegated to a pluggable backend (JSON files, optionally with
+    a write-ahead journal, or SQLite).
+    Parsed documents are kept in memory and only re-read when the backend's
+    signature for the file changes, e.g. after an edit by another process.
+    The returned document is the cached object itself: callers should change
+    it only inside update()/aupdate() or through the record-level methods,
+    which serialize read-modify-write cycles per file.
+
+    With group commit enabled (group_commit_window_ms > 0), async commits to
+    the same file within the window are applied in memory and flushed as a
+    single write; each caller resumes once its change is durable.
+
+    The async methods (aread, awrite, aupdate, ...) run file I/O and
+    (de)serialization on a bounded thread pool so a slow disk never blocks
+    the event loop.
+
+    Backups are taken after full-document writes by a background worker
+    (see backup_service), never on the request path.
+    """
 
     def __init__(self):
         self.data_dir = settings.data_dir
         self.backup_dir = settings.backup_dir
         self._ensure_directories()
+        self.backups = BackupWorker(self.backup_dir) if settings.backup_enabled else None
+        self.backend = create_backend(self.data_dir, self.backups)
+        self._cache: Dict[str, Tuple[Any, Dict[str, Any]]] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.group_commit_window = settings.group_commit_window_ms / 1000
+        self._pending: Dict[str, _PendingBatch] = {}
+        self._file_locks: Dict[str, _FileLock] = {}
+        self._async_locks: Dict[str, asyncio.Lock] = {}
+        self._indexes: Dict[str, RecordIndex] = {}
+        self._observers: Dict[str, Tuple[TransactionObserver, ...]] = {}
+        self._versions: Dict[str, int] = {}
+        # Distinguishes this process's version counters (e.g. in ETags)
+        self.instance_id = uuid.uuid4().hex[:12]
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Journal backend: background thread compacting idle journals
+        self._compactor: Optional[threading.Thread] = None
+        self._compactor_stop = threading.Event()
+        self._compactor_lock = threading.Lock()
+        self._batch_stats = {
+            "batches": 0,
+            "commits": 0,
+            "mutations": 0,
+            "max_batch_size": 0,
+            "histogram": {"1": 0, "2-4": 0, "5-16": 0, "17+": 0}
+        }
 
     def _ensure_directories(self):
         """Ensure data and backup directories exist"""
@@ -35,77 +754,476 @@ class DataManager:
         return self.data_dir / filename
 
     def read_data(self, filename: str) -> Dict[str, Any]:
-        """Read data from JSON file"""
-        file_path = self._get_file_path(filename)
-
-        if not file_path.exists():
+        """Read a document, served from the in-memory cache when fresh"""
+        signature = self.backend.signature(filename)
+        if signature is None:
+            if self._cache.pop(filename, None) is not None:
+                self._bump_version(filename)
             return {}
 
+        cached = self._cache.get(filename)
+        if cached is not None and cached[0] == signature:
+            self.cache_hits += 1
+            return cached[1]
+
+        self.cache_misses += 1
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            data = self.backend.load(filename)
         except json.JSONDecodeError:
             return {}
         except Exception as e:
             raise Exception(f"Error reading {filename}: {str(e)}")
 
+        self._cache[filename] = (signature, data)
+        self._bump_version(filename)
+        return data
+
+    def _bump_version(self, filename: str):
+        self._versions[filename] = self._versions.get(filename, 0) + 1
+
+    def version(self, filename: str) -> int:
+        """Counter that changes whenever the cached document changes"""
+        return self._versions.get(filename, 0)
+
+    def current_version(self, filename: str) -> int:
+        """version() after picking up changes made to the file by other processes.
+
+        Costs a signature check; the document is only re-read if it changed.
+        """
+        cached = self._cache.get(filename)
+        if cached is None or cached[0] != self.backend.signature(filename):
+            self.read_data(filename)
+        return self.version(filename)
+
     def write_data(self, filename: str, data: Dict[str, Any], create_backup: bool = True):
-        """Write data to JSON file with atomic write"""
-        file_path = self._get_file_path(filename)
+        """Write a whole document with atomic write"""
+        with self.file_lock(filename):
+            self._persist(filename, data, None, create_backup)
 
-        # Create backup if file exists and backup is enabled
-        if create_backup and file_path.exists() and settings.backup_enabled:
-            self._create_backup(filename)
+    async def run_in_thread(self, fn: Callable, *args) -> Any:
+        """Run blocking storage work on the I/O thread pool"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=settings.io_workers, thread_name_prefix="data-io")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args))
+
+    async def aread(self, filename: str) -> Dict[str, Any]:
+        """Async read_data(), run off the event loop"""
+        return await self.run_in_thread(self.read_data, filename)
+
+    async def awrite(self, filename: str, data: Dict[str, Any], create_backup: bool = True):
+        """Async write_data(), run off the event loop"""
+        async with self._async_lock(filename):
+            await self.run_in_thread(self.write_data, filename, data, create_backup)
+
+    def _persist(
+        self,
+        filename: str,
+        data: Dict[str, Any],
+        mutations: Optional[List[Dict[str, Any]]],
+        create_backup: bool = True
+    ):
+        """Persist a document through the backend and refresh the cache.
+
+        Any pending group commit batch for the file is written along with it.
+        """
+        batch = self._pending.pop(filename, None)
+        if batch is not None:
+            if batch.data is not data:
+                # The document was reloaded since the batch was applied
+                index = self._index_for(filename, data)
+                for mutation in batch.mutations:
+                    apply_mutation(data, mutation, index)
+            if mutations is not None:
+                mutations = batch.mutations + mutations
 
-        # Atomic write: write to temp file, then rename
-        temp_path = file_path.with_suffix('.tmp')
         try:
-            with open(temp_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False, cls=DateTimeEncoder)
+            self._write(filename, data, mutations, create_backup)
+        except Exception as e:
+            if batch is not None:
+                self._resolve_batch(batch, e)
+            raise
 
-            # Rename temp file to actual file (atomic on most systems)
-            temp_path.replace(file_path)
+        if batch is not None:
+            self._resolve_batch(batch)
+
+    def _write(
+        self,
+        filename: str,
+        data: Dict[str, Any],
+        mutations: Optional[List[Dict[str, Any]]],
+        create_backup: bool
+    ):
+        """Write through the backend, refresh the cache and queue a backup"""
+        try:
+            self.backend.save(filename, data, mutations)
         except Exception as e:
-            if temp_path.exists():
-                temp_path.unlink()
+            # The caller may have mutated the cached document in place
+            self._cache.pop(filename, None)
             raise Exception(f"Error writing {filename}: {str(e)}")
 
-    def _create_backup(self, filename: str):
-        """Create a backup of the data file"""
-        file_path = self._get_file_path(filename)
-        if not file_path.exists():
-            return
+        signature = self.backend.signature(filename)
+        if signature is not None:
+            self._cache[filename] = (signature, data)
+        self._bump_version(filename)
+        if mutations is None:
+            # Whole-document writes may carry in-place edits the indexes never saw
+            self._index_for(filename, data).reset()
+        elif self._compactor is None and hasattr(self.backend, "compaction_overdue"):
+            self._start_compactor()
+
+        # Snapshot the written file in the background
+        if create_backup and self.backups is not None and self.backend.needs_backup(mutations):
+            self.backups.submit(self.backend.backup_path(filename))
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_filename = f"{file_path.stem}_{timestamp}.json"
-        backup_path = self.backup_dir / backup_filename
+    def file_lock(self, filename: str) -> _FileLock:
+        """Get the in-process + cross-process lock guarding a data file"""
+        lock = self._file_locks.get(filename)
+        if lock is None:
+            lock = self._file_locks.setdefault(filename, _FileLock(self.data_dir / f".{filename}.lock"))
+        return lock
 
+    def read_lock(self, filename: str) -> threading.RLock:
+        """Get the lock for reading the cached document and its indexes consistently.
+
+        In-process only: other workers' writes replace the file atomically and
+        are picked up through the signature check, so readers never wait on
+        the cross-process lock (or on each other across workers).
+        """
+        return self.file_lock(filename).local
+
+    def _index_for(self, filename: str, data: Dict[str, Any]) -> RecordIndex:
+        """Get the record index of a (cached) document"""
+        index = self._indexes.get(filename)
+        if index is None or index.data is not data:
+            index = self._indexes[filename] = RecordIndex(data)
+        return index
+
+    def record_index(self, filename: str) -> RecordIndex:
+        """Get the record and date indexes of a document (use while holding read_lock or file_lock)"""
+        return self._index_for(filename, self.read_data(filename))
+
+    def observe(self, filename: str, observer: TransactionObserver):
+        """Register an observer of the transactions on a data file"""
+        self._observers[filename] = self._observers.get(filename, ()) + (observer,)
+
+    def _async_lock(self, filename: str) -> asyncio.Lock:
+        """Get the asyncio lock serializing async writers of a data file"""
+        lock = self._async_locks.get(filename)
+        if lock is None:
+            lock = self._async_locks[filename] = asyncio.Lock()
+        return lock
+
+    def _run(self, filename: str, fn: Callable[[Transaction], Any]) -> Tuple[Transaction, Any]:
+        """Run an update callback against the current document"""
+        data = self.read_data(filename)
+        txn = Transaction(data, self._index_for(filename, data), self._observers.get(filename, ()))
         try:
-            shutil.copy2(file_path, backup_path)
-            self._cleanup_old_backups(file_path.stem)
-        except Exception as e:
-            print(f"Warning: Failed to create backup: {str(e)}")
+            result = fn(txn)
+            if txn.mutations or txn.dirty:
+                for observer in txn.observers:
+                    observer.committing(txn)
+        except Exception:
+            # The callback may have left the cached document half-modified
+            self._cache.pop(filename, None)
+            raise
+        return txn, result
 
-    def _cleanup_old_backups(self, file_stem: str):
-        """Remove old backups beyond max_backups limit"""
-        backups = sorted(
-            self.backup_dir.glob(f"{file_stem}_*.json"),
-            key=lambda p: p.stat().st_mtime,
-            reverse=True
-        )
+    def update(self, filename: str, fn: Callable[[Transaction], Any]) -> Any:
+        """Serialized read-modify-write of a document.
 
-        for backup in backups[settings.max_backups:]:
+        `fn` receives a Transaction on the current document while the file is
+        locked (in-process and across workers), so concurrent updates cannot
+        be lost. Its mutations are persisted before the lock is released and
+        its return value is passed through.
+        """
+        with self.file_lock(filename):
+            txn, result = self._run(filename, fn)
+            if txn.dirty:
+                self._persist(filename, txn.data, None)
+            elif txn.mutations:
+                self._persist(filename, txn.data, txn.mutations)
+            return result
+
+    async def aupdate(self, filename: str, fn: Callable[[Transaction], Any]) -> Any:
+        """Async update(), run on the I/O thread pool.
+
+        `fn` runs in a worker thread while the file is locked. With group
+        commit enabled, concurrent updates are coalesced into one write.
+        Returns once the changes are durable.
+        """
+        if self.group_commit_window <= 0:
+            async with self._async_lock(filename):
+                return await self.run_in_thread(self.update, filename, fn)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        async with self._async_lock(filename):
+            result, batch = await self.run_in_thread(self._stage, filename, fn, future)
+        if batch is not None:
+            await future
+        return result
+
+    def _stage(
+        self, filename: str, fn: Callable[[Transaction], Any], future: asyncio.Future
+    ) -> Tuple[Any, Optional[_PendingBatch]]:
+        """Run an update and add its mutations to the file's pending batch"""
+        with self.file_lock(filename):
+            txn, result = self._run(filename, fn)
+            if txn.dirty:
+                # In-place edits cannot be replayed later: write them now
+                self._persist(filename, txn.data, None)
+                return result, None
+            if not txn.mutations:
+                return result, None
+
+            batch = self._pending.get(filename)
+            if batch is None:
+                batch = self._pending[filename] = _PendingBatch(txn.data, future.get_loop())
+                # Scheduled from here so the flush happens even if the caller is cancelled
+                batch.loop.call_soon_threadsafe(self._schedule_flush, filename, batch)
+            elif batch.data is not txn.data:
+                # Document reloaded underneath the batch: carry it over
+                for mutation in batch.mutations:
+                    apply_mutation(txn.data, mutation, txn.index)
+                batch.data = txn.data
+
+            batch.mutations.extend(txn.mutations)
+            batch.futures.append(future)
+            return result, batch
+
+    def commit(self, filename: str, mutations: List[Dict[str, Any]]) -> List[Any]:
+        """Apply mutation records to a document and persist only what changed.
+
+        Backends that support it (SQLite, journal) write one row or journal line
+        per mutation instead of rewriting the whole document.
+        """
+        return self.update(filename, lambda txn: [txn.apply(m) for m in mutations])
+
+    async def acommit(self, filename: str, mutations: List[Dict[str, Any]]) -> List[Any]:
+        """Async commit(), group-committed when enabled"""
+        return await self.aupdate(filename, lambda txn: [txn.apply(m) for m in mutations])
+
+    def _schedule_flush(self, filename: str, batch: _PendingBatch):
+        batch.task = asyncio.ensure_future(self._flush_later(filename, batch))
+
+    async def _flush_later(self, filename: str, batch: _PendingBatch):
+        """Flush a group commit batch once its window has elapsed"""
+        await asyncio.sleep(self.group_commit_window)
+        if self._pending.get(filename) is not batch:
+            return
+        async with self._async_lock(filename):
             try:
-                backup.unlink()
+                await self.run_in_thread(self._flush, filename, batch)
             except Exception:
-                pass
+                pass  # Already delivered to the waiting callers
+
+    def _flush(self, filename: str, batch: _PendingBatch):
+        with self.file_lock(filename):
+            if self._pending.get(filename) is batch:
+                self._persist(filename, self.read_data(filename), [])
+
+    def _resolve_batch(self, batch: _PendingBatch, error: Optional[Exception] = None):
+        """Wake the callers of a flushed batch and record batch metrics"""
+        size = len(batch.futures)
+        stats = self._batch_stats
+        stats["batches"] += 1
+        stats["commits"] += size
+        stats["mutations"] += len(batch.mutations)
+        stats["max_batch_size"] = max(stats["max_batch_size"], size)
+        bucket = "1" if size <= 1 else "2-4" if size <= 4 else "5-16" if size <= 16 else "17+"
+        stats["histogram"][bucket] += 1
+
+        # Flushes run on worker threads: hand the results to the loop
+        for future in batch.futures:
+            try:
+                batch.loop.call_soon_threadsafe(_settle, future, error)
+            except RuntimeError:
+                pass  # Event loop already closed
+
+    def get_group_commit_stats(self) -> Dict[str, Any]:
+        """Get group commit batch size metrics"""
+        stats = self._batch_stats
+        return {
+            "enabled": self.group_commit_window > 0,
+            "window_ms": self.group_commit_window * 1000,
+            "batches": stats["batches"],
+            "commits": stats["commits"],
+            "mutations": stats["mutations"],
+            "avg_batch_size": (stats["commits"] / stats["batches"]) if stats["batches"] else 0,
+            "max_batch_size": stats["max_batch_size"],
+            "histogram": dict(stats["histogram"]),
+            "pending_files": sorted(self._pending.keys())
+        }
+
+    def get_record(self, filename: str, collection: str, record_id: Any) -> Optional[Dict[str, Any]]:
+        """Get a single record from a collection by its key"""
+        data = self.read_data(filename)
+        return self._index_for(filename, data).get(collection, record_id)
+
+    def date_range(
+        self, filename: str, collection: str, start: Optional[str] = None, end: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Records of a dated collection with start <= date <= end, in date order.
+
+        Served from the collection's DateIndex: O(log n + k). Records without a
+        date are only included when no bound is given.
+        """
+        with self.read_lock(filename):
+            index = self.record_index(filename)
+            dates = index.dates(collection)
+            if dates is None:
+                raise ValueError(f"{collection} has no date index")
+            lo, hi = dates.span(start, end)
+            records = (index.get(collection, key[-1]) for key in dates.keys[lo:hi])
+            return [record for record in records if record is not None]
+
+    async def adate_range(
+        self, filename: str, collection: str, start: Optional[str] = None, end: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Async date_range(), run off the event loop"""
+        return await self.run_in_thread(self.date_range, filename, collection, start, end)
+
+    def date_count(self, filename: str, collection: str, start: Optional[str] = None, end: Optional[str] = None) -> int:
+        """Number of records of a dated collection with start <= date <= end: O(log n)"""
+        with self.read_lock(filename):
+            dates = self.record_index(filename).dates(collection)
+            if dates is None:
+                raise ValueError(f"{collection} has no date index")
+            lo, hi = dates.span(start, end)
+            return hi - lo
+
+    async def adate_count(
+        self, filename: str, collection: str, start: Optional[str] = None, end: Optional[str] = None
+    ) -> int:
+        """Async date_count(), run off the event loop"""
+        return await self.run_in_thread(self.date_count, filename, collection, start, end)
+
+    async def aget_record(self, filename: str, collection: str, record_id: Any) -> Optional[Dict[str, Any]]:
+        """Async get_record(), run off the event loop"""
+        return await self.run_in_thread(self.get_record, filename, collection, record_id)
+
+    def insert_record(self, filename: str, collection: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Append a record to a collection"""
+        return self.commit(filename, [insert_mutation(collection, record)])[0]
+
+    def replace_record(
+        self, filename: str, collection: str, record_id: Any, record: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Replace a record in a collection, returning None if it does not exist"""
+        return self.commit(filename, [replace_mutation(collection, record_id, record)])[0]
+
+    def delete_record(self, filename: str, collection: str, record_id: Any) -> bool:
+        """Delete a record from a collection"""
+        return bool(self.commit(filename, [delete_mutation(collection, record_id)])[0])
+
+    def set_value(self, filename: str, key: str, value: Any):
+        """Set a top-level key of a document"""
+        self.commit(filename, [set_mutation(key, value)])
+
+    async def ainsert_record(self, filename: str, collection: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Append a record to a collection (async, group-committed)"""
+        return (await self.acommit(filename, [insert_mutation(collection, record)]))[0]
+
+    async def areplace_record(
+        self, filename: str, collection: str, record_id: Any, record: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Replace a record in a collection (async, group-committed)"""
+        return (await self.acommit(filename, [replace_mutation(collection, record_id, record)]))[0]
+
+    async def apatch_record(
+        self, filename: str, collection: str, record_id: Any, fields: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Update some fields of a record (async, group-committed)"""
+        return (await self.acommit(filename, [patch_mutation(collection, record_id, fields)]))[0]
+
+    async def adelete_record(self, filename: str, collection: str, record_id: Any) -> bool:
+        """Delete a record from a collection (async, group-committed)"""
+        return bool((await self.acommit(filename, [delete_mutation(collection, record_id)]))[0])
+
+    async def aset_value(self, filename: str, key: str, value: Any):
+        """Set a top-level key of a document (async, group-committed)"""
+        await self.acommit(filename, [set_mutation(key, value)])
+
+    def invalidate_cache(self, filename: Optional[str] = None):
+        """Drop cached documents so the next read goes to the backend"""
+        if filename is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(filename, None)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get document cache hit/miss counters"""
+        total = self.cache_hits + self.cache_misses
+        return {
+            "backend": self.backend.name,
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": (self.cache_hits / total) if total else 0,
+            "cached_files": sorted(self._cache.keys())
+        }
 
     def initialize_file(self, filename: str, default_data: Dict[str, Any]):
         """Initialize a data file with default structure if it doesn't exist"""
-        file_path = self._get_file_path(filename)
-        if not file_path.exists():
+        if not self.backend.exists(filename):
             self.write_data(filename, default_data, create_backup=False)
 
+    def _start_compactor(self):
+        """Start the thread that compacts the journals of files no longer being written"""
+        with self._compactor_lock:
+            if self._compactor is None:
+                self._compactor_stop.clear()
+                self._compactor = threading.Thread(
+                    target=self._compact_periodically, name="journal-compactor", daemon=True
+                )
+                self._compactor.start()
+
+    def _compact_periodically(self):
+        # Poll at a fraction of the interval so a journal is compacted at most ~25% late
+        while not self._compactor_stop.wait(max(self.backend.compact_interval / 4, 1)):
+            try:
+                self.compact_journals()
+            except Exception as e:
+                print(f"Warning: Failed to compact journals: {str(e)}")
+
+    def compact_journals(self):
+        """Journal backend: fold the journals that are due into their snapshots"""
+        for filename in self.backend.journaled_files():
+            with self.file_lock(filename):
+                if filename in self._pending or not self.backend.compaction_overdue(filename):
+                    # A pending group commit flushes (and compacts if due) on its own
+                    continue
+                data = self.read_data(filename)
+                self.backend.compact(filename, data)
+                # Same content: keep the cached document and its version
+                signature = self.backend.signature(filename)
+                if signature is not None:
+                    self._cache[filename] = (signature, data)
+
+    def close(self):
+        """Flush and release backend resources (called on shutdown)"""
+        if self._compactor is not None:
+            self._compactor_stop.set()
+            self._compactor.join()
+            self._compactor = None
+        for filename in list(self._pending):
+            with self.file_lock(filename):
+                self._persist(filename, self.read_data(filename), [])
+
+        # Journal backend: fold journals into their snapshots, from the
+        # cached documents (re-read only if another process changed the file)
+        for filename in getattr(self.backend, "journaled_files", list)():
+            with self.file_lock(filename):
+                self.backend.compact(filename, self.read_data(filename))
+                self._cache.pop(filename, None)
+
+        self.backend.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self.backups is not None:
+            self.backups.close()
+
 
 # Global instance
 data_manager = DataManager()
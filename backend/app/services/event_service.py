@@ -0,0 +1,146 @@
+"""In-process change feed streamed to clients over Server-Sent Events.
+
+Services publish typed events (`expense.created`, `flight.deleted`,
+`price.updated`, `gaming.cache.progress`, ...) after their changes are
+committed. Every event gets an id of the form `<stream>-<seq>`; the last
+`events_buffer_size` events are kept in a ring buffer so a client that
+reconnects with `Last-Event-ID` receives what it missed. A client whose id
+is no longer buffered (or comes from before a restart, which changes the
+stream part) gets a `stream.reset` event telling it to refetch.
+
+Subscriptions may be limited to topics: a topic matches the event types it is
+a dot-separated prefix of, e.g. `gaming.cache` or `expense`. The feed is per
+process; with several workers, each one streams its own events.
+"""
+import asyncio
+import json
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+from app.config import settings
+
+# Events queued per subscriber before it is considered too slow
+SUBSCRIBER_QUEUE_SIZE = 256
+
+# Bulk events list the ids they touched only up to this many
+MAX_EVENT_IDS = 500
+
+
+class Event:
+    """A published change"""
+
+    __slots__ = ("seq", "id", "type", "data", "time")
+
+    def __init__(self, seq: int, event_id: str, event_type: str, data: Dict[str, Any]):
+        self.seq = seq
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+        self.time = datetime.now().isoformat()
+
+    def encode(self) -> str:
+        """The event in SSE wire format"""
+        payload = json.dumps({"type": self.type, "time": self.time, "data": self.data}, default=str)
+        return f"id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n"
+
+
+def matches(topics: Optional[Set[str]], event_type: str) -> bool:
+    """Check whether an event type falls under any of the subscribed topics"""
+    if not topics:
+        return True
+    return any(event_type == topic or event_type.startswith(topic + ".") for topic in topics)
+
+
+class Subscription:
+    """Queue of events for one connected client"""
+
+    def __init__(self, topics: Optional[Set[str]]):
+        self.topics = topics
+        self.queue: asyncio.Queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        # Set when the client fell behind; it reconnects and catches up from the buffer
+        self.overflowed = False
+
+    def deliver(self, event: Event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class EventBus:
+    """Publishes events to subscriptions and keeps the recent ones for replay"""
+
+    def __init__(self, buffer_size: int):
+        self.stream = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._buffer: Deque[Event] = deque(maxlen=buffer_size)
+        self._subscriptions: Set[Subscription] = set()
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, event_type: str, data: Optional[Dict[str, Any]] = None) -> Event:
+        """Record an event and deliver it to matching subscriptions (call on the event loop)"""
+        self._seq += 1
+        event = Event(self._seq, f"{self.stream}-{self._seq}", event_type, data or {})
+        self._buffer.append(event)
+        self.published += 1
+        for subscription in list(self._subscriptions):
+            if matches(subscription.topics, event_type):
+                subscription.deliver(event)
+                if subscription.overflowed:
+                    self.dropped += 1
+                    self._subscriptions.discard(subscription)
+        return event
+
+    def subscribe(self, topics: Optional[Iterable[str]] = None) -> Subscription:
+        """Register a subscription for events published from now on"""
+        subscription = Subscription(set(topics) if topics else None)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    def since(self, last_event_id: str) -> Optional[List[Event]]:
+        """Buffered events after the given id, or None if they can no longer be replayed"""
+        stream, _, seq = last_event_id.partition("-")
+        if stream != self.stream or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if seq >= self._seq:
+            return []
+        if not self._buffer or self._buffer[0].seq > seq + 1:
+            # Some of the missed events have already left the buffer
+            return None
+        return [event for event in self._buffer if event.seq > seq]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Feed counters"""
+        return {
+            "stream": self.stream,
+            "last_id": f"{self.stream}-{self._seq}" if self._seq else None,
+            "buffered": len(self._buffer),
+            "subscribers": len(self._subscriptions),
+            "published": self.published,
+            "dropped_subscribers": self.dropped,
+        }
+
+
+def record_event(record: Any) -> Dict[str, Any]:
+    """Payload of a created or updated record event"""
+    if hasattr(record, "model_dump"):
+        record = record.model_dump(mode="json")
+    return {"id": record.get("id"), "record": record}
+
+
+def bulk_event(ids: List[Any], count: Optional[int] = None) -> Dict[str, Any]:
+    """Payload of a bulk change; large batches carry only the count"""
+    count = len(ids) if count is None else count
+    return {"count": count, "ids": ids if len(ids) <= MAX_EVENT_IDS else None}
+
+
+# Global instance
+event_bus = EventBus(settings.events_buffer_size)
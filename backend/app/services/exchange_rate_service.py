@@ -1,8 +1,13 @@
 """Exchange rate service using exchangerate-api.com"""
 import httpx
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Dict, Iterable, Optional
 import asyncio
+from app.utils.singleflight import singleflight
+
+
+class RatesUnavailableError(Exception):
+    """No fetched exchange rate is available for a conversion"""
 
 
 class ExchangeRateService:
@@ -11,25 +16,31 @@ class ExchangeRateService:
     BASE_URL = "https://api.exchangerate-api.com/v4/latest"
     SUPPORTED_CURRENCIES = ["USD", "EUR", "CNY", "JPY", "GBP", "SGD"]
     CACHE_DURATION = timedelta(hours=1)
+    # After a failed fetch the last fetched rates (if any) are used this long before retrying
+    RETRY_AFTER = timedelta(minutes=5)
 
     def __init__(self):
+        # Only rates actually fetched from the API, never defaults
         self._cache: Dict[str, dict] = {}
-        self._cache_time: Optional[datetime] = None
+        self._fetched_at: Dict[str, datetime] = {}
+        self._retry_at: Dict[str, datetime] = {}
 
-    def _is_cache_valid(self) -> bool:
-        """Check if cache is still valid"""
-        if not self._cache_time:
-            return False
-        return datetime.now() - self._cache_time < self.CACHE_DURATION
+    def _is_cache_valid(self, cache_key: str) -> bool:
+        """Check if the cached rates of a base currency are still valid"""
+        fetched_at = self._fetched_at.get(cache_key)
+        return fetched_at is not None and datetime.now() < fetched_at + self.CACHE_DURATION
 
-    async def get_rates(self, base: str = "USD") -> Dict[str, float]:
-        """Get exchange rates for base currency"""
-        if base not in self.SUPPORTED_CURRENCIES:
-            base = "USD"
+    @singleflight
+    async def _fetch_rates(self, base: str) -> Optional[Dict[str, float]]:
+        """Fetched rates of a base currency, refreshed once expired.
 
+        Returns the last fetched (possibly stale) rates when a refresh fails,
+        or None if no fetch for this base has ever succeeded.
+        """
         cache_key = f"rates_{base}"
-        if self._is_cache_valid() and cache_key in self._cache:
-            return self._cache[cache_key]
+        retry_at = self._retry_at.get(cache_key)
+        if self._is_cache_valid(cache_key) or (retry_at is not None and datetime.now() < retry_at):
+            return self._cache.get(cache_key)
 
         try:
             async with httpx.AsyncClient(timeout=10.0) as client:
@@ -37,19 +48,37 @@ class ExchangeRateService:
                 response.raise_for_status()
                 data = response.json()
 
-                rates = {
-                    currency: data["rates"].get(currency, 1.0)
-                    for currency in self.SUPPORTED_CURRENCIES
-                }
-
+                rates = {currency: float(rate) for currency, rate in data["rates"].items() if rate}
                 self._cache[cache_key] = rates
-                self._cache_time = datetime.now()
+                self._fetched_at[cache_key] = datetime.now()
+                self._retry_at.pop(cache_key, None)
                 return rates
 
         except Exception as e:
             print(f"Error fetching exchange rates: {e}")
-            # Return default rates on error
-            return {c: 1.0 for c in self.SUPPORTED_CURRENCIES}
+            # Don't retry on every call
+            self._retry_at[cache_key] = datetime.now() + self.RETRY_AFTER
+            return self._cache.get(cache_key)
+
+    async def get_rates(self, base: str = "USD") -> Dict[str, float]:
+        """Get exchange rates for base currency (1.0 where no rate could be fetched)"""
+        if base not in self.SUPPORTED_CURRENCIES:
+            base = "USD"
+
+        rates = await self._fetch_rates(base) or {}
+        return {currency: rates.get(currency, 1.0) for currency in self.SUPPORTED_CURRENCIES}
+
+    def rates_fetched_at(self, base: str) -> Optional[datetime]:
+        """When the rates of a base currency used for conversions were fetched, if ever"""
+        return self._fetched_at.get(f"rates_{base}")
+
+    async def rates_version(self, base: str) -> str:
+        """Version of the rates get_conversion_factors() would use now, for ETags"""
+        if base not in self.SUPPORTED_CURRENCIES:
+            return "unsupported"
+        await self._fetch_rates(base)
+        fetched_at = self.rates_fetched_at(base)
+        return fetched_at.isoformat() if fetched_at else "unavailable"
 
     async def convert(self, amount: float, from_currency: str, to_currency: str) -> float:
         """Convert amount between currencies"""
@@ -60,6 +89,30 @@ class ExchangeRateService:
         rate = rates.get(to_currency, 1.0)
         return amount * rate
 
+    async def get_conversion_factors(self, base: str, currencies: Iterable[str]) -> Dict[str, float]:
+        """Factors converting amounts in each of `currencies` to `base`, from one rates table.
+
+        Amounts are converted per currency group (subtotal * factor) rather than
+        per record. Raises RatesUnavailableError if a currency has no fetched
+        rate; amounts are never converted with default rates.
+        """
+        currencies = set(currencies)
+        if all(currency.upper() == base for currency in currencies):
+            return {currency: 1.0 for currency in currencies}
+        rates = await self._fetch_rates(base) or {}
+        missing = sorted(
+            currency for currency in currencies
+            if currency.upper() != base and not rates.get(currency.upper())
+        )
+        if missing:
+            raise RatesUnavailableError(
+                f"Exchange rates from {', '.join(missing)} to {base} are unavailable"
+            )
+        return {
+            currency: 1.0 if currency.upper() == base else 1.0 / rates[currency.upper()]
+            for currency in currencies
+        }
+
     def get_currency_symbol(self, currency: str) -> str:
         """Get currency symbol"""
         symbols = {
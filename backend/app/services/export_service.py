@@ -0,0 +1,163 @@
+"""Streaming NDJSON / CSV exports of data collections.
+
+An export takes a snapshot of the collection's record references (records
+are never changed in place, so the snapshot stays consistent while writers
+continue) and encodes it in chunks of rows from a generator. The output is
+never built in memory as a whole; the snapshot holds one reference per
+exported record (O(n) pointers, the records themselves are shared with the
+cached document).
+
+Date ranges mean the same as on the list endpoints: start <= date <= end
+compared as strings (key_span), so an `end` of 2024-01-31 excludes
+timestamps later on that day.
+
+Model-backed collections are exported through the model cache (validated
+models and their cached JSON encoding); plain collections such as Steam
+games are exported as stored.
+"""
+import csv
+import io
+import json
+from typing import Any, Callable, Dict, Iterator, List, Optional, Type
+from pydantic import BaseModel
+from app.services.data_manager import DATE_FIELDS, data_manager, key_span, sort_key
+from app.services.model_cache import ValidatedCollection, model_cache
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Rows per streamed chunk
+CHUNK_ROWS = 500
+
+
+class Export:
+    """A collection export: its chunks of bytes, media type and download file name"""
+
+    def __init__(self, chunks: Iterator[bytes], media_type: str, filename: str):
+        self.chunks = chunks
+        self.media_type = media_type
+        self.filename = filename
+
+
+def _date_span(rows: List[Any], date_of: Callable[[Any], Any], start: Optional[str], end: Optional[str]) -> List[Any]:
+    """Rows dated within [start, end], in date order, bounded by key_span like a DateIndex"""
+    keyed = sorted((sort_key(date_of(row), i), row) for i, row in enumerate(rows))
+    lo, hi = key_span([key for key, _ in keyed], start, end)
+    return [row for _, row in keyed[lo:hi]]
+
+
+def _snapshot(
+    filename: str,
+    collection: str,
+    model: Optional[Type[BaseModel]],
+    date_field: Optional[str],
+    start: Optional[str],
+    end: Optional[str]
+) -> List[Any]:
+    """Model cache items (or plain records) to export, in stored or date order"""
+    filtered = date_field is not None and (start is not None or end is not None)
+    with data_manager.read_lock(filename):
+        if model is None:
+            records = list(data_manager.read_data(filename).get(collection, []))
+            if filtered:
+                records = _date_span(records, lambda r: r.get(date_field), start, end)
+            return records
+        if filtered and DATE_FIELDS.get(collection) == date_field:
+            # Bisect the date index instead of scanning the collection
+            entry = model_cache.items_of(filename, collection, model)
+            return [entry.item_for(r) for r in data_manager.date_range(filename, collection, start, end)]
+        items = list(model_cache.collection(filename, collection, model).items)
+    if filtered:
+        items = _date_span(items, lambda item: getattr(item[1], date_field, None), start, end)
+    return items
+
+
+def _ndjson(rows: List[Any], plain: bool) -> Iterator[bytes]:
+    chunk = []
+    for row in rows:
+        if plain:
+            chunk.append(json.dumps(row, ensure_ascii=False, default=str).encode("utf-8"))
+        else:
+            chunk.append(ValidatedCollection.json_of(row))
+        if len(chunk) >= CHUNK_ROWS:
+            yield b"\n".join(chunk) + b"\n"
+            chunk = []
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
+
+
+def _cell(value: Any) -> Any:
+    """CSV cell: nested values are written as JSON"""
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _csv(rows: List[Any], plain: bool, model: Optional[Type[BaseModel]]) -> Iterator[bytes]:
+    if plain:
+        # Union of the keys, in order of first appearance
+        columns: Dict[str, None] = {}
+        for row in rows:
+            columns.update(dict.fromkeys(row))
+        columns = list(columns)
+    else:
+        columns = list(model.model_fields)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        values = row if plain else row[1].model_dump(mode="json")
+        writer.writerow([_cell(values.get(column)) for column in columns])
+        count += 1
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _stream(
+    fmt: str,
+    filename: str,
+    collection: str,
+    model: Optional[Type[BaseModel]],
+    date_field: Optional[str],
+    start: Optional[str],
+    end: Optional[str]
+) -> Iterator[bytes]:
+    # Runs in the threadpool: the snapshot is taken when streaming starts
+    rows = _snapshot(filename, collection, model, date_field, start, end)
+    plain = model is None
+    if fmt == "csv":
+        yield from _csv(rows, plain, model)
+    else:
+        yield from _ndjson(rows, plain)
+
+
+def export_collection(
+    filename: str,
+    collection: str,
+    model: Optional[Type[BaseModel]],
+    fmt: str = "ndjson",
+    date_field: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    name: Optional[str] = None
+) -> Export:
+    """Export a collection as NDJSON or CSV, optionally limited to a date range"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if (start or end) and date_field is None:
+        raise ValueError(f"{collection} cannot be filtered by date")
+    return Export(
+        _stream(fmt, filename, collection, model, date_field, start, end),
+        EXPORT_FORMATS[fmt],
+        f"{name or collection}.{fmt}"
+    )
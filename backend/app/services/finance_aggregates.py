@@ -0,0 +1,246 @@
+"""Running totals of the finance data file, maintained incrementally.
+
+The totals (overall, per category, and per currency and category) are stored
+under the `statistics` key of finance.json and kept in step by a
+TransactionObserver: every expense or income inserted, replaced, patched or
+deleted through DataManager adjusts them by its delta, and the new totals are
+written with the same commit. get_statistics() then reads them instead of
+summing every record; budget spending is the category total of the budget's
+category.
+
+A whole-collection replacement or an in-place edit triggers a full
+recompute, as does the first transaction on a file without totals. Totals
+written by an older schema, or that do not match the records, are rebuilt
+when read: each document loaded from disk (e.g. after a hand edit of the
+file, or a group commit replayed onto a file another worker changed) is
+compared with a full recompute once, and from then on the observer keeps
+its totals in step. check() compares the stored totals with a full
+recompute.
+
+    python -m app.services.finance_aggregates check|rebuild
+"""
+import math
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from app.services.data_manager import Transaction, TransactionObserver, data_manager
+
+STATS_KEY = "statistics"
+SCHEMA = 2
+
+# Counts compared exactly by check(); the other totals within float tolerance
+_COUNT_FIELDS = ("expense_count", "income_count", "category_counts", "expense_currency_counts", "income_currency_counts")
+
+# Marks a transaction whose totals must be recomputed from scratch
+_REBUILD = object()
+
+
+def currency_of(record: Dict[str, Any]) -> str:
+    """Currency of an expense or income record (income is recorded in USD)"""
+    return record.get("currency") or "USD"
+
+
+def compute(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Totals of a finance document, summed from every record"""
+    expenses = data.get("expenses", [])
+    income = data.get("income", [])
+    by_category: Dict[str, List[float]] = defaultdict(list)
+    by_currency: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+    for expense in expenses:
+        amount = expense.get("amount") or 0
+        by_category[expense.get("category")].append(amount)
+        by_currency[currency_of(expense)][expense.get("category")].append(amount)
+    income_by_currency: Dict[str, List[float]] = defaultdict(list)
+    for record in income:
+        income_by_currency[currency_of(record)].append(record.get("amount") or 0)
+    return {
+        "schema": SCHEMA,
+        "expense_count": len(expenses),
+        "income_count": len(income),
+        "total_expenses": math.fsum(e.get("amount") or 0 for e in expenses),
+        "total_income": math.fsum(i.get("amount") or 0 for i in income),
+        "expenses_by_category": {category: math.fsum(amounts) for category, amounts in by_category.items()},
+        "category_counts": {category: len(amounts) for category, amounts in by_category.items()},
+        # currency -> category -> sum / count
+        "expenses_by_currency": {
+            currency: {category: math.fsum(amounts) for category, amounts in categories.items()}
+            for currency, categories in by_currency.items()
+        },
+        "expense_currency_counts": {
+            currency: {category: len(amounts) for category, amounts in categories.items()}
+            for currency, categories in by_currency.items()
+        },
+        "income_by_currency": {currency: math.fsum(amounts) for currency, amounts in income_by_currency.items()},
+        "income_currency_counts": {currency: len(amounts) for currency, amounts in income_by_currency.items()},
+    }
+
+
+def _add(sums: Dict[Any, float], counts: Dict[Any, int], key: Any, amount: float, sign: int):
+    """Apply one record's delta to a sum and its count, dropping emptied keys"""
+    sums[key] = sums.get(key, 0) + sign * amount
+    counts[key] = counts.get(key, 0) + sign
+    if counts[key] <= 0:
+        del counts[key]
+        sums.pop(key, None)
+
+
+def _sums(stats: Dict[str, Any]) -> Dict[str, float]:
+    """The float totals of stored statistics, by path"""
+    sums = {"total_expenses": stats.get("total_expenses") or 0, "total_income": stats.get("total_income") or 0}
+    for category, amount in (stats.get("expenses_by_category") or {}).items():
+        sums[f"expenses_by_category.{category}"] = amount
+    for currency, categories in (stats.get("expenses_by_currency") or {}).items():
+        for category, amount in categories.items():
+            sums[f"expenses_by_currency.{currency}.{category}"] = amount
+    for currency, amount in (stats.get("income_by_currency") or {}).items():
+        sums[f"income_by_currency.{currency}"] = amount
+    return sums
+
+
+# The document whose stored totals were last found to match its records
+_verified: List[Any] = [None]
+
+
+def is_current(stats: Any, data: Dict[str, Any]) -> bool:
+    """Check that stored totals have the current schema and match the records (blocking).
+
+    The first call for a document recomputes its totals in full; later calls
+    for the same (cached) document only compare the record counts.
+    """
+    if not (
+        isinstance(stats, dict)
+        and stats.get("schema") == SCHEMA
+        and stats.get("expense_count") == len(data.get("expenses", []))
+        and stats.get("income_count") == len(data.get("income", []))
+    ):
+        return False
+    if _verified[0] is data:
+        return True
+    if _differences(stats, data):
+        return False
+    _verified[0] = data
+    return True
+
+
+def _close(a: float, b: float) -> bool:
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+
+
+def check(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Compare the stored totals with a full recompute"""
+    differences = _differences(data.get(STATS_KEY) or {}, data)
+    return {"consistent": not differences, "differences": differences}
+
+
+def _differences(stored: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields of stored totals that differ from a full recompute"""
+    expected = compute(data)
+    differences = {}
+    for field in ("schema",) + _COUNT_FIELDS:
+        if stored.get(field) != expected[field]:
+            differences[field] = {"stored": stored.get(field), "expected": expected[field]}
+    stored_sums, expected_sums = _sums(stored), _sums(expected)
+    for path in set(stored_sums) | set(expected_sums):
+        have, want = stored_sums.get(path), expected_sums.get(path)
+        if have is None or want is None or not _close(have, want):
+            differences[path] = {"stored": have, "expected": want}
+    return differences
+
+
+class FinanceAggregates(TransactionObserver):
+    """Applies the deltas of expense and income changes to the stored totals"""
+
+    def _working(self, txn: Transaction) -> Any:
+        """Totals being updated by this transaction (copied on first change)"""
+        stats = txn.context.get(self)
+        if stats is None:
+            stored = txn.data.get(STATS_KEY)
+            if isinstance(stored, dict) and stored.get("schema") == SCHEMA:
+                stats = {
+                    **stored,
+                    "expenses_by_category": dict(stored["expenses_by_category"]),
+                    "category_counts": dict(stored["category_counts"]),
+                    "expenses_by_currency": {
+                        currency: dict(categories) for currency, categories in stored["expenses_by_currency"].items()
+                    },
+                    "expense_currency_counts": {
+                        currency: dict(counts) for currency, counts in stored["expense_currency_counts"].items()
+                    },
+                    "income_by_currency": dict(stored["income_by_currency"]),
+                    "income_currency_counts": dict(stored["income_currency_counts"]),
+                }
+            else:
+                stats = _REBUILD
+            txn.context[self] = stats
+        return stats
+
+    def changed(self, txn: Transaction, collection: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        if collection not in ("expenses", "income"):
+            return
+        stats = self._working(txn)
+        if stats is _REBUILD:
+            return
+        if collection == "income":
+            for record, sign in ((old, -1), (new, 1)):
+                if record is not None:
+                    amount = record.get("amount") or 0
+                    stats["total_income"] += sign * amount
+                    stats["income_count"] += sign
+                    _add(stats["income_by_currency"], stats["income_currency_counts"], currency_of(record), amount, sign)
+            return
+        for record, sign in ((old, -1), (new, 1)):
+            if record is None:
+                continue
+            amount = record.get("amount") or 0
+            category = record.get("category")
+            currency = currency_of(record)
+            stats["total_expenses"] += sign * amount
+            stats["expense_count"] += sign
+            _add(stats["expenses_by_category"], stats["category_counts"], category, amount, sign)
+            by_currency = stats["expenses_by_currency"].setdefault(currency, {})
+            currency_counts = stats["expense_currency_counts"].setdefault(currency, {})
+            _add(by_currency, currency_counts, category, amount, sign)
+            if not currency_counts:
+                del stats["expenses_by_currency"][currency]
+                del stats["expense_currency_counts"][currency]
+
+    def key_set(self, txn: Transaction, key: str):
+        if key in ("expenses", "income"):
+            txn.context[self] = _REBUILD
+
+    def committing(self, txn: Transaction):
+        stats = txn.context.pop(self, None)
+        if txn.dirty or stats is _REBUILD or (stats is None and STATS_KEY not in txn.data):
+            stats = compute(txn.data)
+        if stats is not None:
+            txn.set(STATS_KEY, stats)
+
+
+finance_aggregates = FinanceAggregates()
+
+
+def rebuild(txn: Transaction) -> Dict[str, Any]:
+    """Recompute and store the totals (DataManager.update callback)"""
+    stats = compute(txn.data)
+    txn.set(STATS_KEY, stats)
+    return stats
+
+
+def ensure(txn: Transaction) -> Dict[str, Any]:
+    """The stored totals, rebuilt first if they are missing or stale (DataManager.update callback)"""
+    stats = txn.data.get(STATS_KEY)
+    if is_current(stats, txn.data):
+        return stats
+    return rebuild(txn)
+
+
+if __name__ == "__main__":
+    from app.config import settings
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    if command == "rebuild":
+        totals = data_manager.update(settings.finance_data_file, rebuild)
+        print(f"Rebuilt: {totals['expense_count']} expenses, {totals['income_count']} income records")
+    else:
+        report = check(data_manager.read_data(settings.finance_data_file))
+        print("consistent" if report["consistent"] else report["differences"])
+    data_manager.close()
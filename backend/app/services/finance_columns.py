@@ -0,0 +1,512 @@
+"""Columnar mirror of finance expenses and income for reports.
+
+With NumPy installed (`pip install numpy`), each collection is mirrored as
+arrays: float64 amounts, int32 day ordinals and months, and int32 codes of
+its dictionary-encoded fields (category, merchant, currency for expenses;
+type, source, currency for income), plus (row, tag code) pairs for expense
+tags. A TransactionObserver keeps the mirror current in O(1) per change:
+rows are appended, and the row of a replaced or deleted record is marked
+dead, with the arrays compacted once half the rows are dead. Filters and
+group-bys are vectorized (np.isin, np.unique, np.bincount).
+
+Without NumPy the same queries run as a loop over the records.
+"""
+from collections import defaultdict
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from app.services.data_manager import Transaction, TransactionObserver, data_manager
+from app.services.finance_rollups import day_of, period_of
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# collection -> dictionary-encoded fields
+ENCODED_FIELDS = {
+    "expenses": ("category", "merchant", "currency"),
+    "income": ("type", "source", "currency"),
+}
+# collection -> multi-valued field, grouped and filtered as "tag"
+TAG_FIELDS = {"expenses": "tags"}
+TIME_KEYS = ("day", "week", "month", "year")
+# Per-group measures besides percentiles ("p50", "p95", "p99.9", ...)
+MEASURES = ("sum", "count", "avg", "min", "max")
+
+# Compact once this many rows (and at least half of them) are dead
+_COMPACT_MIN_DEAD = 1024
+
+
+def group_keys(collection: str) -> Tuple[str, ...]:
+    """The keys a collection can be grouped and filtered by"""
+    tag = ("tag",) if collection in TAG_FIELDS else ()
+    return ENCODED_FIELDS[collection] + TIME_KEYS + tag
+
+
+def percentile_of(measure: str) -> Optional[float]:
+    """The percentile (0-100) named by a measure like "p95", or None"""
+    if not measure.startswith("p"):
+        return None
+    try:
+        q = float(measure[1:])
+    except ValueError:
+        return None
+    return q if 0 <= q <= 100 else None
+
+
+def check_measures(measures: Sequence[str]):
+    unknown = [measure for measure in measures if measure not in MEASURES and percentile_of(measure) is None]
+    if unknown:
+        raise ValueError(f"Unknown measures: {', '.join(unknown)}")
+
+
+def _value(record: Dict[str, Any], field: str) -> Any:
+    value = record.get(field)
+    if field == "currency" and not value:
+        return "USD"
+    return value
+
+
+def _ordinal(value: Optional[str]) -> Optional[int]:
+    """Day ordinal of a date bound (only the YYYY-MM-DD part is used)"""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value[:10]).toordinal()
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}")
+
+
+@lru_cache(maxsize=16384)
+def _day_codes(day: str) -> Tuple[int, int]:
+    """Day ordinal and month number (year * 12 + month - 1) of a YYYY-MM-DD day"""
+    return date.fromisoformat(day).toordinal(), int(day[:4]) * 12 + int(day[5:7]) - 1
+
+
+class _Dictionary:
+    """Dictionary encoding of the values of one field"""
+
+    def __init__(self):
+        self.values: List[Any] = []
+        self.codes: Dict[Any, int] = {}
+
+    def encode(self, value: Any) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _vector_measures(amounts: Any, inverse: Any, groups: int, measures: Sequence[str]) -> List[Dict[str, Any]]:
+    """Measures of the amounts of each group (inverse maps amounts to groups)"""
+    counts = np.bincount(inverse, minlength=groups)
+    sums = np.bincount(inverse, weights=amounts, minlength=groups)
+    columns: Dict[str, Any] = {}
+    ordered = starts = None
+    for measure in measures:
+        if measure == "sum":
+            columns[measure] = sums
+        elif measure == "count":
+            columns[measure] = counts
+        elif measure == "avg":
+            columns[measure] = sums / counts
+        else:
+            if ordered is None:
+                # Amounts sorted within each group, groups laid out in order
+                ordered = amounts[np.lexsort((amounts, inverse))]
+                starts = np.cumsum(counts) - counts
+            if measure == "min":
+                columns[measure] = ordered[starts]
+            elif measure == "max":
+                columns[measure] = ordered[starts + counts - 1]
+            else:
+                # Linear interpolation between closest ranks, as numpy.percentile
+                position = starts + percentile_of(measure) / 100 * (counts - 1)
+                low = np.floor(position).astype(np.int64)
+                high = np.minimum(low + 1, starts + counts - 1)
+                columns[measure] = ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+    return [
+        {measure: int(column[i]) if measure == "count" else float(column[i]) for measure, column in columns.items()}
+        for i in range(groups)
+    ]
+
+
+def _python_measures(amounts: List[float], measures: Sequence[str]) -> Dict[str, Any]:
+    """Measures of the amounts of one group"""
+    ordered = sorted(amounts) if any(measure not in ("sum", "count", "avg") for measure in measures) else amounts
+    total = sum(amounts)
+    values: Dict[str, Any] = {}
+    for measure in measures:
+        if measure == "sum":
+            values[measure] = total
+        elif measure == "count":
+            values[measure] = len(amounts)
+        elif measure == "avg":
+            values[measure] = total / len(amounts)
+        elif measure == "min":
+            values[measure] = ordered[0]
+        elif measure == "max":
+            values[measure] = ordered[-1]
+        else:
+            position = percentile_of(measure) / 100 * (len(ordered) - 1)
+            low = int(position)
+            high = min(low + 1, len(ordered) - 1)
+            values[measure] = ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+    return values
+
+
+class _Table:
+    """Columns of one collection; rows of replaced or deleted records are marked dead"""
+
+    def __init__(self, collection: str):
+        self.fields = ENCODED_FIELDS[collection]
+        self.tag_field = TAG_FIELDS.get(collection)
+        self.dictionaries = {field: _Dictionary() for field in self.fields + ("tag",)}
+        self.rows: Dict[Any, int] = {}
+        self.size = 0
+        self.dead = 0
+        self.tag_size = 0
+        self.columns = {
+            "amount": np.zeros(0, np.float64),
+            "day": np.zeros(0, np.int32),
+            "month": np.zeros(0, np.int32),
+            "alive": np.zeros(0, bool),
+            **{field: np.zeros(0, np.int32) for field in self.fields},
+        }
+        self.tag_rows = np.zeros(0, np.int32)
+        self.tag_codes = np.zeros(0, np.int32)
+
+    def _encode(self, record: Dict[str, Any]) -> Tuple[float, int, int, List[int], List[int]]:
+        day = day_of(record)
+        ordinal, month = _day_codes(day) if day is not None else (-1, -1)
+        codes = [self.dictionaries[field].encode(_value(record, field)) for field in self.fields]
+        tags = record.get(self.tag_field) if self.tag_field else None
+        tag_codes = [self.dictionaries["tag"].encode(tag) for tag in dict.fromkeys(tags or ())]
+        return float(record.get("amount") or 0), ordinal, month, codes, tag_codes
+
+    def load(self, records: Sequence[Dict[str, Any]]):
+        """Fill an empty table from a whole collection"""
+        amounts, days, months, tag_rows, tag_codes = [], [], [], [], []
+        codes = {field: [] for field in self.fields}
+        for record in records:
+            amount, ordinal, month, record_codes, record_tags = self._encode(record)
+            row = len(amounts)
+            self.rows[record.get("id")] = row
+            amounts.append(amount)
+            days.append(ordinal)
+            months.append(month)
+            for field, code in zip(self.fields, record_codes):
+                codes[field].append(code)
+            tag_rows.extend([row] * len(record_tags))
+            tag_codes.extend(record_tags)
+        self.size = len(amounts)
+        self.dead = 0
+        self.columns = {
+            "amount": np.array(amounts, np.float64),
+            "day": np.array(days, np.int32),
+            "month": np.array(months, np.int32),
+            "alive": np.ones(self.size, bool),
+            **{field: np.array(values, np.int32) for field, values in codes.items()},
+        }
+        self.tag_size = len(tag_codes)
+        self.tag_rows = np.array(tag_rows, np.int32)
+        self.tag_codes = np.array(tag_codes, np.int32)
+
+    def _reserve(self, rows: int, tags: int):
+        if self.size + rows > len(self.columns["amount"]):
+            capacity = max(2 * len(self.columns["amount"]), self.size + rows, 64)
+            for name, column in self.columns.items():
+                grown = np.zeros(capacity, column.dtype)
+                grown[:self.size] = column[:self.size]
+                self.columns[name] = grown
+        if self.tag_size + tags > len(self.tag_rows):
+            capacity = max(2 * len(self.tag_rows), self.tag_size + tags, 64)
+            for name in ("tag_rows", "tag_codes"):
+                grown = np.zeros(capacity, np.int32)
+                grown[:self.tag_size] = getattr(self, name)[:self.tag_size]
+                setattr(self, name, grown)
+
+    def append(self, record: Dict[str, Any]):
+        amount, ordinal, month, codes, tag_codes = self._encode(record)
+        self._reserve(1, len(tag_codes))
+        row = self.size
+        columns = self.columns
+        columns["amount"][row] = amount
+        columns["day"][row] = ordinal
+        columns["month"][row] = month
+        columns["alive"][row] = True
+        for field, code in zip(self.fields, codes):
+            columns[field][row] = code
+        if tag_codes:
+            end = self.tag_size + len(tag_codes)
+            self.tag_rows[self.tag_size:end] = row
+            self.tag_codes[self.tag_size:end] = tag_codes
+            self.tag_size = end
+        self.rows[record.get("id")] = row
+        self.size += 1
+
+    def kill(self, record_id: Any):
+        row = self.rows.pop(record_id, None)
+        if row is None:
+            return
+        self.columns["alive"][row] = False
+        self.dead += 1
+        if self.dead >= _COMPACT_MIN_DEAD and 2 * self.dead >= self.size:
+            self._compact()
+
+    def _compact(self):
+        alive = self.columns["alive"][:self.size]
+        new_row = np.cumsum(alive) - 1
+        self.columns = {name: column[:self.size][alive] for name, column in self.columns.items()}
+        tags_alive = alive[self.tag_rows[:self.tag_size]]
+        self.tag_codes = self.tag_codes[:self.tag_size][tags_alive]
+        self.tag_rows = new_row[self.tag_rows[:self.tag_size][tags_alive]].astype(np.int32)
+        self.tag_size = len(self.tag_codes)
+        self.rows = {record_id: int(new_row[row]) for record_id, row in self.rows.items()}
+        self.size = len(self.columns["amount"])
+        self.dead = 0
+
+    def _codes(self, field: str, values: Sequence[Any]) -> Any:
+        codes = self.dictionaries[field].codes
+        return np.array([codes[value] for value in values if value in codes], np.int32)
+
+    def select(
+        self,
+        start: Optional[int],
+        end: Optional[int],
+        filters: Dict[str, Sequence[Any]],
+        amounts: Tuple[Optional[float], Optional[float]] = (None, None)
+    ) -> Any:
+        """Boolean mask of the live rows matching a day range, field filters and an amount range"""
+        n = self.size
+        mask = self.columns["alive"][:n].copy()
+        days = self.columns["day"][:n]
+        if start is not None:
+            mask &= days >= start
+        if end is not None:
+            mask &= (days <= end) & (days >= 0)
+        if amounts[0] is not None:
+            mask &= self.columns["amount"][:n] >= amounts[0]
+        if amounts[1] is not None:
+            mask &= self.columns["amount"][:n] <= amounts[1]
+        for field, values in filters.items():
+            if field == "tag":
+                tagged = np.zeros(n, bool)
+                hits = np.isin(self.tag_codes[:self.tag_size], self._codes("tag", values))
+                tagged[self.tag_rows[:self.tag_size][hits]] = True
+                mask &= tagged
+            else:
+                mask &= np.isin(self.columns[field][:n], self._codes(field, values))
+        return mask
+
+    def _key_codes(self, key: str, rows: Any, tag_codes: Any) -> Tuple[Any, Any]:
+        """Non-negative codes of a group key for the given rows, and a decoder"""
+        if key == "tag":
+            values = self.dictionaries["tag"].values
+            return tag_codes, lambda code: values[code]
+        if key in self.dictionaries:
+            values = self.dictionaries[key].values
+            return self.columns[key][rows], lambda code: values[code]
+        if key == "day":
+            # Shifted by one so that undated rows (-1) get code 0
+            codes = self.columns["day"][rows] + 1
+            return codes, lambda code: date.fromordinal(code - 1).isoformat() if code else None
+        if key == "week":
+            # Monday of the ISO week (ordinal 1 is a Monday)
+            days = self.columns["day"][rows]
+            codes = np.where(days >= 0, days - (days - 1) % 7 + 1, 0)
+            return codes, lambda code: period_of(date.fromordinal(code - 1).isoformat(), "week") if code else None
+        months = self.columns["month"][rows]
+        if key == "year":
+            codes = np.where(months >= 0, months // 12 + 1, 0)
+            return codes, lambda code: f"{code - 1:04d}" if code else None
+        return months + 1, lambda code: f"{(code - 1) // 12:04d}-{(code - 1) % 12 + 1:02d}" if code else None
+
+    def aggregate(self, keys: Sequence[str], mask: Any, measures: Sequence[str]) -> List[Tuple[tuple, Dict[str, Any]]]:
+        """Measures of the amounts of the masked rows per distinct key combination"""
+        if "tag" in keys:
+            tag_rows = self.tag_rows[:self.tag_size]
+            hits = mask[tag_rows]
+            rows, tag_codes = tag_rows[hits], self.tag_codes[:self.tag_size][hits]
+        else:
+            rows, tag_codes = np.flatnonzero(mask), None
+        if not len(rows):
+            return []
+        amounts = self.columns["amount"][rows]
+        if not keys:
+            return [((), _vector_measures(amounts, np.zeros(len(rows), np.intp), 1, measures)[0])]
+
+        combined = np.zeros(len(rows), np.int64)
+        decoders, sizes = [], []
+        for key in keys:
+            codes, decode = self._key_codes(key, rows, tag_codes)
+            size = int(codes.max()) + 1
+            combined = combined * size + codes
+            decoders.append(decode)
+            sizes.append(size)
+        groups, inverse = np.unique(combined, return_inverse=True)
+        columns = np.unravel_index(groups, sizes)
+        values = _vector_measures(amounts, inverse.ravel(), len(groups), measures)
+        return [
+            (tuple(decode(int(column[i])) for decode, column in zip(decoders, columns)), values[i])
+            for i in range(len(groups))
+        ]
+
+
+def _python_aggregate(
+    collection: str,
+    records: Sequence[Dict[str, Any]],
+    keys: Sequence[str],
+    start: Optional[int],
+    end: Optional[int],
+    filters: Dict[str, Sequence[Any]],
+    amount_range: Tuple[Optional[float], Optional[float]],
+    measures: Sequence[str]
+) -> List[Tuple[tuple, Dict[str, Any]]]:
+    """aggregate() over the records themselves, for when NumPy is not installed"""
+    tag_field = TAG_FIELDS.get(collection)
+    wanted = {field: set(values) for field, values in filters.items()}
+    low, high = amount_range
+    groups: Dict[tuple, List[float]] = defaultdict(list)
+    for record in records:
+        day = day_of(record)
+        if start is not None or end is not None:
+            if day is None:
+                continue
+            ordinal = _day_codes(day)[0]
+            if (start is not None and ordinal < start) or (end is not None and ordinal > end):
+                continue
+        amount = float(record.get("amount") or 0)
+        if (low is not None and amount < low) or (high is not None and amount > high):
+            continue
+        tags = (record.get(tag_field) or ()) if tag_field else ()
+        if any(
+            wanted_values.isdisjoint(tags) if field == "tag" else _value(record, field) not in wanted_values
+            for field, wanted_values in wanted.items()
+        ):
+            continue
+        values = [
+            (period_of(day, key) if day else None) if key in TIME_KEYS else None if key == "tag" else _value(record, key)
+            for key in keys
+        ]
+        for tag in (dict.fromkeys(tags) if "tag" in keys else (None,)):
+            groups[tuple(tag if key == "tag" else value for key, value in zip(keys, values))].append(amount)
+    return [(group, _python_measures(amounts, measures)) for group, amounts in groups.items()]
+
+
+class FinanceColumns(TransactionObserver):
+    """Columnar mirror of the expenses and income of a finance document"""
+
+    def __init__(self):
+        self._data: Optional[Dict[str, Any]] = None
+        self._tables: Dict[str, _Table] = {}
+        self.builds = 0
+
+    @property
+    def engine(self) -> str:
+        return "numpy" if np is not None else "python"
+
+    def _build(self, data: Dict[str, Any]):
+        tables = {}
+        for collection in ENCODED_FIELDS:
+            tables[collection] = _Table(collection)
+            tables[collection].load(data.get(collection, []))
+        self._tables = tables
+        self._data = data
+        self.builds += 1
+
+    def _tracking(self, txn: Transaction) -> bool:
+        return self._data is not None and self._data is txn.data
+
+    def changed(self, txn: Transaction, collection: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        table = self._tables.get(collection)
+        if table is None or not self._tracking(txn):
+            return
+        if old is not None:
+            table.kill(old.get("id"))
+        if new is not None:
+            table.append(new)
+
+    def key_set(self, txn: Transaction, key: str):
+        if key in ENCODED_FIELDS and self._tracking(txn):
+            self._data = None
+
+    def committing(self, txn: Transaction):
+        if txn.dirty and self._tracking(txn):
+            self._data = None
+
+    def aggregate(
+        self,
+        filename: str,
+        collection: str,
+        keys: Sequence[str] = (),
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        filters: Optional[Dict[str, Sequence[Any]]] = None,
+        amount_range: Tuple[Optional[float], Optional[float]] = (None, None),
+        measures: Sequence[str] = ("sum", "count")
+    ) -> List[Tuple[tuple, Dict[str, Any]]]:
+        """Measures of the amounts of a collection per distinct combination of `keys`.
+
+        Records are limited to date_from <= day <= date_to, to those whose
+        `filters` fields have one of the given values ("tag": any of the tags)
+        and to amounts within `amount_range`. Grouping by "tag" counts a
+        record once per tag. Raises LookupError for a collection without
+        reports and ValueError for unknown keys, measures or dates.
+        """
+        if collection not in ENCODED_FIELDS:
+            raise LookupError(f"No reports for {collection}")
+        allowed = group_keys(collection)
+        filters = {field: values for field, values in (filters or {}).items() if values}
+        unknown = [key for key in keys if key not in allowed]
+        unknown += [field for field in filters if field not in allowed or field in TIME_KEYS]
+        if unknown:
+            raise ValueError(f"Cannot group or filter {collection} by {', '.join(unknown)}")
+        check_measures(measures)
+        start, end = _ordinal(date_from), _ordinal(date_to)
+
+        with data_manager.read_lock(filename):
+            data = data_manager.read_data(filename)
+            if np is None:
+                return _python_aggregate(
+                    collection, data.get(collection, []), keys, start, end, filters, amount_range, measures
+                )
+            if self._data is not data:
+                self._build(data)
+            table = self._tables[collection]
+            return table.aggregate(keys, table.select(start, end, filters, amount_range), measures)
+
+    def group(
+        self,
+        filename: str,
+        collection: str,
+        keys: Sequence[str] = (),
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        filters: Optional[Dict[str, Sequence[Any]]] = None
+    ) -> List[Tuple[tuple, float, int]]:
+        """Sum and count of the amounts per distinct combination of `keys` (see aggregate())"""
+        groups = self.aggregate(filename, collection, keys, date_from, date_to, filters)
+        return [(values, measures["sum"], measures["count"]) for values, measures in groups]
+
+    async def aaggregate(self, filename: str, collection: str, *args) -> List[Tuple[tuple, Dict[str, Any]]]:
+        """Async aggregate(), run off the event loop"""
+        return await data_manager.run_in_thread(self.aggregate, filename, collection, *args)
+
+    async def agroup(self, filename: str, collection: str, *args) -> List[Tuple[tuple, float, int]]:
+        """Async group(), run off the event loop"""
+        return await data_manager.run_in_thread(self.group, filename, collection, *args)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the engine in use and the size of the mirror"""
+        return {
+            "engine": self.engine,
+            "builds": self.builds,
+            "rows": {collection: table.size for collection, table in self._tables.items()},
+            "dead": {collection: table.dead for collection, table in self._tables.items()},
+        }
+
+
+finance_columns = FinanceColumns()
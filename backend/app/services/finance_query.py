@@ -0,0 +1,95 @@
+"""Ad hoc aggregation queries over finance data (POST /api/finance/query).
+
+A FinanceQuery spec is run as one aggregate() on the columnar mirror (see
+finance_columns). Results are cached per spec and data file version, so a
+repeated query costs a dictionary lookup until the file next changes.
+"""
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import settings
+from app.models.finance import FinanceQuery, FinanceQueryResult
+from app.services.data_manager import data_manager
+from app.services.finance_columns import finance_columns
+
+
+class QueryCache:
+    """LRU cache of query results keyed by spec and data version"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], List[Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, int]) -> Optional[List[Dict[str, Any]]]:
+        groups = self._entries.get(key)
+        if groups is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return groups
+
+    def put(self, key: Tuple[str, int], groups: List[Dict[str, Any]]):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = groups
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+query_cache = QueryCache(settings.finance_query_cache_size)
+
+
+def _sorted(groups: List[Dict[str, Any]], spec: FinanceQuery, group_by: List[str]) -> List[Dict[str, Any]]:
+    """Order groups by spec.sort (default: by the group keys), missing values last"""
+    field = spec.sort.lstrip("-") if spec.sort else None
+    if field is not None and field not in group_by and field not in spec.measures:
+        raise ValueError(f"Cannot sort by {field}: not a group key or measure")
+    fields = [field] if field else group_by
+    present = [group for group in groups if all(group[f] is not None for f in fields)]
+    missing = [group for group in groups if any(group[f] is None for f in fields)]
+    present.sort(key=lambda group: [group[f] for f in fields], reverse=bool(spec.sort and spec.sort.startswith("-")))
+    return present + missing
+
+
+def group_keys(spec: FinanceQuery) -> List[str]:
+    """Group keys of a spec; amount measures are never mixed across currencies"""
+    if "currency" in spec.group_by or all(measure == "count" for measure in spec.measures):
+        return list(spec.group_by)
+    return [*spec.group_by, "currency"]
+
+
+def run(filename: str, spec: FinanceQuery) -> FinanceQueryResult:
+    """Run a query spec against a finance data file (blocking).
+
+    Raises ValueError (LookupError for an unknown collection) for an invalid spec.
+    """
+    group_by = group_keys(spec)
+    key = (json.dumps(spec.model_dump(), sort_keys=True), data_manager.current_version(filename))
+    groups = query_cache.get(key)
+    cached = groups is not None
+    if not cached:
+        filters = {
+            "category": spec.category, "merchant": spec.merchant, "tag": spec.tag,
+            "currency": spec.currency, "type": spec.type, "source": spec.source,
+        }
+        rows = finance_columns.aggregate(
+            filename, spec.collection, tuple(group_by), spec.date_from, spec.date_to,
+            filters, (spec.min_amount, spec.max_amount), tuple(spec.measures)
+        )
+        groups = _sorted([{**dict(zip(group_by, values)), **measures} for values, measures in rows], spec, group_by)
+        if spec.limit is not None:
+            groups = groups[:spec.limit]
+        query_cache.put(key, groups)
+    return FinanceQueryResult(group_by=group_by, measures=spec.measures, groups=groups, cached=cached)
+
+
+async def arun(filename: str, spec: FinanceQuery) -> FinanceQueryResult:
+    """Async run(), run off the event loop"""
+    return await data_manager.run_in_thread(run, filename, spec)
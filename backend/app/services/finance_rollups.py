@@ -0,0 +1,197 @@
+"""Time-bucketed rollups of expenses and income, maintained incrementally.
+
+The store keeps, per day, the sum and count of expenses by (category,
+currency) and of income by (type, currency), with the days in sorted order.
+A TransactionObserver applies the delta of every record change, so the store
+is never recomputed on writes; it is built from the document on first use and
+again whenever the cached document is replaced (reload, failed transaction,
+whole-collection replacement). Week, month and year buckets are folded from
+the days of the requested range: O(days in range), independent of the number
+of records.
+"""
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from app.services.data_manager import Transaction, TransactionObserver, data_manager
+
+GRANULARITIES = ("day", "week", "month", "year")
+
+# collection -> field the rollup is grouped by besides currency
+_GROUP_FIELDS = {"expenses": "category", "income": "type"}
+
+
+@lru_cache(maxsize=8192)
+def period_of(day: str, granularity: str) -> str:
+    """The bucket of a YYYY-MM-DD day: the day, ISO week (2024-W05), month or year"""
+    if granularity == "month":
+        return day[:7]
+    if granularity == "year":
+        return day[:4]
+    if granularity == "week":
+        year, week, _ = date.fromisoformat(day).isocalendar()
+        return f"{year}-W{week:02d}"
+    return day
+
+
+@lru_cache(maxsize=16384)
+def _is_day(value: str) -> bool:
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def day_of(record: Dict[str, Any]) -> Optional[str]:
+    """The day a record falls on, or None if it has no usable date"""
+    value = record.get("date")
+    if not isinstance(value, str) or len(value) < 10:
+        return None
+    day = value[:10]
+    return day if _is_day(day) else None
+
+
+class _Rollup:
+    """Per-day sums and counts of one collection"""
+
+    def __init__(self, group_field: str):
+        self.group_field = group_field
+        self.days: Dict[str, Dict[Tuple[Any, str], List[float]]] = {}
+        self.keys: List[str] = []
+
+    def add(self, record: Dict[str, Any], sign: int):
+        day = day_of(record)
+        if day is None:
+            return
+        cells = self.days.get(day)
+        if cells is None:
+            if sign < 0:
+                return
+            cells = self.days[day] = {}
+            insort(self.keys, day)
+        cell_key = (record.get(self.group_field), record.get("currency") or "USD")
+        cell = cells.get(cell_key)
+        if cell is None:
+            cell = cells[cell_key] = [0.0, 0]
+        cell[0] += sign * (record.get("amount") or 0)
+        cell[1] += sign
+        if cell[1] <= 0:
+            # Drop emptied cells, and with them any accumulated float error
+            del cells[cell_key]
+            if not cells:
+                del self.days[day]
+                del self.keys[bisect_left(self.keys, day)]
+
+    def span(self, start: Optional[str], end: Optional[str]) -> List[str]:
+        lo = bisect_left(self.keys, start[:10]) if start else 0
+        hi = bisect_right(self.keys, end[:10]) if end else len(self.keys)
+        return self.keys[lo:hi]
+
+
+class FinanceRollups(TransactionObserver):
+    """Day x group x currency rollups of the expenses and income of a finance document"""
+
+    def __init__(self):
+        self._data: Optional[Dict[str, Any]] = None
+        self._rollups: Dict[str, _Rollup] = {}
+
+    def _build(self, data: Dict[str, Any]):
+        rollups = {collection: _Rollup(field) for collection, field in _GROUP_FIELDS.items()}
+        for collection, rollup in rollups.items():
+            for record in data.get(collection, []):
+                rollup.add(record, 1)
+        self._rollups = rollups
+        self._data = data
+
+    def _tracking(self, txn: Transaction) -> bool:
+        return self._data is not None and self._data is txn.data
+
+    def changed(self, txn: Transaction, collection: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        rollup = self._rollups.get(collection)
+        if rollup is None or not self._tracking(txn):
+            return
+        if old is not None:
+            rollup.add(old, -1)
+        if new is not None:
+            rollup.add(new, 1)
+
+    def key_set(self, txn: Transaction, key: str):
+        if key in _GROUP_FIELDS and self._tracking(txn):
+            self._data = None
+
+    def committing(self, txn: Transaction):
+        if txn.dirty and self._tracking(txn):
+            self._data = None
+
+    def trends(
+        self,
+        filename: str,
+        granularity: str = "month",
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        categories: Optional[List[str]] = None,
+        currencies: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Expense and income totals per period within [start, end], oldest first.
+
+        `categories` limits the expenses, `currencies` both expenses and income.
+        Raises ValueError for an unknown granularity.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        wanted_categories = set(categories) if categories else None
+        wanted_currencies = {currency.upper() for currency in currencies} if currencies else None
+
+        buckets: Dict[str, Dict[str, Any]] = {}
+
+        def bucket(day: str) -> Dict[str, Any]:
+            period = period_of(day, granularity)
+            entry = buckets.get(period)
+            if entry is None:
+                entry = buckets[period] = {
+                    "period": period, "expenses": 0.0, "income": 0.0, "net": 0.0,
+                    "expense_count": 0, "income_count": 0,
+                    "expenses_by_category": {}, "expenses_by_currency": {}, "income_by_currency": {},
+                }
+            return entry
+
+        with data_manager.read_lock(filename):
+            data = data_manager.read_data(filename)
+            if self._data is not data:
+                self._build(data)
+            expenses = self._rollups["expenses"]
+            for day in expenses.span(start, end):
+                for (category, currency), (amount, count) in expenses.days[day].items():
+                    if wanted_categories is not None and category not in wanted_categories:
+                        continue
+                    if wanted_currencies is not None and currency.upper() not in wanted_currencies:
+                        continue
+                    entry = bucket(day)
+                    entry["expenses"] += amount
+                    entry["expense_count"] += count
+                    by_category = entry["expenses_by_category"]
+                    by_category[category] = by_category.get(category, 0) + amount
+                    by_currency = entry["expenses_by_currency"]
+                    by_currency[currency] = by_currency.get(currency, 0) + amount
+            income = self._rollups["income"]
+            for day in income.span(start, end):
+                for (_, currency), (amount, count) in income.days[day].items():
+                    if wanted_currencies is not None and currency.upper() not in wanted_currencies:
+                        continue
+                    entry = bucket(day)
+                    entry["income"] += amount
+                    entry["income_count"] += count
+                    by_currency = entry["income_by_currency"]
+                    by_currency[currency] = by_currency.get(currency, 0) + amount
+
+        for entry in buckets.values():
+            entry["net"] = entry["income"] - entry["expenses"]
+        return [buckets[period] for period in sorted(buckets)]
+
+    async def atrends(self, filename: str, *args) -> List[Dict[str, Any]]:
+        """Async trends(), run off the event loop"""
+        return await data_manager.run_in_thread(self.trends, filename, *args)
+
+
+finance_rollups = FinanceRollups()
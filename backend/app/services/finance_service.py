@@ -1,10 +1,23 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 from app.models.finance import (
-    Expense, Income, Bill, Budget, Category, FinanceStatistics
+    Expense, Income, Bill, Budget, Category, FinanceStatistics, FinanceTrends,
+    FinanceQuery, FinanceQueryResult
 )
-from app.services.data_manager import data_manager
+from app.models.bulk import BulkResult, BulkUpdate, ImportResult
+from app.services.bulk_service import bulk_delete, bulk_update
+from app.services.data_manager import data_manager, Transaction
+from app.services.event_service import event_bus, record_event
+from app.services.exchange_rate_service import RatesUnavailableError, exchange_rate_service
+from app.services.export_service import Export, export_collection
+from app.services import finance_aggregates, finance_query
+from app.services.finance_columns import TIME_KEYS, finance_columns
+from app.services.finance_rollups import finance_rollups
+from app.services.import_service import ImportSource, bulk_import
+from app.services.model_cache import model_cache
+from app.services.record_query import CollectionSpec, ListQuery, query_page
 from app.config import settings
+from app.utils.singleflight import singleflight
 import uuid
 from collections import defaultdict
 
@@ -14,12 +27,31 @@ class FinanceService:
 
     def __init__(self):
         self.data_file = settings.finance_data_file
+        self.expenses_spec = CollectionSpec(
+            self.data_file, "expenses", Expense,
+            filters=("category", "currency", "merchant"),
+            multi_filters=("tags",),
+            ranges=("date", "amount"),
+            sorts=("date", "amount", "category", "merchant", "created_at"),
+            default_sort="-date"
+        )
+        self.income_spec = CollectionSpec(
+            self.data_file, "income", Income,
+            filters=("type", "source"),
+            ranges=("date", "amount"),
+            sorts=("date", "amount", "source", "created_at"),
+            default_sort="-date"
+        )
+        data_manager.observe(self.data_file, finance_aggregates.finance_aggregates)
+        data_manager.observe(self.data_file, finance_rollups)
+        data_manager.observe(self.data_file, finance_columns)
         self._ensure_default_categories()
 
     def _ensure_default_categories(self):
         """Ensure default categories exist"""
-        data = data_manager.read_data(self.data_file)
-        if not data.get("categories"):
+        def apply(txn: Transaction):
+            if txn.data.get("categories"):
+                return
             default_categories = [
                 {"id": "food", "name": "Food & Dining", "type": "expense", "color": "#EF4444", "icon": "🍔"},
                 {"id": "transport", "name": "Transportation", "type": "expense", "color": "#3B82F6", "icon": "🚗"},
@@ -31,143 +63,261 @@ class FinanceService:
                 {"id": "education", "name": "Education", "type": "expense", "color": "#14B8A6", "icon": "📚"},
                 {"id": "other", "name": "Other", "type": "expense", "color": "#6B7280", "icon": "📌"},
             ]
-            data["categories"] = default_categories
-            data_manager.write_data(self.data_file, data)
+            txn.set("categories", default_categories)
+
+        data_manager.update(self.data_file, apply)
 
     # Expense operations
-    def get_expenses(self) -> List[Expense]:
+    async def get_expenses(self) -> List[Expense]:
         """Get all expenses"""
-        data = data_manager.read_data(self.data_file)
-        return [Expense(**expense) for expense in data.get("expenses", [])]
+        return await model_cache.models(self.data_file, "expenses", Expense)
+
+    async def get_expenses_page(self, query: Optional[ListQuery] = None) -> Tuple[bytes, Optional[str]]:
+        """Get expenses (optionally filtered, sorted and paginated) as pre-validated JSON, and the next page\'s cursor"""
+        return await query_page(self.expenses_spec, query or ListQuery())
 
-    def get_expense(self, expense_id: str) -> Optional[Expense]:
+    def export_expenses(self, fmt: str = "ndjson", date_from: Optional[str] = None, date_to: Optional[str] = None) -> Export:
+        """Export expenses as NDJSON or CSV"""
+        return export_collection(self.data_file, "expenses", Expense, fmt, "date", date_from, date_to)
+
+    async def get_expense(self, expense_id: str) -> Optional[Expense]:
         """Get expense by ID"""
-        expenses = self.get_expenses()
-        for expense in expenses:
-            if expense.id == expense_id:
-                return expense
-        return None
+        record = await data_manager.aget_record(self.data_file, "expenses", expense_id)
+        return Expense(**record) if record is not None else None
 
-    def create_expense(self, expense: Expense) -> Expense:
+    async def create_expense(self, expense: Expense) -> Expense:
         """Create new expense"""
-        data = data_manager.read_data(self.data_file)
         expense.id = str(uuid.uuid4())
         expense.created_at = datetime.now().isoformat()
-
-        if "expenses" not in data:
-            data["expenses"] = []
-
-        data["expenses"].append(expense.model_dump())
-        data_manager.write_data(self.data_file, data)
+        await data_manager.ainsert_record(self.data_file, "expenses", expense.model_dump())
+        event_bus.publish("expense.created", record_event(expense))
         return expense
 
-    def update_expense(self, expense_id: str, expense: Expense) -> Optional[Expense]:
-        """Update expense"""
-        data = data_manager.read_data(self.data_file)
-        expenses = data.get("expenses", [])
-
-        for i, exp in enumerate(expenses):
-            if exp["id"] == expense_id:
-                expense.id = expense_id
-                expense.created_at = exp.get("created_at", datetime.now().isoformat())
-                expenses[i] = expense.model_dump()
-                data_manager.write_data(self.data_file, data)
-                return expense
+    async def import_expenses(self, source: ImportSource, skip_invalid: bool = False) -> ImportResult:
+        """Import expenses in bulk with a single write"""
+        return await bulk_import(source, self.data_file, "expenses", Expense, skip_invalid, event="expense")
 
-        return None
-
-    def delete_expense(self, expense_id: str) -> bool:
+    async def update_expense(self, expense_id: str, expense: Expense) -> Optional[Expense]:
+        """Update expense"""
+        def apply(txn: Transaction) -> Optional[Expense]:
+            existing = txn.get("expenses", expense_id)
+            if existing is None:
+                return None
+
+            expense.id = expense_id
+            expense.created_at = existing.get("created_at", datetime.now().isoformat())
+            txn.replace("expenses", expense_id, expense.model_dump())
+            return expense
+
+        updated = await data_manager.aupdate(self.data_file, apply)
+        if updated is not None:
+            event_bus.publish("expense.updated", record_event(updated))
+        return updated
+
+    async def delete_expense(self, expense_id: str) -> bool:
         """Delete expense"""
-        data = data_manager.read_data(self.data_file)
-        expenses = data.get("expenses", [])
+        deleted = await data_manager.adelete_record(self.data_file, "expenses", expense_id)
+        if deleted:
+            event_bus.publish("expense.deleted", {"id": expense_id})
+        return deleted
 
-        for i, exp in enumerate(expenses):
-            if exp["id"] == expense_id:
-                expenses.pop(i)
-                data_manager.write_data(self.data_file, data)
-                return True
+    async def bulk_update_expenses(self, update: BulkUpdate) -> BulkResult:
+        """Patch expenses by id or filter in one transaction"""
+        return await bulk_update(self.expenses_spec, update, event="expense")
 
-        return False
+    async def bulk_delete_expenses(self, ids: List[str]) -> BulkResult:
+        """Delete expenses by id in one transaction"""
+        return await bulk_delete(self.expenses_spec, ids, event="expense")
 
     # Income operations
-    def get_income(self) -> List[Income]:
+    async def get_income(self) -> List[Income]:
         """Get all income"""
-        data = data_manager.read_data(self.data_file)
-        return [Income(**income) for income in data.get("income", [])]
+        return await model_cache.models(self.data_file, "income", Income)
 
-    def create_income(self, income: Income) -> Income:
+    async def get_income_page(self, query: Optional[ListQuery] = None) -> Tuple[bytes, Optional[str]]:
+        """Get income (optionally filtered, sorted and paginated) as pre-validated JSON, and the next page\'s cursor"""
+        return await query_page(self.income_spec, query or ListQuery())
+
+    def export_income(self, fmt: str = "ndjson", date_from: Optional[str] = None, date_to: Optional[str] = None) -> Export:
+        """Export income as NDJSON or CSV"""
+        return export_collection(self.data_file, "income", Income, fmt, "date", date_from, date_to)
+
+    async def create_income(self, income: Income) -> Income:
         """Create new income"""
-        data = data_manager.read_data(self.data_file)
         income.id = str(uuid.uuid4())
         income.created_at = datetime.now().isoformat()
+        await data_manager.ainsert_record(self.data_file, "income", income.model_dump())
+        event_bus.publish("income.created", record_event(income))
+        return income
 
-        if "income" not in data:
-            data["income"] = []
+    async def import_income(self, source: ImportSource, skip_invalid: bool = False) -> ImportResult:
+        """Import income in bulk with a single write"""
+        return await bulk_import(source, self.data_file, "income", Income, skip_invalid, event="income")
 
-        data["income"].append(income.model_dump())
-        data_manager.write_data(self.data_file, data)
-        return income
+    async def bulk_update_income(self, update: BulkUpdate) -> BulkResult:
+        """Patch income by id or filter in one transaction"""
+        return await bulk_update(self.income_spec, update, event="income")
+
+    async def bulk_delete_income(self, ids: List[str]) -> BulkResult:
+        """Delete income by id in one transaction"""
+        return await bulk_delete(self.income_spec, ids, event="income")
 
     # Bill operations
-    def get_bills(self) -> List[Bill]:
+    async def get_bills(self) -> List[Bill]:
         """Get all bills"""
-        data = data_manager.read_data(self.data_file)
-        return [Bill(**bill) for bill in data.get("bills", [])]
+        return await model_cache.models(self.data_file, "bills", Bill)
 
-    def create_bill(self, bill: Bill) -> Bill:
+    async def get_bills_json(self, fields: Optional[Tuple[str, ...]] = None) -> bytes:
+        """Get all bills as pre-validated JSON"""
+        return await model_cache.json_array(self.data_file, "bills", Bill, fields)
+
+    async def create_bill(self, bill: Bill) -> Bill:
         """Create new bill"""
-        data = data_manager.read_data(self.data_file)
         bill.id = str(uuid.uuid4())
         bill.created_at = datetime.now().isoformat()
-
-        if "bills" not in data:
-            data["bills"] = []
-
-        data["bills"].append(bill.model_dump())
-        data_manager.write_data(self.data_file, data)
+        await data_manager.ainsert_record(self.data_file, "bills", bill.model_dump())
+        event_bus.publish("bill.created", record_event(bill))
         return bill
 
     # Budget operations
-    def get_budgets(self) -> List[Budget]:
+    async def get_budgets(self) -> List[Budget]:
         """Get all budgets"""
-        data = data_manager.read_data(self.data_file)
-        return [Budget(**budget) for budget in data.get("budgets", [])]
+        return await model_cache.models(self.data_file, "budgets", Budget)
+
+    async def get_budgets_json(self, fields: Optional[Tuple[str, ...]] = None) -> bytes:
+        """Get all budgets as pre-validated JSON"""
+        return await model_cache.json_array(self.data_file, "budgets", Budget, fields)
 
-    def create_budget(self, budget: Budget) -> Budget:
+    async def create_budget(self, budget: Budget) -> Budget:
         """Create new budget"""
-        data = data_manager.read_data(self.data_file)
         budget.id = str(uuid.uuid4())
         budget.created_at = datetime.now().isoformat()
-
-        if "budgets" not in data:
-            data["budgets"] = []
-
-        data["budgets"].append(budget.model_dump())
-        data_manager.write_data(self.data_file, data)
+        await data_manager.ainsert_record(self.data_file, "budgets", budget.model_dump())
+        event_bus.publish("budget.created", record_event(budget))
         return budget
 
     # Category operations
-    def get_categories(self) -> List[Category]:
+    async def get_categories(self) -> List[Category]:
         """Get all categories"""
-        data = data_manager.read_data(self.data_file)
-        return [Category(**cat) for cat in data.get("categories", [])]
+        return await model_cache.models(self.data_file, "categories", Category)
 
-    # Statistics
-    def get_statistics(self) -> FinanceStatistics:
-        """Calculate finance statistics"""
-        expenses = self.get_expenses()
-        income = self.get_income()
-        budgets = self.get_budgets()
+    async def get_categories_json(self, fields: Optional[Tuple[str, ...]] = None) -> bytes:
+        """Get all categories as pre-validated JSON"""
+        return await model_cache.json_array(self.data_file, "categories", Category, fields)
 
-        total_expenses = sum(exp.amount for exp in expenses)
-        total_income = sum(inc.amount for inc in income)
+    # Statistics
+    def _current_totals(self) -> Optional[Dict]:
+        """The stored running totals if they match the records (blocking)"""
+        with data_manager.read_lock(self.data_file):
+            data = data_manager.read_data(self.data_file)
+            totals = data.get(finance_aggregates.STATS_KEY)
+            return totals if finance_aggregates.is_current(totals, data) else None
+
+    async def get_totals(self) -> Dict:
+        """Get the stored running totals, rebuilding them if they are missing or stale"""
+        # Off the event loop: the first check of a freshly loaded document recomputes it
+        totals = await data_manager.run_in_thread(self._current_totals)
+        if totals is not None:
+            return totals
+        return await data_manager.aupdate(self.data_file, finance_aggregates.ensure)
+
+    async def rebuild_totals(self) -> Dict:
+        """Recompute the running totals from every record"""
+        return await data_manager.aupdate(self.data_file, finance_aggregates.rebuild)
+
+    async def check_totals(self) -> Dict:
+        """Compare the running totals with a full recompute"""
+        data = await data_manager.aread(self.data_file)
+        return finance_aggregates.check(data)
+
+    @singleflight
+    async def get_statistics(
+        self, date_from: Optional[str] = None, date_to: Optional[str] = None, currency: str = "USD"
+    ) -> FinanceStatistics:
+        """Calculate finance statistics in a base currency, optionally for expenses and income within a date range"""
+        currency = currency.upper()
+        if currency not in exchange_rate_service.SUPPORTED_CURRENCIES:
+            raise ValueError(f"Unsupported currency: {currency}")
+
+        # Subtotals per currency (and category), in their own currencies
+        if date_from or date_to:
+            # Vectorized group-by over the columnar mirror
+            rows = await finance_columns.agroup(
+                self.data_file, "expenses", ("currency", "category"), date_from, date_to
+            )
+            expenses: Dict[str, Dict[str, float]] = defaultdict(dict)
+            for (expense_currency, category), amount, _ in rows:
+                expenses[expense_currency][category] = amount
+            rows = await finance_columns.agroup(self.data_file, "income", ("currency",), date_from, date_to)
+            income = {income_currency: amount for (income_currency,), amount, _ in rows}
+        else:
+            # All-time totals are maintained incrementally on every write
+            totals = await self.get_totals()
+            expenses = totals["expenses_by_currency"]
+            income = totals["income_by_currency"]
+        # Monthly totals from the rollups, without loading the records
+        buckets = await finance_rollups.atrends(self.data_file, "month", date_from, date_to)
+
+        # One rates table; each subtotal is converted with one multiplication
+        currencies = set(expenses) | set(income)
+        for bucket in buckets:
+            currencies.update(bucket["expenses_by_currency"], bucket["income_by_currency"])
+        try:
+            factors = await exchange_rate_service.get_conversion_factors(currency, currencies)
+        except RatesUnavailableError:
+            # Nothing can be converted: report the subtotals in their own currencies
+            by_currency = {}
+            for subtotal_currency in sorted(set(expenses) | set(income)):
+                factor = 1.0 if subtotal_currency == currency else None
+                spent = sum(expenses.get(subtotal_currency, {}).values())
+                earned = income.get(subtotal_currency, 0)
+                by_currency[subtotal_currency] = {
+                    "expenses": spent,
+                    "income": earned,
+                    "rate": factor,
+                    "converted_expenses": spent if factor else None,
+                    "converted_income": earned if factor else None,
+                }
+            return FinanceStatistics(
+                total_expenses=None,
+                total_income=None,
+                net_balance=None,
+                currency=currency,
+                by_currency=by_currency,
+                rates_available=False
+            )
+        rates_as_of = None
+        if any(c != currency for c in currencies):
+            fetched_at = exchange_rate_service.rates_fetched_at(currency)
+            rates_as_of = fetched_at.isoformat() if fetched_at else None
 
-        # Expenses by category
         expenses_by_category = defaultdict(float)
-        for exp in expenses:
-            expenses_by_category[exp.category] += exp.amount
+        by_currency = {}
+        for subtotal_currency in sorted(set(expenses) | set(income)):
+            factor = factors[subtotal_currency]
+            categories = expenses.get(subtotal_currency, {})
+            for category, amount in categories.items():
+                expenses_by_category[category] += amount * factor
+            spent = sum(categories.values())
+            earned = income.get(subtotal_currency, 0)
+            by_currency[subtotal_currency] = {
+                "expenses": spent,
+                "income": earned,
+                "rate": factor,
+                "converted_expenses": spent * factor,
+                "converted_income": earned * factor,
+            }
+        total_expenses = sum(entry["converted_expenses"] for entry in by_currency.values())
+        total_income = sum(entry["converted_income"] for entry in by_currency.values())
 
-        # Budget status
+        monthly_trend = {}
+        for bucket in buckets:
+            spent = sum(amount * factors[c] for c, amount in bucket["expenses_by_currency"].items())
+            earned = sum(amount * factors[c] for c, amount in bucket["income_by_currency"].items())
+            monthly_trend[bucket["period"]] = {"expenses": spent, "income": earned, "net": earned - spent}
+
+        # Budget status (limits are taken to be in the base currency)
+        budgets = await self.get_budgets()
         budget_status = {}
         for budget in budgets:
             spent = expenses_by_category.get(budget.category, 0)
@@ -182,10 +332,87 @@ class FinanceService:
             total_expenses=total_expenses,
             total_income=total_income,
             net_balance=total_income - total_expenses,
+            currency=currency,
             expenses_by_category=dict(expenses_by_category),
+            by_currency=by_currency,
+            rates_as_of=rates_as_of,
+            monthly_trend=monthly_trend,
             budget_status=budget_status
         )
 
+    async def get_trends(
+        self,
+        granularity: str = "month",
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        categories: Optional[List[str]] = None,
+        currencies: Optional[List[str]] = None
+    ) -> FinanceTrends:
+        """Get expense and income totals per day, week, month or year"""
+        buckets = await finance_rollups.atrends(
+            self.data_file, granularity, date_from, date_to, categories, currencies
+        )
+        return FinanceTrends(granularity=granularity, date_from=date_from, date_to=date_to, buckets=buckets)
+
+    async def get_report(
+        self,
+        collection: str,
+        group_by: Tuple[str, ...] = (),
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        filters: Optional[Dict[str, List[str]]] = None,
+        limit: Optional[int] = None
+    ) -> Dict:
+        """Amount totals of expenses or income grouped by fields, tags and periods.
+
+        Amounts are only added up within one currency: groups are always
+        split by currency as well, and totals are reported per currency.
+        Groups are ordered by period, currency, then amount. `share` is
+        relative to the period (or all groups) in the same currency, and
+        `limit` keeps the top groups of each period and currency (e.g. the top
+        merchants per month).
+        """
+        keys = group_by if "currency" in group_by else (*group_by, "currency")
+        totals = await finance_columns.agroup(self.data_file, collection, ("currency",), date_from, date_to, filters)
+        groups = await finance_columns.agroup(self.data_file, collection, keys, date_from, date_to, filters)
+
+        partition_keys = [i for i, key in enumerate(keys) if key in TIME_KEYS] + [keys.index("currency")]
+
+        def partition_of(values: tuple) -> tuple:
+            return tuple(values[i] or "" for i in partition_keys)
+
+        partition_totals = defaultdict(float)
+        for values, amount, _ in groups:
+            partition_totals[partition_of(values)] += amount
+        groups.sort(key=lambda group: (partition_of(group[0]), -group[1]))
+
+        rows, ranks = [], defaultdict(int)
+        for values, amount, count in groups:
+            partition = partition_of(values)
+            ranks[partition] += 1
+            if limit is not None and ranks[partition] > limit:
+                continue
+            total = partition_totals[partition]
+            rows.append({
+                **dict(zip(keys, values)),
+                "amount": amount,
+                "count": count,
+                "share": amount / total if total else 0,
+            })
+        return {
+            "collection": collection,
+            "group_by": list(keys),
+            "date_from": date_from,
+            "date_to": date_to,
+            "totals": {currency: {"amount": amount, "count": count} for (currency,), amount, count in totals},
+            "count": sum(count for _, _, count in totals),
+            "groups": rows,
+        }
+
+    async def query(self, spec: FinanceQuery) -> FinanceQueryResult:
+        """Run an ad hoc aggregation query (cached per spec and data version)"""
+        return await finance_query.arun(self.data_file, spec)
+
 
 # Global instance
 finance_service = FinanceService()
@@ -6,6 +6,7 @@ import httpx
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 import asyncio
+from app.utils.singleflight import singleflight
 
 
 class FlightLookupService:
@@ -39,6 +40,7 @@ class FlightLookupService:
         self.opensky_username = opensky_username
         self.opensky_password = opensky_password
 
+    @singleflight
     async def lookup_flight(self, flight_number: str, date: str) -> Dict[str, Any]:
         """
         级联查询航班信息
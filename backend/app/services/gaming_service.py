@@ -1,10 +1,14 @@
 """Gaming service for Steam API integration"""
+import asyncio
 from typing import List, Dict, Optional
 import httpx
 from app.models.gaming import Game, Achievement, GamingStatistics
 from app.services.data_manager import data_manager
+from app.services.event_service import event_bus
+from app.services.export_service import Export, export_collection
 from app.services.gaming_cache_service import gaming_cache_service
 from app.config import settings
+from app.utils.singleflight import singleflight
 
 
 class GamingService:
@@ -15,32 +19,42 @@ class GamingService:
 
     def __init__(self):
         self.data_file = "gaming.json"
+        # Background cache task state
+        self.cache_state = {
+            "running": False,
+            "total": 0,
+            "completed": 0,
+            "current_game": None,
+            "errors": []
+        }
 
-    def _get_steam_config(self) -> Dict:
+    async def _get_steam_config(self) -> Dict:
         """Get Steam API configuration"""
-        config_data = data_manager.read_data(settings.config_data_file)
+        config_data = await data_manager.aread(settings.config_data_file)
         api_keys = config_data.get("api_keys", {})
         return {
             "api_key": api_keys.get("steam_api_key", ""),
             "steam_id": api_keys.get("steam_id", "")
         }
 
-    def _get_cached_games(self) -> List[Dict]:
+    async def _get_cached_games(self) -> List[Dict]:
         """Get cached games from local storage"""
-        data = data_manager.read_data(self.data_file)
+        data = await data_manager.aread(self.data_file)
         return data.get("games", [])
 
-    def _save_games(self, games: List[Dict]):
-        """Save games to local storage"""
-        data = data_manager.read_data(self.data_file)
-        data["games"] = games
-        data_manager.write_data(self.data_file, data)
+    async def _save_games(self, games: List[Dict]):
+        """Save games to local storage (unchanged lists are not rewritten)"""
+        if games == await self._get_cached_games():
+            return
+        await data_manager.aset_value(self.data_file, "games", games)
+        event_bus.publish("gaming.games.updated", {"count": len(games)})
 
+    @singleflight
     async def fetch_owned_games(self) -> List[Dict]:
         """Fetch owned games from Steam API"""
-        config = self._get_steam_config()
+        config = await self._get_steam_config()
         if not config["api_key"] or not config["steam_id"]:
-            return self._get_cached_games()
+            return await self._get_cached_games()
 
         url = f"{self.STEAM_API_BASE}/IPlayerService/GetOwnedGames/v1/"
         params = {
@@ -56,12 +70,13 @@ class GamingService:
                 response.raise_for_status()
                 data = response.json()
                 games = data.get("response", {}).get("games", [])
-                self._save_games(games)
+                await self._save_games(games)
                 return games
         except Exception as e:
             print(f"Failed to fetch Steam games: {e}")
-            return self._get_cached_games()
+            return await self._get_cached_games()
 
+    @singleflight
     async def fetch_game_achievements(self, appid: int) -> List[Dict]:
         """Fetch achievements for a specific game"""
         # Check cache first
@@ -69,7 +84,7 @@ class GamingService:
         if cached is not None:
             return cached
 
-        config = self._get_steam_config()
+        config = await self._get_steam_config()
         if not config["api_key"] or not config["steam_id"]:
             return []
 
@@ -94,9 +109,10 @@ class GamingService:
             print(f"Failed to fetch achievements for {appid}: {e}")
             return []
 
-    def get_statistics(self) -> GamingStatistics:
+    @singleflight
+    async def get_statistics(self) -> GamingStatistics:
         """Calculate gaming statistics from cached data"""
-        games = self._get_cached_games()
+        games = await self._get_cached_games()
 
         total_playtime = sum(g.get("playtime_forever", 0) for g in games)
         recent_playtime = sum(g.get("playtime_2weeks", 0) or 0 for g in games)
@@ -111,18 +127,19 @@ class GamingService:
             most_played_time=most_played.get("playtime_forever", 0) if most_played else 0
         )
 
-    def get_games(self) -> List[Dict]:
+    async def get_games(self) -> List[Dict]:
         """Get cached games list"""
-        return self._get_cached_games()
+        return await self._get_cached_games()
+
+    def export_games(self, fmt: str = "ndjson") -> Export:
+        """Export the cached games, as stored, as NDJSON or CSV"""
+        return export_collection(self.data_file, "games", None, fmt)
 
-    def get_game(self, appid: int) -> Optional[Dict]:
+    async def get_game(self, appid: int) -> Optional[Dict]:
         """Get a specific game by appid"""
-        games = self._get_cached_games()
-        for game in games:
-            if game.get("appid") == appid:
-                return game
-        return None
+        return await data_manager.aget_record(self.data_file, "games", appid)
 
+    @singleflight
     async def fetch_game_details(self, appid: int) -> Optional[Dict]:
         """Fetch detailed game info from cache or Steam Store API"""
         # Check cache first
@@ -155,9 +172,10 @@ class GamingService:
             print(f"Failed to fetch game details for {appid}: {e}")
             return None
 
+    @singleflight
     async def fetch_achievement_schema(self, appid: int) -> List[Dict]:
         """Fetch achievement schema (names, descriptions, icons) from Steam API"""
-        config = self._get_steam_config()
+        config = await self._get_steam_config()
         if not config["api_key"]:
             return []
 
@@ -176,6 +194,7 @@ class GamingService:
             print(f"Failed to fetch achievement schema for {appid}: {e}")
             return []
 
+    @singleflight
     async def fetch_detailed_achievements(self, appid: int) -> List[Dict]:
         """Fetch achievements with full details (status + schema merged)"""
         # Check cache first
@@ -210,6 +229,7 @@ class GamingService:
         return cached_achievements
 
 
+    @singleflight
     async def fetch_game_news(self, appid: int, count: int = 10) -> List[Dict]:
         """Fetch news/updates for a specific game from Steam News API"""
         # Check cache first
@@ -241,5 +261,36 @@ class GamingService:
             print(f"Failed to fetch news for {appid}: {e}")
             return []
 
+    def _cache_progress(self, event_type: str):
+        event_bus.publish(event_type, {**self.cache_state, "errors": list(self.cache_state["errors"])})
+
+    async def cache_games(self, games: List[Dict]):
+        """Cache details and achievements of the given games, publishing progress events"""
+        state = self.cache_state
+        state["running"] = True
+        state["total"] = len(games)
+        state["completed"] = 0
+        state["errors"] = []
+        self._cache_progress("gaming.cache.started")
+
+        for game in games:
+            appid = game.get("appid")
+            name = game.get("name", f"Game {appid}")
+            state["current_game"] = name
+
+            try:
+                await self.fetch_game_details(appid)
+                await self.fetch_detailed_achievements(appid)
+            except Exception as e:
+                state["errors"].append({"appid": appid, "error": str(e)})
+
+            state["completed"] += 1
+            self._cache_progress("gaming.cache.progress")
+            await asyncio.sleep(0.5)  # Rate limiting
+
+        state["running"] = False
+        state["current_game"] = None
+        self._cache_progress("gaming.cache.completed")
+
 
 gaming_service = GamingService()
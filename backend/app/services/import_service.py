@@ -0,0 +1,250 @@
+"""Bulk import of records from JSON arrays, NDJSON or CSV.
+
+Rows come from a file-like upload (the request body or a multipart `file`
+field, spooled to a temporary file by app.utils.imports) and are parsed one
+at a time, JSON arrays included, while they are validated off the event
+loop: an import is never held in memory as a whole besides the validated
+records. All rows are validated before anything is written and every invalid
+row is reported with its position and errors. The valid rows are inserted in a single DataManager update: one write
+(and one backup) of the data file and one run of the service's derived
+statistics, however many rows are imported.
+"""
+import csv
+import io
+import json
+import typing
+import uuid
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Set, Tuple, Type
+from pydantic import BaseModel, ValidationError
+from app.config import settings
+from app.models.bulk import ImportResult, ImportRowError
+from app.services.data_manager import Transaction, data_manager
+from app.services.event_service import bulk_event, event_bus
+
+IMPORT_FORMATS = ("json", "ndjson", "csv")
+
+# Per-row errors returned in a response; the count covers all of them
+MAX_REPORTED_ERRORS = 1000
+
+# Characters of a JSON array upload read at a time
+_READ_CHARS = 64 * 1024
+
+_SUFFIXES = {".json": "json", ".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv"}
+_CONTENT_TYPES = {"application/json": "json", "application/x-ndjson": "ndjson", "text/csv": "csv"}
+
+
+class TooManyRowsError(ValueError):
+    """The upload has more rows than settings.import_max_rows"""
+
+
+class InvalidRowsError(ValueError):
+    """Rows failed validation and skip_invalid was not set; nothing was imported"""
+
+    def __init__(self, result: ImportResult):
+        super().__init__(f"{result.failed} invalid rows, nothing was imported")
+        self.result = result
+
+
+class ImportSource:
+    """Uploaded rows in one of IMPORT_FORMATS, read lazily"""
+
+    def __init__(self, fmt: str, file: BinaryIO):
+        self.format = fmt
+        self.file = file
+
+    def rows(self, model: Type[BaseModel]) -> Iterator[Any]:
+        """Raw rows in upload order (blocking)"""
+        if self.format == "csv":
+            return _csv_rows(self.file, _json_fields(model))
+        if self.format == "ndjson":
+            return _ndjson_rows(self.file)
+        return _json_rows(self.file)
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> str:
+    """Import format from an upload's file name or content type (JSON by default)"""
+    for suffix, fmt in _SUFFIXES.items():
+        if filename and filename.lower().endswith(suffix):
+            return fmt
+    return _CONTENT_TYPES.get((content_type or "").split(";")[0].strip().lower(), "json")
+
+
+def _json_fields(model: Type[BaseModel]) -> Set[str]:
+    """Fields holding lists or objects, which CSV cells carry as JSON"""
+    names = set()
+    for name, field in model.model_fields.items():
+        types = [field.annotation, *typing.get_args(field.annotation)]
+        if any(t in (list, dict) or typing.get_origin(t) in (list, dict) for t in types):
+            names.add(name)
+    return names
+
+
+def _csv_rows(file: BinaryIO, json_fields: Set[str]) -> Iterator[Dict[str, Any]]:
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        for row in csv.DictReader(text):
+            record = {}
+            for column, value in row.items():
+                # Empty cells fall back to the field default
+                if column is None or value is None or value == "":
+                    continue
+                if column in json_fields:
+                    try:
+                        value = json.loads(value)
+                    except ValueError:
+                        pass
+                record[column] = value
+            yield record
+    finally:
+        # Leave the underlying upload to its owner
+        text.detach()
+
+
+def _ndjson_rows(file: BinaryIO) -> Iterator[Any]:
+    for line in file:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield ValueError(f"Invalid JSON: {e}")
+
+
+class _JSONArrayReader:
+    """Decodes the elements of a JSON array one at a time from a text stream"""
+
+    def __init__(self, text: io.TextIOBase):
+        self.text = text
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, chars: int = _READ_CHARS) -> bool:
+        """Append the next chunk, dropping what has been consumed"""
+        chunk = self.text.read(chars)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Next non-whitespace character ("" at the end of the stream)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def _value(self) -> Any:
+        chars = _READ_CHARS
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A value reaching the end of the buffer (a number) may continue
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError as e:
+                if self.eof:
+                    raise ValueError(f"Invalid JSON: {e}")
+            # Incomplete value: read on, in growing steps for large values
+            self._fill(chars)
+            chars *= 2
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._peek() != "[":
+            raise ValueError("Expected a JSON array of records")
+        self.pos += 1
+        if self._peek() == "]":
+            self.pos += 1
+        else:
+            while True:
+                self._peek()
+                yield self._value()
+                separator = self._peek()
+                self.pos += 1
+                if separator == "]":
+                    break
+                if separator != ",":
+                    raise ValueError("Invalid JSON: expected ',' or ']' after a record")
+        if self._peek():
+            raise ValueError("Invalid JSON: extra data after the array")
+
+
+def _json_rows(file: BinaryIO) -> Iterator[Any]:
+    text = io.TextIOWrapper(file, encoding="utf-8-sig")
+    try:
+        yield from _JSONArrayReader(text)
+    finally:
+        # Leave the underlying upload to its owner
+        text.detach()
+
+
+def _row_errors(error: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}" for e in error.errors()]
+
+
+def validate_rows(source: ImportSource, model: Type[BaseModel]) -> Tuple[List[Dict[str, Any]], ImportResult]:
+    """Validate every row, returning the records to insert and the per-row errors"""
+    records = []
+    result = ImportResult()
+    now = datetime.now().isoformat()
+    for number, row in enumerate(source.rows(model), start=1):
+        if number > settings.import_max_rows:
+            raise TooManyRowsError(f"Imports are limited to {settings.import_max_rows} rows")
+        errors = None
+        if isinstance(row, ValueError):
+            errors = [str(row)]
+        elif not isinstance(row, dict):
+            errors = ["row: expected an object"]
+        else:
+            try:
+                instance = model.model_validate({k: v for k, v in row.items() if k != "id"})
+            except ValidationError as e:
+                errors = _row_errors(e)
+        if errors is not None:
+            result.failed += 1
+            if len(result.errors) < MAX_REPORTED_ERRORS:
+                result.errors.append(ImportRowError(row=number, errors=errors))
+            continue
+        # Imported records always get new ids; creation times are kept
+        instance.id = str(uuid.uuid4())
+        instance.created_at = instance.created_at or now
+        records.append(instance.model_dump())
+    return records, result
+
+
+async def bulk_import(
+    source: ImportSource,
+    filename: str,
+    collection: str,
+    model: Type[BaseModel],
+    skip_invalid: bool = False,
+    finish: Optional[Callable[[Transaction], None]] = None,
+    event: Optional[str] = None
+) -> ImportResult:
+    """Validate and insert all rows of an import in one update of the data file.
+
+    Unless `skip_invalid` is set, any invalid row rejects the whole import
+    with InvalidRowsError and nothing is written. A malformed upload raises
+    ValueError, one with too many rows TooManyRowsError. `finish` runs once after the inserts in
+    the same transaction, e.g. to recompute derived statistics. `event` names
+    the record type of the `<event>.imported` event published afterwards.
+    """
+    records, result = await data_manager.run_in_thread(validate_rows, source, model)
+    if result.failed and not skip_invalid:
+        raise InvalidRowsError(result)
+    if records:
+        def apply(txn: Transaction):
+            txn.insert_many(collection, records)
+            if finish is not None:
+                finish(txn)
+
+        await data_manager.aupdate(filename, apply)
+        if event is not None:
+            event_bus.publish(f"{event}.imported", bulk_event([record["id"] for record in records]))
+    result.imported = len(records)
+    return result
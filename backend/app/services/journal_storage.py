@@ -0,0 +1,298 @@
+"""Journaled JSON storage backend for DataManager.
+
+Keeps the human-readable JSON snapshot files but appends each commit as one
+line to `<file>.journal` (fsynced) instead of rewriting the snapshot. The
+snapshot is compacted when the journal passes a size threshold, after a time
+interval (checked on writes and by DataManager's compactor thread, so idle
+files are compacted too), and on shutdown (DataManager.close). Loading
+replays the journal on top of the snapshot. A compacted snapshot and its
+directory entry are fsynced before the journal is deleted.
+
+A crash in the middle of an append leaves a torn, unterminated last line.
+Replay stops there, and the next append first cuts the journal back to its
+last complete line so later commits are not glued onto the fragment.
+
+Replay treats inserts as upserts, so replaying records that already made it
+into the snapshot (a crash between compaction and journal truncation) is
+harmless. On compaction the previous snapshot and its journal are archived to
+the backup directory, which allows point-in-time recovery with load_at().
+"""
+import json
+import os
+import shutil
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.services.backup_service import BackupWorker
+from app.services.data_manager import (
+    DateTimeEncoder, JSONFileBackend, RecordIndex, apply_mutation, load_document, record_key
+)
+
+
+def _fsync_dir(path: Path):
+    """Make renames and new files in a directory durable (no-op where unsupported)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _truncate_torn_tail(journal_path: Path):
+    """Cut an unterminated last line (a crash mid-append) off the journal"""
+    try:
+        f = open(journal_path, 'r+b')
+    except FileNotFoundError:
+        return
+    with f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Find the end of the last complete line, reading backwards in blocks
+        keep = 0
+        pos = size
+        while pos > 0:
+            step = min(64 * 1024, pos)
+            pos -= step
+            f.seek(pos)
+            newline = f.read(step).rfind(b"\n")
+            if newline >= 0:
+                keep = pos + newline + 1
+                break
+        print(f"Warning: Dropping a torn entry of {size - keep} bytes from {journal_path.name}")
+        f.truncate(keep)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def replay_mutation(data: Dict[str, Any], mutation: Dict[str, Any], index: Optional[RecordIndex] = None):
+    """Apply a journaled mutation idempotently"""
+    index = index if index is not None else RecordIndex(data)
+    if mutation["op"] == "insert":
+        collection = mutation["collection"]
+        pos = index.position(collection, mutation["record"].get(record_key(collection)))
+        if pos is not None:
+            old = data[collection][pos]
+            data[collection][pos] = mutation["record"]
+            index.replaced(collection, pos, old)
+            return
+    apply_mutation(data, mutation, index)
+
+
+def _delete_run(data: Dict[str, Any], collection: str, record_ids: List[Any], index: RecordIndex):
+    """Apply consecutive deletes from one collection in a single pass"""
+    records = data.get(collection)
+    if not isinstance(records, list):
+        return
+    key = record_key(collection)
+    # Each delete removes the first remaining record with its key
+    pending = Counter(record_ids)
+    kept = []
+    for record in records:
+        record_id = record.get(key)
+        if pending[record_id] > 0:
+            pending[record_id] -= 1
+        else:
+            kept.append(record)
+    records[:] = kept
+    index.reset(collection)
+
+
+def replay_mutations(data: Dict[str, Any], mutations: List[Dict[str, Any]], index: RecordIndex):
+    """Replay the mutations of a journal entry; runs of deletes (bulk deletes) take one pass"""
+    i = 0
+    while i < len(mutations):
+        mutation = mutations[i]
+        if mutation["op"] == "delete":
+            j = i + 1
+            while j < len(mutations) and mutations[j]["op"] == "delete" \
+                    and mutations[j]["collection"] == mutation["collection"]:
+                j += 1
+            if j - i > 1:
+                _delete_run(data, mutation["collection"], [m["id"] for m in mutations[i:j]], index)
+                i = j
+                continue
+        replay_mutation(data, mutation, index)
+        i += 1
+
+
+class JournaledJSONBackend(JSONFileBackend):
+    """JSON snapshots plus an append-only write-ahead journal per file"""
+
+    name = "json-journal"
+
+    def __init__(self, data_dir: Path, backups: Optional[BackupWorker] = None, serializer=None):
+        super().__init__(data_dir, serializer)
+        self.backups = backups
+        self.backup_dir = backups.backup_dir if backups is not None else None
+        self.max_journal_bytes = settings.journal_max_bytes
+        self.compact_interval = settings.journal_compact_interval
+        self._last_compaction: Dict[str, float] = {}
+
+    def _journal_path(self, filename: str) -> Path:
+        return self._get_file_path(filename).with_name(f"{filename}.journal")
+
+    def exists(self, filename: str) -> bool:
+        """Check whether the snapshot or its journal exists"""
+        return super().exists(filename) or self._journal_path(filename).exists()
+
+    def signature(self, filename: str) -> Optional[tuple]:
+        """Combined snapshot and journal signature"""
+        snapshot = super().signature(filename)
+        try:
+            stat = os.stat(self._journal_path(filename))
+            journal = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except FileNotFoundError:
+            journal = None
+        if snapshot is None and journal is None:
+            return None
+        return (snapshot, journal)
+
+    def needs_backup(self, mutations: Optional[List[Dict[str, Any]]]) -> bool:
+        """Journaled commits are their own history; back up only full rewrites"""
+        return mutations is None
+
+    def load(self, filename: str) -> Dict[str, Any]:
+        """Load the snapshot and replay the journal on top of it"""
+        data = super().load(filename) if super().exists(filename) else {}
+        index = RecordIndex(data)
+        for entry in self._read_journal(self._journal_path(filename)):
+            replay_mutations(data, entry["mutations"], index)
+        return data
+
+    def load_at(self, filename: str, until: datetime) -> Dict[str, Any]:
+        """Reconstruct a document as it was at the given point in time.
+
+        Uses the oldest archived snapshot/journal pair compacted after `until`,
+        or the current pair when `until` is newer than the last compaction.
+        """
+        snapshot_path = self._get_file_path(filename)
+        journal_path = self._journal_path(filename)
+        if self.backup_dir is not None:
+            stem = snapshot_path.stem
+            stamp = until.strftime("%Y%m%d_%H%M%S_%f")
+            for archived in sorted(self.backup_dir.glob(f"{stem}_*.journal")):
+                if archived.stem[len(stem) + 1:] >= stamp:
+                    snapshot_path = archived.with_suffix(".json")
+                    journal_path = archived
+                    break
+
+        data = {}
+        if snapshot_path.exists():
+            data = load_document(snapshot_path.read_bytes())
+        cutoff = until.isoformat()
+        index = RecordIndex(data)
+        for entry in self._read_journal(journal_path):
+            if entry["ts"] > cutoff:
+                break
+            replay_mutations(data, entry["mutations"], index)
+        return data
+
+    def _read_journal(self, journal_path: Path):
+        """Yield journal entries, stopping at a torn trailing line.
+
+        A complete line that does not parse (an entry appended to a torn
+        fragment before the tail was cut on append) is skipped, so the
+        commits after it are still replayed.
+        """
+        if not journal_path.exists():
+            return
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Warning: Skipping a corrupt entry in {journal_path.name}")
+
+    def save(self, filename: str, data: Dict[str, Any], mutations: Optional[List[Dict[str, Any]]] = None):
+        """Append mutations to the journal, compacting when it is due"""
+        if mutations is None:
+            self.compact(filename, data)
+            return
+
+        journal_path = self._journal_path(filename)
+        entry = {"ts": datetime.now().isoformat(), "mutations": mutations}
+        line = json.dumps(entry, ensure_ascii=False, cls=DateTimeEncoder) + "\n"
+        created = not journal_path.exists()
+        if not created:
+            # Always start on a fresh line (callers hold the file lock)
+            _truncate_torn_tail(journal_path)
+        with open(journal_path, 'a', encoding='utf-8') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        if created:
+            _fsync_dir(self.data_dir)
+
+        if self._compaction_due(filename, journal_path):
+            self.compact(filename, data)
+
+    def _compaction_due(self, filename: str, journal_path: Path) -> bool:
+        if self.compaction_overdue(filename):
+            return True
+        return journal_path.stat().st_size >= self.max_journal_bytes
+
+    def compaction_overdue(self, filename: str) -> bool:
+        """Whether the compaction interval has passed since the file was last compacted"""
+        last = self._last_compaction.setdefault(filename, time.monotonic())
+        return time.monotonic() - last >= self.compact_interval
+
+    def compact(self, filename: str, data: Dict[str, Any]):
+        """Write a fresh snapshot and start an empty journal"""
+        journal_path = self._journal_path(filename)
+        snapshot_path = self._get_file_path(filename)
+        if self.backup_dir is not None and journal_path.exists() and journal_path.stat().st_size:
+            self._archive(snapshot_path, journal_path)
+
+        # The snapshot must be on disk before the journal that rebuilds it is gone
+        self._write_snapshot(snapshot_path, data)
+        if journal_path.exists():
+            journal_path.unlink()
+        self._last_compaction[filename] = time.monotonic()
+
+    def _write_snapshot(self, file_path: Path, data: Dict[str, Any]):
+        """Atomically and durably replace a snapshot (fsync file, rename, fsync directory)"""
+        temp_path = file_path.with_suffix('.tmp')
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(self.serializer.dumps(data))
+                f.flush()
+                os.fsync(f.fileno())
+            temp_path.replace(file_path)
+        except Exception:
+            if temp_path.exists():
+                temp_path.unlink()
+            raise
+        _fsync_dir(file_path.parent)
+
+    def _archive(self, snapshot_path: Path, journal_path: Path):
+        """Keep the replaced snapshot and its journal for point-in-time recovery"""
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        archive = self.backup_dir / f"{snapshot_path.stem}_{stamp}"
+        paths = [archive.with_suffix(".journal")]
+        try:
+            if snapshot_path.exists():
+                shutil.copy2(snapshot_path, archive.with_suffix(".json"))
+                paths.append(archive.with_suffix(".json"))
+            shutil.copy2(journal_path, paths[0])
+        except Exception as e:
+            print(f"Warning: Failed to archive journal: {str(e)}")
+            return
+        self.backups.track(snapshot_path.stem, stamp, paths)
+
+    def journaled_files(self) -> List[str]:
+        """Files with mutations not yet folded into their snapshot"""
+        return [path.name[:-len(".journal")] for path in self.data_dir.glob("*.journal")]
@@ -0,0 +1,177 @@
+"""Validated model cache for records read from our own data files.
+
+Records are validated once, when they are loaded or changed, and the
+validated models (and their JSON encoding) are reused until the document
+changes again. Changes are detected through DataManager.version(); a record
+is re-validated only if its dict was replaced (record mutations always store
+a new dict) or the document was reloaded from disk.
+
+List endpoints send json_array(), the pre-serialized bytes of the
+validated models, as-is instead of validating and encoding the list again
+for the response_model. Request bodies are still
+validated strictly by FastAPI. A `fields` projection serializes only the
+requested fields of each model.
+"""
+from typing import Any, Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel
+from app.services.data_manager import data_manager
+
+
+def check_fields(model: Type[BaseModel], fields: Optional[Tuple[str, ...]]):
+    """Reject a projection naming fields the model does not have"""
+    unknown = [field for field in fields or () if field not in model.model_fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+
+class ValidatedCollection:
+    """Validated models of one collection at one document version"""
+
+    def __init__(self, data: Dict[str, Any], version: int, model: Type[BaseModel]):
+        self.data = data
+        self.version = version
+        self.model = model
+        self.models: List[BaseModel] = []
+        # [record dict, model, JSON or None] per record, in collection order
+        self.items: List[list] = []
+        # id(record dict) -> item; the item keeps the dict so ids stay unique
+        self.by_record: Dict[int, list] = {}
+        self.json: Optional[bytes] = None
+        # Secondary indexes built by queries (see record_query), per version
+        self.indexes: Dict[Any, Any] = {}
+
+    def item_for(self, record: Optional[Dict[str, Any]]) -> Optional[list]:
+        """Item of a record dict, validating records changed since this version"""
+        if record is None:
+            return None
+        item = self.by_record.get(id(record))
+        if item is None or item[0] is not record:
+            # Staged by a group commit that has not been flushed yet
+            item = self.by_record[id(record)] = [record, self.model.model_validate(record), None]
+        return item
+
+    @staticmethod
+    def json_of(item: list, fields: Optional[Tuple[str, ...]] = None) -> bytes:
+        """JSON encoding of one item's record (cached), or of only the given fields"""
+        if fields:
+            return item[1].__pydantic_serializer__.to_json(item[1], include=set(fields))
+        if item[2] is None:
+            item[2] = item[1].__pydantic_serializer__.to_json(item[1])
+        return item[2]
+
+
+class ModelCache:
+    """Caches validated pydantic models per (file, collection, model)"""
+
+    def __init__(self):
+        self._collections: Dict[Tuple[str, str, Type[BaseModel]], ValidatedCollection] = {}
+        self.validated = 0
+        self.reused = 0
+
+    def collection(self, filename: str, collection: str, model: Type[BaseModel]) -> ValidatedCollection:
+        """Get the validated collection, validating only new or changed records (blocking)"""
+        # Writers change the cached lists in place under the same lock
+        with data_manager.read_lock(filename):
+            return self._collection(filename, collection, model)
+
+    def _collection(self, filename: str, collection: str, model: Type[BaseModel]) -> ValidatedCollection:
+        data = data_manager.read_data(filename)
+        version = data_manager.version(filename)
+        key = (filename, collection, model)
+        cached = self._collections.get(key)
+        if cached is not None and cached.version == version and cached.data is data:
+            return cached
+
+        previous = cached.by_record if cached is not None and cached.data is data else {}
+        entry = ValidatedCollection(data, version, model)
+        for record in data.get(collection, []):
+            hit = previous.get(id(record))
+            if hit is not None and hit[0] is record:
+                self.reused += 1
+            else:
+                hit = [record, model.model_validate(record), None]
+                self.validated += 1
+            entry.models.append(hit[1])
+            entry.items.append(hit)
+            entry.by_record[id(record)] = hit
+
+        self._collections[key] = entry
+        return entry
+
+    def items_of(self, filename: str, collection: str, model: Type[BaseModel]) -> ValidatedCollection:
+        """The collection for item_for() lookups only, without refreshing it per version.
+
+        Date index walks resolve records one by one, so they skip the O(n)
+        refresh of collection(); its item_for() validates records changed
+        since the cached version on demand.
+        """
+        with data_manager.read_lock(filename):
+            data = data_manager.read_data(filename)
+            cached = self._collections.get((filename, collection, model))
+            if cached is not None and cached.data is data:
+                return cached
+            return self._collection(filename, collection, model)
+
+    def _json(
+        self, filename: str, collection: str, model: Type[BaseModel], fields: Optional[Tuple[str, ...]] = None
+    ) -> bytes:
+        """JSON array of the collection, re-encoding only new or changed records.
+
+        Projections to a subset of fields are cached per version as well.
+        """
+        with data_manager.read_lock(filename):
+            entry = self._collection(filename, collection, model)
+            if fields:
+                key = ("json", fields)
+                if key not in entry.indexes:
+                    entry.indexes[key] = b"[" + b",".join(entry.json_of(item, fields) for item in entry.items) + b"]"
+                return entry.indexes[key]
+            if entry.json is None:
+                entry.json = b"[" + b",".join(entry.json_of(item) for item in entry.items) + b"]"
+            return entry.json
+
+    async def models(self, filename: str, collection: str, model: Type[BaseModel]) -> List[BaseModel]:
+        """Validated models of a collection (shared: do not modify them)"""
+        entry = await data_manager.run_in_thread(self.collection, filename, collection, model)
+        return entry.models
+
+    def _between(
+        self, filename: str, collection: str, model: Type[BaseModel], start: Optional[str], end: Optional[str]
+    ) -> List[BaseModel]:
+        with data_manager.read_lock(filename):
+            entry = self.items_of(filename, collection, model)
+            records = data_manager.date_range(filename, collection, start, end)
+            return [entry.item_for(record)[1] for record in records]
+
+    async def models_between(
+        self,
+        filename: str,
+        collection: str,
+        model: Type[BaseModel],
+        start: Optional[str] = None,
+        end: Optional[str] = None
+    ) -> List[BaseModel]:
+        """Validated models of a dated collection with start <= date <= end, in date order"""
+        return await data_manager.run_in_thread(self._between, filename, collection, model, start, end)
+
+    async def json_array(
+        self, filename: str, collection: str, model: Type[BaseModel], fields: Optional[Tuple[str, ...]] = None
+    ) -> bytes:
+        """A collection as a pre-validated JSON array, bypassing response_model re-validation.
+
+        `fields` projects every record to the given model fields.
+        """
+        check_fields(model, fields)
+        return await data_manager.run_in_thread(self._json, filename, collection, model, fields)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get validation counters"""
+        return {
+            "collections": len(self._collections),
+            "validated": self.validated,
+            "reused": self.reused,
+        }
+
+
+# Global instance
+model_cache = ModelCache()
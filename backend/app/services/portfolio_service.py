@@ -1,8 +1,16 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
 from app.models.portfolio import Investment, Project, Experience, PortfolioStatistics
-from app.services.data_manager import data_manager
+from app.models.bulk import BulkResult, BulkUpdate, ImportResult
+from app.services.bulk_service import bulk_delete, bulk_update
+from app.services.data_manager import data_manager, Transaction
+from app.services.event_service import event_bus, record_event
+from app.services.export_service import Export, export_collection
+from app.services.import_service import ImportSource, bulk_import
+from app.services.model_cache import model_cache
+from app.services.record_query import CollectionSpec, ListQuery, query_page
 from app.config import settings
+from app.utils.singleflight import singleflight
 import uuid
 
 
@@ -11,105 +19,132 @@ class PortfolioService:
 
     def __init__(self):
         self.data_file = settings.portfolio_data_file
+        self.investments_spec = CollectionSpec(
+            self.data_file, "investments", Investment,
+            filters=("type", "symbol"),
+            ranges=("purchase_date",),
+            sorts=("purchase_date", "name", "purchase_price", "current_price", "quantity"),
+            default_sort="-purchase_date"
+        )
 
     # Investment operations
-    def get_investments(self) -> List[Investment]:
+    async def get_investments(self) -> List[Investment]:
         """Get all investments"""
-        data = data_manager.read_data(self.data_file)
-        return [Investment(**inv) for inv in data.get("investments", [])]
+        return await model_cache.models(self.data_file, "investments", Investment)
+
+    async def get_investments_page(self, query: Optional[ListQuery] = None) -> Tuple[bytes, Optional[str]]:
+        """Get investments (optionally filtered, sorted and paginated) as pre-validated JSON, and the next page\'s cursor"""
+        return await query_page(self.investments_spec, query or ListQuery())
 
-    def get_investment(self, investment_id: str) -> Optional[Investment]:
+    def export_investments(self, fmt: str = "ndjson", date_from: Optional[str] = None, date_to: Optional[str] = None) -> Export:
+        """Export investments as NDJSON or CSV, optionally by purchase date"""
+        return export_collection(self.data_file, "investments", Investment, fmt, "purchase_date", date_from, date_to)
+
+    async def get_investment(self, investment_id: str) -> Optional[Investment]:
         """Get investment by ID"""
-        investments = self.get_investments()
-        for investment in investments:
-            if investment.id == investment_id:
-                return investment
-        return None
+        record = await data_manager.aget_record(self.data_file, "investments", investment_id)
+        return Investment(**record) if record is not None else None
 
-    def create_investment(self, investment: Investment) -> Investment:
+    async def create_investment(self, investment: Investment) -> Investment:
         """Create new investment"""
-        data = data_manager.read_data(self.data_file)
         investment.id = str(uuid.uuid4())
         investment.created_at = datetime.now().isoformat()
-
-        if "investments" not in data:
-            data["investments"] = []
-
-        data["investments"].append(investment.model_dump())
-        data_manager.write_data(self.data_file, data)
+        await data_manager.ainsert_record(self.data_file, "investments", investment.model_dump())
+        event_bus.publish("investment.created", record_event(investment))
         return investment
 
-    def update_investment(self, investment_id: str, investment: Investment) -> Optional[Investment]:
-        """Update investment"""
-        data = data_manager.read_data(self.data_file)
-        investments = data.get("investments", [])
-
-        for i, inv in enumerate(investments):
-            if inv["id"] == investment_id:
-                investment.id = investment_id
-                investment.created_at = inv.get("created_at", datetime.now().isoformat())
-                investments[i] = investment.model_dump()
-                data_manager.write_data(self.data_file, data)
-                return investment
-
-        return None
+    async def import_investments(self, source: ImportSource, skip_invalid: bool = False) -> ImportResult:
+        """Import investments in bulk with a single write"""
+        return await bulk_import(source, self.data_file, "investments", Investment, skip_invalid, event="investment")
 
-    def delete_investment(self, investment_id: str) -> bool:
+    async def update_investment(self, investment_id: str, investment: Investment) -> Optional[Investment]:
+        """Update investment"""
+        def apply(txn: Transaction) -> Optional[Investment]:
+            existing = txn.get("investments", investment_id)
+            if existing is None:
+                return None
+
+            investment.id = investment_id
+            investment.created_at = existing.get("created_at", datetime.now().isoformat())
+            txn.replace("investments", investment_id, investment.model_dump())
+            return investment
+
+        updated = await data_manager.aupdate(self.data_file, apply)
+        if updated is not None:
+            event_bus.publish("investment.updated", record_event(updated))
+        return updated
+
+    async def update_investment_price(self, investment_id: str, price: float) -> Optional[Investment]:
+        """Update only the price fields, so a concurrent edit of the investment is kept"""
+        record = await data_manager.apatch_record(self.data_file, "investments", investment_id, {
+            "current_price": price,
+            "last_price_update": datetime.now().isoformat()
+        })
+        if not record:
+            return None
+        event_bus.publish("price.updated", {
+            "id": investment_id,
+            "symbol": record.get("symbol"),
+            "current_price": record["current_price"],
+            "last_price_update": record["last_price_update"],
+        })
+        return Investment(**record)
+
+    async def delete_investment(self, investment_id: str) -> bool:
         """Delete investment"""
-        data = data_manager.read_data(self.data_file)
-        investments = data.get("investments", [])
+        deleted = await data_manager.adelete_record(self.data_file, "investments", investment_id)
+        if deleted:
+            event_bus.publish("investment.deleted", {"id": investment_id})
+        return deleted
 
-        for i, inv in enumerate(investments):
-            if inv["id"] == investment_id:
-                investments.pop(i)
-                data_manager.write_data(self.data_file, data)
-                return True
+    async def bulk_update_investments(self, update: BulkUpdate) -> BulkResult:
+        """Patch investments by id or filter in one transaction"""
+        return await bulk_update(self.investments_spec, update, event="investment")
 
-        return False
+    async def bulk_delete_investments(self, ids: List[str]) -> BulkResult:
+        """Delete investments by id in one transaction"""
+        return await bulk_delete(self.investments_spec, ids, event="investment")
 
     # Project operations
-    def get_projects(self) -> List[Project]:
+    async def get_projects(self) -> List[Project]:
         """Get all projects"""
-        data = data_manager.read_data(self.data_file)
-        return [Project(**proj) for proj in data.get("projects", [])]
+        return await model_cache.models(self.data_file, "projects", Project)
+
+    async def get_projects_json(self, fields: Optional[Tuple[str, ...]] = None) -> bytes:
+        """Get all projects as pre-validated JSON"""
+        return await model_cache.json_array(self.data_file, "projects", Project, fields)
 
-    def create_project(self, project: Project) -> Project:
+    async def create_project(self, project: Project) -> Project:
         """Create new project"""
-        data = data_manager.read_data(self.data_file)
         project.id = str(uuid.uuid4())
         project.created_at = datetime.now().isoformat()
-
-        if "projects" not in data:
-            data["projects"] = []
-
-        data["projects"].append(project.model_dump())
-        data_manager.write_data(self.data_file, data)
+        await data_manager.ainsert_record(self.data_file, "projects", project.model_dump())
+        event_bus.publish("project.created", record_event(project))
         return project
 
     # Experience operations
-    def get_experiences(self) -> List[Experience]:
+    async def get_experiences(self) -> List[Experience]:
         """Get all professional experiences"""
-        data = data_manager.read_data(self.data_file)
-        return [Experience(**exp) for exp in data.get("professional_experience", [])]
+        return await model_cache.models(self.data_file, "professional_experience", Experience)
 
-    def create_experience(self, experience: Experience) -> Experience:
+    async def get_experiences_json(self, fields: Optional[Tuple[str, ...]] = None) -> bytes:
+        """Get all professional experiences as pre-validated JSON"""
+        return await model_cache.json_array(self.data_file, "professional_experience", Experience, fields)
+
+    async def create_experience(self, experience: Experience) -> Experience:
         """Create new experience"""
-        data = data_manager.read_data(self.data_file)
         experience.id = str(uuid.uuid4())
         experience.created_at = datetime.now().isoformat()
-
-        if "professional_experience" not in data:
-            data["professional_experience"] = []
-
-        data["professional_experience"].append(experience.model_dump())
-        data_manager.write_data(self.data_file, data)
+        await data_manager.ainsert_record(self.data_file, "professional_experience", experience.model_dump())
+        event_bus.publish("experience.created", record_event(experience))
         return experience
 
     # Statistics
-    def get_statistics(self) -> PortfolioStatistics:
+    @singleflight
+    async def get_statistics(self) -> PortfolioStatistics:
         """Calculate portfolio statistics"""
-        investments = self.get_investments()
-        projects = self.get_projects()
+        investments = await self.get_investments()
+        projects = await self.get_projects()
 
         total_investment_value = 0
         total_cost = 0
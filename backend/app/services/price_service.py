@@ -2,6 +2,7 @@
 import httpx
 from datetime import datetime, timedelta
 from typing import Dict, Optional
+from app.utils.singleflight import singleflight
 
 
 class PriceService:
@@ -19,16 +20,17 @@ class PriceService:
         self._stock_cache: Dict[str, dict] = {}
         self._crypto_cache: Dict[str, dict] = {}
 
-    def _get_alpha_vantage_key(self) -> str:
+    async def _get_alpha_vantage_key(self) -> str:
         """Get Alpha Vantage API key from config"""
         try:
             from app.services.data_manager import data_manager
             from app.config import settings
-            data = data_manager.read_data(settings.config_data_file)
+            data = await data_manager.aread(settings.config_data_file)
             return data.get("api_keys", {}).get("alpha_vantage_key") or "demo"
         except:
             return "demo"
 
+    @singleflight
     async def get_stock_price(self, symbol: str) -> Optional[dict]:
         """Get stock price from Alpha Vantage"""
         symbol = symbol.upper()
@@ -45,7 +47,7 @@ class PriceService:
                 params = {
                     "function": "GLOBAL_QUOTE",
                     "symbol": symbol,
-                    "apikey": self._get_alpha_vantage_key()
+                    "apikey": await self._get_alpha_vantage_key()
                 }
                 response = await client.get(self.ALPHA_VANTAGE_URL, params=params)
                 response.raise_for_status()
@@ -70,6 +72,7 @@ class PriceService:
             print(f"Error fetching stock price for {symbol}: {e}")
             return None
 
+    @singleflight
     async def get_crypto_price(self, symbol: str) -> Optional[dict]:
         """Get cryptocurrency price from CoinGecko"""
         symbol = symbol.lower()
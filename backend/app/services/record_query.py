@@ -0,0 +1,256 @@
+"""Server-side filtering, sorting and keyset pagination for list endpoints.
+
+Queries run against secondary indexes built on the validated collection of
+the model cache, once per document version:
+
+  - equality indexes (value -> records) for filters such as
+    category, currency or airline; multi-valued fields (tags) index every
+    value
+  - sort orders (records sorted by (value, id)) for sort keys and range
+    filters on the sort key; the date field of dated collections uses the
+    DateIndex that DataManager maintains incrementally on every mutation,
+    so date-sorted and date-range queries never re-sort the collection
+
+Pages are returned as the cached per-record JSON joined into an array (or
+only the fields asked for with `fields=`), with the cursor for the next page,
+which the routers send in the X-Next-Cursor header. A cursor encodes the (value, id) of the last
+record of a page, so pages stay stable while records are inserted or
+deleted.
+"""
+import base64
+import json
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional, Set, Tuple, Type
+from pydantic import BaseModel
+from app.services.data_manager import DATE_FIELDS, RecordIndex, data_manager, key_span, sort_key
+from app.services.model_cache import ValidatedCollection, check_fields, model_cache
+
+
+class CollectionSpec:
+    """Describes which fields of a collection can be filtered and sorted"""
+
+    def __init__(
+        self,
+        filename: str,
+        collection: str,
+        model: Type[BaseModel],
+        filters: Tuple[str, ...] = (),
+        multi_filters: Tuple[str, ...] = (),
+        ranges: Tuple[str, ...] = (),
+        sorts: Tuple[str, ...] = (),
+        default_sort: str = "-id"
+    ):
+        self.filename = filename
+        self.collection = collection
+        self.model = model
+        self.filters = filters
+        self.multi_filters = multi_filters
+        self.ranges = ranges
+        self.sorts = sorts
+        self.default_sort = default_sort
+
+
+class ListQuery:
+    """Filters, sort key and page of a list request"""
+
+    def __init__(
+        self,
+        filters: Optional[Dict[str, Optional[List[str]]]] = None,
+        ranges: Optional[Dict[str, Tuple[Any, Any]]] = None,
+        sort: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[Tuple[str, ...]] = None
+    ):
+        # Drop parameters that were not given
+        self.filters = {k: v for k, v in (filters or {}).items() if v}
+        self.ranges = {k: v for k, v in (ranges or {}).items() if v[0] is not None or v[1] is not None}
+        self.sort = sort
+        self.limit = limit
+        self.cursor = cursor
+        self.fields = fields
+
+    def is_empty(self) -> bool:
+        """True when the request asks for the whole collection in stored order"""
+        return not (self.filters or self.ranges or self.sort or self.limit or self.cursor)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Parse a comma-separated `fields` parameter into a sorted tuple"""
+    if not fields:
+        return None
+    return tuple(sorted({field.strip() for field in fields.split(",") if field.strip()})) or None
+
+
+def project(records: List[Dict[str, Any]], fields: Optional[Tuple[str, ...]]) -> List[Dict[str, Any]]:
+    """Keep only the given fields of plain record dicts"""
+    if not fields:
+        return records
+    return [{field: record[field] for field in fields if field in record} for record in records]
+
+
+def _normalize(value: Any) -> Any:
+    return value.casefold() if isinstance(value, str) else value
+
+
+def _equality_index(entry: ValidatedCollection, field: str, multi: bool) -> Dict[Any, Set[int]]:
+    """value -> ids of the matching record dicts"""
+    key = ("eq", field)
+    index = entry.indexes.get(key)
+    if index is None:
+        index = {}
+        for record, instance, _ in entry.items:
+            value = getattr(instance, field, None)
+            for item in (value or []) if multi else [value]:
+                index.setdefault(_normalize(item), set()).add(id(record))
+        entry.indexes[key] = index
+    return index
+
+
+def _sort_order(entry: ValidatedCollection, field: str) -> Tuple[List[list], List[tuple]]:
+    """Items sorted by (field, id), with their sort keys"""
+    key = ("sort", field)
+    order = entry.indexes.get(key)
+    if order is None:
+        keys = [sort_key(getattr(m, field, None), m.id) for m in entry.models]
+        positions = sorted(range(len(keys)), key=keys.__getitem__)
+        order = entry.indexes[key] = ([entry.items[p] for p in positions], [keys[p] for p in positions])
+    return order
+
+
+def encode_cursor(sort_key: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(sort_key)).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        return tuple(json.loads(base64.urlsafe_b64decode(cursor.encode())))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def run_query(spec: CollectionSpec, query: ListQuery) -> Tuple[List[list], Optional[str]]:
+    """Resolve a query to model cache items (in order) and the next-page cursor"""
+    sort = query.sort or spec.default_sort
+    descending = sort.startswith("-")
+    sort_field = sort.lstrip("-")
+    if sort_field not in spec.sorts and sort_field != "id":
+        raise ValueError(f"Cannot sort by {sort_field}")
+    # Writers keep the date index in step under the same lock
+    with data_manager.read_lock(spec.filename):
+        if not query.filters and sort_field == DATE_FIELDS.get(spec.collection):
+            # Pure date walk: needs no per-version index of the model cache
+            entry = model_cache.items_of(spec.filename, spec.collection, spec.model)
+        else:
+            entry = model_cache.collection(spec.filename, spec.collection, spec.model)
+        index = data_manager.record_index(spec.filename)
+        return _run(spec, query, entry, index, sort_field, descending)
+
+
+def _run(
+    spec: CollectionSpec,
+    query: ListQuery,
+    entry: ValidatedCollection,
+    index: RecordIndex,
+    sort_field: str,
+    descending: bool
+) -> Tuple[List[list], Optional[str]]:
+    # Candidates from equality filters, smallest posting list first
+    candidates: Optional[Set[int]] = None
+    postings = []
+    for field, values in query.filters.items():
+        equality = _equality_index(entry, field, field in spec.multi_filters)
+        matched = set()
+        for value in values:
+            matched.update(equality.get(_normalize(value), ()))
+        postings.append(matched)
+    for matched in sorted(postings, key=len):
+        candidates = matched if candidates is None else candidates & matched
+        if not candidates:
+            return [], None
+
+    # Sequence to walk: the candidates sorted directly when few, the date
+    # index for the date field, or the sort order cached for this version
+    if candidates is not None and len(candidates) * 8 < len(entry.items):
+        keyed = sorted(
+            (sort_key(getattr(item[1], sort_field, None), item[1].id), item)
+            for item in (entry.by_record[rid] for rid in candidates)
+        )
+        keys = [k for k, _ in keyed]
+        item_at = [item for _, item in keyed].__getitem__
+        candidates = None
+    elif sort_field == DATE_FIELDS.get(spec.collection):
+        keys = index.dates(spec.collection).keys
+        item_at = lambda i: entry.item_for(index.get(spec.collection, keys[i][-1]))
+    else:
+        items, keys = _sort_order(entry, sort_field)
+        item_at = items.__getitem__
+
+    lo, hi = 0, len(keys)
+    other_ranges = {}
+    for field, (low, high) in query.ranges.items():
+        if field == sort_field:
+            # Range on the sort key: narrow the walk with bisect
+            low_at, high_at = key_span(keys, low, high)
+            lo, hi = max(lo, low_at), min(hi, high_at)
+        else:
+            other_ranges[field] = (low, high)
+
+    if query.cursor:
+        after = decode_cursor(query.cursor)
+        try:
+            if descending:
+                hi = min(hi, bisect_left(keys, after))
+            else:
+                lo = max(lo, bisect_right(keys, after))
+        except TypeError:
+            raise ValueError("Invalid cursor")
+
+    limit = query.limit
+    page: List[list] = []
+    steps = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+    more = False
+    for i in steps:
+        item = item_at(i)
+        if item is None:
+            continue
+        if candidates is not None and id(item[0]) not in candidates:
+            continue
+        if other_ranges and not _in_ranges(item[1], other_ranges):
+            continue
+        if limit is not None and len(page) == limit:
+            more = True
+            break
+        page.append(item)
+    if not more or not page:
+        return page, None
+    last = page[-1][1]
+    return page, encode_cursor(sort_key(getattr(last, sort_field, None), last.id))
+
+
+def _in_ranges(instance: BaseModel, ranges: Dict[str, Tuple[Any, Any]]) -> bool:
+    for field, (low, high) in ranges.items():
+        value = getattr(instance, field, None)
+        if value is None:
+            return False
+        if low is not None and value < low:
+            return False
+        if high is not None and value > high:
+            return False
+    return True
+
+
+def _page(spec: CollectionSpec, query: ListQuery) -> Tuple[bytes, Optional[str]]:
+    items, cursor = run_query(spec, query)
+    return b"[" + b",".join(ValidatedCollection.json_of(item, query.fields) for item in items) + b"]", cursor
+
+
+async def query_page(spec: CollectionSpec, query: ListQuery) -> Tuple[bytes, Optional[str]]:
+    """Run a list query off the event loop; the page as a JSON array and the next page's cursor"""
+    if query.is_empty():
+        return await model_cache.json_array(spec.filename, spec.collection, spec.model, query.fields), None
+    check_fields(spec.model, query.fields)
+    for field in query.filters:
+        if field not in spec.filters and field not in spec.multi_filters:
+            raise ValueError(f"Cannot filter by {field}")
+    return await data_manager.run_in_thread(_page, spec, query)
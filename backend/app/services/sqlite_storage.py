@@ -0,0 +1,285 @@
+"""SQLite storage backend for DataManager.
+
+Each known collection (expenses, flights, investments, ...) lives in its own
+table with indexed id/date columns, so a record mutation costs one row write.
+Every other top-level key of a document is stored as a JSON value in the
+`documents` table.
+
+Run `python -m app.services.sqlite_storage` from the backend directory to
+migrate the existing JSON data files into the database.
+"""
+import json
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+from app.config import settings
+from app.services.data_manager import DateTimeEncoder, load_document, record_key
+
+
+# Collections stored as tables, mapped to the record field indexed as `date`
+COLLECTIONS = {
+    "expenses": "date",
+    "income": "date",
+    "bills": None,
+    "budgets": None,
+    "categories": None,
+    "flights": "date",
+    "investments": "purchase_date",
+    "projects": "start_date",
+    "professional_experience": "start_date",
+    "llm_configs": None,
+    "conversations": "updated_at",
+    "games": None,
+}
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, cls=DateTimeEncoder)
+
+
+class SQLiteBackend:
+    """Stores documents in a single SQLite database (WAL mode)"""
+
+    name = "sqlite"
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+        # Collections of each file that are currently stored as tables
+        self._tables: Dict[str, Set[str]] = {}
+        self._files: Set[str] = set()
+        self._files_version: Optional[int] = None
+
+    def _create_schema(self):
+        """Create the documents table and one table per collection"""
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "file TEXT NOT NULL, key TEXT NOT NULL, value TEXT, "
+                "PRIMARY KEY (file, key))"
+            )
+            for collection in COLLECTIONS:
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {collection} ("
+                    "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                    "id NOT NULL UNIQUE, date TEXT, body TEXT NOT NULL)"
+                )
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{collection}_date ON {collection} (date)"
+                )
+
+    def needs_backup(self, mutations: Optional[List[Dict[str, Any]]]) -> bool:
+        """Every commit changes the database, so snapshot it (see backup_service)"""
+        return True
+
+    def backup_path(self, filename: str) -> Path:
+        """All documents live in one database, which is backed up as a whole"""
+        return self.db_path
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def _data_version(self) -> int:
+        """Counter that changes whenever another connection commits"""
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _refresh_files(self) -> int:
+        """Reload the set of stored files if another connection changed the database"""
+        version = self._data_version()
+        if version != self._files_version:
+            rows = self._conn.execute("SELECT DISTINCT file FROM documents").fetchall()
+            self._files = {row[0] for row in rows}
+            self._files_version = version
+        return version
+
+    def exists(self, filename: str) -> bool:
+        """Check whether a document is stored"""
+        with self._lock:
+            self._refresh_files()
+            return filename in self._files
+
+    def signature(self, filename: str) -> Optional[tuple]:
+        """Cache signature; own commits keep the cached document current"""
+        with self._lock:
+            version = self._refresh_files()
+            if filename not in self._files:
+                return None
+            return (version,)
+
+    def load(self, filename: str) -> Dict[str, Any]:
+        """Assemble a document from the documents table and collection tables"""
+        with self._lock:
+            data = {}
+            tables = set()
+            rows = self._conn.execute(
+                "SELECT key, value FROM documents WHERE file = ? ORDER BY rowid", (filename,)
+            ).fetchall()
+            for key, value in rows:
+                if value is None:
+                    bodies = self._conn.execute(f"SELECT body FROM {key} ORDER BY seq").fetchall()
+                    data[key] = [json.loads(body) for (body,) in bodies]
+                    tables.add(key)
+                else:
+                    data[key] = json.loads(value)
+            self._tables[filename] = tables
+            return data
+
+    def save(self, filename: str, data: Dict[str, Any], mutations: Optional[List[Dict[str, Any]]] = None):
+        """Persist mutations as row writes, or the whole document if needed"""
+        with self._lock:
+            tables = self._tables.get(filename)
+            if mutations is None or tables is None or not self._can_apply(mutations, tables):
+                self._save_document(filename, data)
+                return
+
+            with self._transaction():
+                for mutation in mutations:
+                    self._apply(filename, mutation, tables)
+
+    def _can_apply(self, mutations: List[Dict[str, Any]], tables: Set[str]) -> bool:
+        """Check that every record mutation targets a table-backed collection"""
+        return all(m["op"] == "set" or m["collection"] in tables for m in mutations)
+
+    def _transaction(self):
+        return _Transaction(self._conn)
+
+    def _apply(self, filename: str, mutation: Dict[str, Any], tables: Set[str]):
+        """Apply one mutation as row writes"""
+        op = mutation["op"]
+        if op == "set":
+            self._write_key(filename, mutation["key"], mutation["value"], tables)
+            return
+
+        collection = mutation["collection"]
+        if op == "insert":
+            self._insert_rows(collection, [mutation["record"]])
+        elif op == "replace":
+            record = mutation["record"]
+            self._conn.execute(
+                f"UPDATE {collection} SET id = ?, date = ?, body = ? WHERE id = ?",
+                (record.get(record_key(collection)), self._date_of(collection, record),
+                 _dumps(record), mutation["id"])
+            )
+        elif op == "patch":
+            row = self._conn.execute(
+                f"SELECT body FROM {collection} WHERE id = ?", (mutation["id"],)
+            ).fetchone()
+            if row is not None:
+                record = {**json.loads(row[0]), **mutation["fields"]}
+                self._conn.execute(
+                    f"UPDATE {collection} SET date = ?, body = ? WHERE id = ?",
+                    (self._date_of(collection, record), _dumps(record), mutation["id"])
+                )
+        elif op == "delete":
+            self._conn.execute(f"DELETE FROM {collection} WHERE id = ?", (mutation["id"],))
+
+    def _save_document(self, filename: str, data: Dict[str, Any]):
+        """Replace every stored key of a document"""
+        tables = set()
+        with self._transaction():
+            for collection in self._tables_of(filename):
+                self._conn.execute(f"DELETE FROM {collection}")
+            self._conn.execute("DELETE FROM documents WHERE file = ?", (filename,))
+            for key, value in data.items():
+                self._write_key(filename, key, value, tables)
+        self._tables[filename] = tables
+        self._files.add(filename)
+
+    def _tables_of(self, filename: str) -> List[str]:
+        rows = self._conn.execute(
+            "SELECT key FROM documents WHERE file = ? AND value IS NULL", (filename,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def _write_key(self, filename: str, key: str, value: Any, tables: Set[str]):
+        """Store one top-level key, as a table when it is a keyed collection"""
+        if key in tables:
+            self._conn.execute(f"DELETE FROM {key}")
+            tables.discard(key)
+
+        if self._is_table_collection(key, value):
+            self._insert_rows(key, value)
+            stored = None
+            tables.add(key)
+        else:
+            stored = _dumps(value)
+
+        self._conn.execute(
+            "INSERT INTO documents (file, key, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (file, key) DO UPDATE SET value = excluded.value",
+            (filename, key, stored)
+        )
+
+    def _is_table_collection(self, key: str, value: Any) -> bool:
+        """Lists of records with unique keys go to their collection table"""
+        if key not in COLLECTIONS or not isinstance(value, list):
+            return False
+        field = record_key(key)
+        ids = [r.get(field) if isinstance(r, dict) else None for r in value]
+        return None not in ids and len(set(ids)) == len(ids)
+
+    def _insert_rows(self, collection: str, records: List[Dict[str, Any]]):
+        field = record_key(collection)
+        self._conn.executemany(
+            f"INSERT INTO {collection} (id, date, body) VALUES (?, ?, ?)",
+            [(r[field], self._date_of(collection, r), _dumps(r)) for r in records]
+        )
+
+    def _date_of(self, collection: str, record: Dict[str, Any]) -> Optional[str]:
+        field = COLLECTIONS.get(collection)
+        return record.get(field) if field else None
+
+
+class _Transaction:
+    """Context manager wrapping statements in BEGIN IMMEDIATE / COMMIT"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
+
+
+def migrate_json_to_sqlite(data_dir: Path = None, db_path: Path = None, force: bool = False) -> Dict[str, str]:
+    """One-shot import of the JSON data files into the SQLite database"""
+    data_dir = data_dir or settings.data_dir
+    db_path = db_path or data_dir / settings.sqlite_db_file
+    backend = SQLiteBackend(db_path)
+
+    results = {}
+    for json_path in sorted(data_dir.glob("*.json")):
+        filename = json_path.name
+        if backend.exists(filename) and not force:
+            results[filename] = "skipped (already migrated)"
+            continue
+        try:
+            data = load_document(json_path.read_bytes())
+        except ValueError as e:
+            results[filename] = f"failed: {e}"
+            continue
+        backend.save(filename, data)
+        results[filename] = "migrated"
+    return results
+
+
+if __name__ == "__main__":
+    force = "--force" in sys.argv[1:]
+    for name, status in migrate_json_to_sqlite(force=force).items():
+        print(f"{name}: {status}")
+    print("Set STORAGE_BACKEND=sqlite to use the migrated database.")
@@ -1,9 +1,17 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 from app.models.travel import Flight, AirlineStats, Achievement, TravelStatistics
-from app.services.data_manager import data_manager
+from app.models.bulk import BulkResult, BulkUpdate, ImportResult
+from app.services.bulk_service import bulk_delete, bulk_update
+from app.services.data_manager import data_manager, Transaction
+from app.services.event_service import event_bus, record_event
+from app.services.export_service import Export, export_collection
+from app.services.import_service import ImportSource, bulk_import
+from app.services.model_cache import model_cache
+from app.services.record_query import CollectionSpec, ListQuery, query_page
 from app.services.airport_data_service import airport_data_service
 from app.config import settings
+from app.utils.singleflight import singleflight
 import uuid
 from collections import defaultdict
 
@@ -13,71 +21,96 @@ class TravelService:
 
     def __init__(self):
         self.data_file = settings.travel_data_file
+        self.flights_spec = CollectionSpec(
+            self.data_file, "flights", Flight,
+            filters=("airline", "origin", "destination", "travel_class"),
+            ranges=("date", "distance"),
+            sorts=("date", "distance", "cost", "airline", "flight_number"),
+            default_sort="-date"
+        )
 
     # Flight operations
-    def get_flights(self) -> List[Flight]:
+    async def get_flights(self) -> List[Flight]:
         """Get all flights"""
-        data = data_manager.read_data(self.data_file)
-        return [Flight(**flight) for flight in data.get("flights", [])]
+        return await model_cache.models(self.data_file, "flights", Flight)
+
+    async def get_flights_page(self, query: Optional[ListQuery] = None) -> Tuple[bytes, Optional[str]]:
+        """Get flights (optionally filtered, sorted and paginated) as pre-validated JSON, and the next page\'s cursor"""
+        return await query_page(self.flights_spec, query or ListQuery())
 
-    def get_flight(self, flight_id: str) -> Optional[Flight]:
+    def export_flights(self, fmt: str = "ndjson", date_from: Optional[str] = None, date_to: Optional[str] = None) -> Export:
+        """Export flights as NDJSON or CSV"""
+        return export_collection(self.data_file, "flights", Flight, fmt, "date", date_from, date_to)
+
+    async def get_flight(self, flight_id: str) -> Optional[Flight]:
         """Get flight by ID"""
-        flights = self.get_flights()
-        for flight in flights:
-            if flight.id == flight_id:
-                return flight
-        return None
+        record = await data_manager.aget_record(self.data_file, "flights", flight_id)
+        return Flight(**record) if record is not None else None
 
-    def create_flight(self, flight: Flight) -> Flight:
+    async def create_flight(self, flight: Flight) -> Flight:
         """Create new flight"""
-        data = data_manager.read_data(self.data_file)
         flight.id = str(uuid.uuid4())
         flight.created_at = datetime.now().isoformat()
 
-        if "flights" not in data:
-            data["flights"] = []
-
-        data["flights"].append(flight.model_dump())
-        data_manager.write_data(self.data_file, data)
-
-        # Update airline statistics
-        self._update_airline_stats(data)
+        def apply(txn: Transaction):
+            txn.insert("flights", flight.model_dump())
+            # Update airline statistics
+            self._update_airline_stats(txn)
 
+        await data_manager.aupdate(self.data_file, apply)
+        event_bus.publish("flight.created", record_event(flight))
         return flight
 
-    def update_flight(self, flight_id: str, flight: Flight) -> Optional[Flight]:
-        """Update flight"""
-        data = data_manager.read_data(self.data_file)
-        flights = data.get("flights", [])
+    async def import_flights(self, source: ImportSource, skip_invalid: bool = False) -> ImportResult:
+        """Import flights in bulk, updating airline statistics once"""
+        return await bulk_import(
+            source, self.data_file, "flights", Flight, skip_invalid,
+            finish=self._update_airline_stats, event="flight"
+        )
 
-        for i, flt in enumerate(flights):
-            if flt["id"] == flight_id:
-                flight.id = flight_id
-                flight.created_at = flt.get("created_at", datetime.now().isoformat())
-                flights[i] = flight.model_dump()
-                data_manager.write_data(self.data_file, data)
-                self._update_airline_stats(data)
-                return flight
+    async def update_flight(self, flight_id: str, flight: Flight) -> Optional[Flight]:
+        """Update flight"""
+        def apply(txn: Transaction) -> Optional[Flight]:
+            existing = txn.get("flights", flight_id)
+            if existing is None:
+                return None
+
+            flight.id = flight_id
+            flight.created_at = existing.get("created_at", datetime.now().isoformat())
+            txn.replace("flights", flight_id, flight.model_dump())
+            self._update_airline_stats(txn)
+            return flight
+
+        updated = await data_manager.aupdate(self.data_file, apply)
+        if updated is not None:
+            event_bus.publish("flight.updated", record_event(updated))
+        return updated
+
+    async def delete_flight(self, flight_id: str) -> bool:
+        """Delete flight"""
+        def apply(txn: Transaction) -> bool:
+            if not txn.delete("flights", flight_id):
+                return False
 
-        return None
+            self._update_airline_stats(txn)
+            return True
 
-    def delete_flight(self, flight_id: str) -> bool:
-        """Delete flight"""
-        data = data_manager.read_data(self.data_file)
-        flights = data.get("flights", [])
+        deleted = await data_manager.aupdate(self.data_file, apply)
+        if deleted:
+            event_bus.publish("flight.deleted", {"id": flight_id})
+        return deleted
 
-        for i, flt in enumerate(flights):
-            if flt["id"] == flight_id:
-                flights.pop(i)
-                data_manager.write_data(self.data_file, data)
-                self._update_airline_stats(data)
-                return True
+    async def bulk_update_flights(self, update: BulkUpdate) -> BulkResult:
+        """Patch flights by id or filter in one transaction, recomputing airline statistics once"""
+        return await bulk_update(self.flights_spec, update, finish=self._update_airline_stats, event="flight")
 
-        return False
+    async def bulk_delete_flights(self, ids: List[str]) -> BulkResult:
+        """Delete flights by id in one transaction, recomputing airline statistics once"""
+        return await bulk_delete(self.flights_spec, ids, finish=self._update_airline_stats, event="flight")
 
-    def _update_airline_stats(self, data: Dict):
+    def _update_airline_stats(self, txn: Transaction):
         """Update airline statistics based on flights"""
-        flights = data.get("flights", [])
+        flights = txn.data.get("flights", [])
         airline_stats = defaultdict(lambda: {
             "total_flights": 0,
             "total_km": 0,
@@ -110,20 +143,20 @@ class TravelService:
                 "favorite_route": favorite_route
             }
 
-        data["airlines"] = airlines
-        data_manager.write_data(self.data_file, data)
+        txn.set("airlines", airlines)
 
     # Airline statistics
-    def get_airline_stats(self) -> List[AirlineStats]:
+    async def get_airline_stats(self) -> List[AirlineStats]:
         """Get airline statistics"""
-        data = data_manager.read_data(self.data_file)
+        data = await data_manager.aread(self.data_file)
         airlines = data.get("airlines", {})
         return [AirlineStats(**stats) for stats in airlines.values()]
 
     # Achievements
-    def get_achievements(self) -> List[Achievement]:
+    @singleflight
+    async def get_achievements(self) -> List[Achievement]:
         """Get travel achievements with expanded categories"""
-        data = data_manager.read_data(self.data_file)
+        data = await data_manager.aread(self.data_file)
         flights = data.get("flights", [])
 
         # Calculate statistics
@@ -221,9 +254,10 @@ class TravelService:
         return result
 
     # Statistics
-    def get_statistics(self) -> TravelStatistics:
+    @singleflight
+    async def get_statistics(self) -> TravelStatistics:
         """Calculate travel statistics"""
-        flights = self.get_flights()
+        flights = await self.get_flights()
         current_year = datetime.now().year
 
         total_flights = len(flights)
@@ -234,7 +268,6 @@ class TravelService:
         cities = set()
         airports = set()
         airlines = set()
-        this_year_flights = 0
 
         for flight in flights:
             cities.add(flight.origin)
@@ -242,13 +275,12 @@ class TravelService:
             airports.add(flight.origin)
             airports.add(flight.destination)
             airlines.add(flight.airline)
-            # Count this year's flights
-            try:
-                flight_year = int(flight.date[:4])
-                if flight_year == current_year:
-                    this_year_flights += 1
-            except:
-                pass
+
+        # Count this year's flights from the date index (every ISO date of the
+        # year sorts between "YYYY" and "YYYY-99")
+        this_year_flights = await data_manager.adate_count(
+            self.data_file, "flights", str(current_year), f"{current_year}-99"
+        )
 
         # Find favorite airline
         airline_counts = defaultdict(int)
@@ -0,0 +1,283 @@
+"""Negotiated response compression.
+
+Compresses JSON and text responses above `compression_min_bytes` with the
+best encoding the client accepts: brotli or zstd when the `brotli` /
+`zstandard` packages are installed, gzip otherwise. Responses that carry an
+ETag (see app.utils.etag) are compressed once per (ETag, encoding): the
+compressed body is kept in a size-bounded LRU cache, so hot responses are
+not recompressed until their data version changes. Compressed responses get
+a weak ETag, like other servers that transform content.
+
+Streaming responses are compressed chunk by chunk and flushed after every
+chunk so they keep streaming. Server-sent event streams and responses marked
+`Cache-Control: no-transform` are passed through untouched.
+"""
+import gzip
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import settings
+from app.services.data_manager import data_manager
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/", "application/javascript", "image/svg+xml")
+
+# Bodies at least this large are compressed on the I/O thread pool
+OFFLOAD_BYTES = 64 * 1024
+
+
+def available_encodings() -> List[str]:
+    """Supported content codings, most preferred first"""
+    encodings = []
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    encodings.append("gzip")
+    return encodings
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Pick the preferred supported encoding the client accepts"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in available_encodings():
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a whole body"""
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    return gzip.compress(body, compresslevel=6)
+
+
+class _StreamCompressor:
+    """Incremental compressor that flushes after every chunk"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=5)
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        else:
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        if self.encoding == "zstd":
+            return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies keyed by (ETag, encoding), bounded in bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: Tuple[str, str], body: bytes):
+        if len(body) > self.max_bytes or key in self._entries:
+            return
+        self._entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses for clients that accept it"""
+
+    def __init__(self, app, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = settings.compression_min_bytes if minimum_size is None else minimum_size
+        self.cache = compressed_bodies
+        self.stats = compression_stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accept = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"accept-encoding"), "")
+        encoding = negotiate(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Dict[str, Any]] = None
+        stream: Optional[_StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, stream, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                if start["status"] == 304:
+                    # Validates a representation that was most likely compressed
+                    passthrough = True
+                    await send(self._weaken_etag(message))
+                    return
+                if not self._eligible(message):
+                    passthrough = True
+                    await send(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if stream is not None:
+                chunk = stream.chunk(body) if body else b""
+                if not more_body:
+                    chunk += stream.finish()
+                self.stats["bytes_in"] += len(body)
+                self.stats["bytes_out"] += len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                return
+
+            if not more_body:
+                if len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressed = await self._compress_whole(start, body, encoding)
+                await send(self._start_message(start, encoding, len(compressed)))
+                await send({"type": "http.response.body", "body": compressed})
+                return
+
+            # Streaming response: compress and flush chunk by chunk
+            stream = _StreamCompressor(encoding)
+            self.stats["streamed"] += 1
+            await send(self._start_message(start, encoding, None))
+            chunk = stream.chunk(body) if body else b""
+            self.stats["bytes_in"] += len(body)
+            self.stats["bytes_out"] += len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _eligible(start: Dict[str, Any]) -> bool:
+        if start["status"] in (204, 304) or start["status"] < 200:
+            return False
+        headers = {k.lower(): v.decode("latin-1").lower() for k, v in start.get("headers", [])}
+        if b"content-encoding" in headers:
+            return False
+        if "no-transform" in headers.get(b"cache-control", ""):
+            return False
+        content_type = headers.get(b"content-type", "")
+        if content_type.startswith("text/event-stream"):
+            return False
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    async def _compress_whole(self, start: Dict[str, Any], body: bytes, encoding: str) -> bytes:
+        """Compress a complete body, reusing the cached result for its ETag"""
+        etag = next((v.decode("latin-1") for k, v in start.get("headers", []) if k.lower() == b"etag"), None)
+        key = (etag, encoding)
+        if etag is not None and start["status"] == 200:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        if len(body) >= OFFLOAD_BYTES:
+            compressed = await data_manager.run_in_thread(compress, body, encoding)
+        else:
+            compressed = compress(body, encoding)
+        if etag is not None and start["status"] == 200:
+            self.cache.put(key, compressed)
+        self.stats["compressed"] += 1
+        self.stats["bytes_in"] += len(body)
+        self.stats["bytes_out"] += len(compressed)
+        return compressed
+
+    @staticmethod
+    def _weaken_etag(start: Dict[str, Any]) -> Dict[str, Any]:
+        headers = [
+            (key, b"W/" + value if key.lower() == b"etag" and not value.startswith(b"W/") else value)
+            for key, value in start.get("headers", [])
+        ]
+        return {**start, "headers": headers}
+
+    @staticmethod
+    def _start_message(start: Dict[str, Any], encoding: str, length: Optional[int]) -> Dict[str, Any]:
+        headers = []
+        vary = None
+        for key, value in start.get("headers", []):
+            name = key.lower()
+            if name == b"content-length":
+                continue
+            if name == b"etag" and not value.startswith(b"W/"):
+                value = b"W/" + value
+            if name == b"vary":
+                vary = value
+                continue
+            headers.append((key, value))
+        headers.append((b"content-encoding", encoding.encode()))
+        headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        return {**start, "headers": headers}
+
+
+# Shared by the middleware instances of the app
+compressed_bodies = CompressedBodyCache(settings.compression_cache_bytes)
+compression_stats = {"compressed": 0, "streamed": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+def get_compression_stats() -> Dict[str, Any]:
+    """Compression counters and cache usage"""
+    return {
+        "encodings": available_encodings(),
+        "cache_hits": compressed_bodies.hits,
+        "cache_misses": compressed_bodies.misses,
+        "cache_bytes": compressed_bodies.size,
+        **compression_stats,
+    }
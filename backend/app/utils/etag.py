@@ -0,0 +1,79 @@
+"""Conditional GETs for endpoints computed from data files.
+
+Routes list the data files they read with `dependencies=[Depends(etag_for(...))]`.
+The ETag is derived from DataManager's version counter of each file (checked
+against the file, so writes by other workers are noticed), the request path and
+query parameters. A request whose If-None-Match matches gets 304 Not Modified
+before the endpoint reads or serializes anything; ETagMiddleware adds the
+header to successful responses.
+"""
+import hashlib
+from datetime import date
+from typing import Callable, List
+from fastapi import HTTPException, Request
+from app.services.data_manager import data_manager
+
+
+def _versions(filenames: List[str]) -> List[int]:
+    return [data_manager.current_version(filename) for filename in filenames]
+
+
+async def check_etag(request: Request, *filenames: str, extra: str = ""):
+    """Answer If-None-Match from the versions of the given data files.
+
+    Raises 304 Not Modified when the client's copy is current, otherwise
+    records the ETag for ETagMiddleware. Endpoints that refresh a file from
+    upstream first call this after the refresh instead of using etag_for().
+    `extra` versions other inputs of the response, such as exchange rates.
+    """
+    versions = await data_manager.run_in_thread(_versions, list(filenames))
+    key = "|".join([
+        data_manager.instance_id,
+        ",".join(f"{name}:{version}" for name, version in zip(filenames, versions)),
+        extra,
+        # Derived values such as this year's flights also depend on the date
+        date.today().isoformat(),
+        request.url.path,
+        "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items())),
+    ])
+    etag = '"' + hashlib.blake2b(key.encode(), digest_size=12).hexdigest() + '"'
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            raise HTTPException(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    request.state.etag = etag
+
+
+def etag_for(*filenames: str) -> Callable:
+    """Dependency answering If-None-Match from the versions of the given data files"""
+    async def check(request: Request):
+        await check_etag(request, *filenames)
+
+    return check
+
+
+class ETagMiddleware:
+    """Adds the ETag computed by etag_for() to successful GET responses"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                etag = scope.get("state", {}).get("etag")
+                if etag:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"etag", etag.encode()))
+                    # Cache, but revalidate on every use
+                    headers.append((b"cache-control", b"no-cache"))
+                    message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
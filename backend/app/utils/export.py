@@ -0,0 +1,12 @@
+"""HTTP side of collection exports (see app.services.export_service)."""
+from fastapi.responses import StreamingResponse
+from app.services.export_service import Export
+
+
+def stream_export(export: Export) -> StreamingResponse:
+    """Stream an export as a file download"""
+    return StreamingResponse(
+        export.chunks,
+        media_type=export.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{export.filename}"'}
+    )
@@ -0,0 +1,54 @@
+"""HTTP side of bulk imports (see app.services.import_service).
+
+Request bodies are streamed into a spooled temporary file, which stays in
+memory up to SPOOL_MAX_BYTES and moves to disk beyond, whatever the body
+type; multipart uploads are spooled the same way by Starlette.
+"""
+from tempfile import SpooledTemporaryFile
+from typing import AsyncIterator, Awaitable, Optional
+from fastapi import HTTPException, Query, Request
+from app.models.bulk import ImportResult
+from app.services.import_service import (
+    IMPORT_FORMATS, ImportSource, InvalidRowsError, TooManyRowsError, detect_format
+)
+
+# Same threshold as Starlette's multipart uploads
+SPOOL_MAX_BYTES = 1024 * 1024
+
+
+async def import_source(
+    request: Request,
+    format: Optional[str] = Query(None, description="json, ndjson or csv; detected from the upload if omitted")
+) -> AsyncIterator[ImportSource]:
+    """Dependency reading the rows to import from the body or a multipart `file` field"""
+    if format is not None and format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported import format: {format}")
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Expected the rows in a 'file' upload")
+        yield ImportSource(format or detect_format(upload.filename, upload.content_type), upload.file)
+        return
+
+    spooled = SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    try:
+        async for chunk in request.stream():
+            spooled.write(chunk)
+        spooled.seek(0)
+        yield ImportSource(format or detect_format(None, content_type), spooled)
+    finally:
+        spooled.close()
+
+
+async def run_import(result: Awaitable[ImportResult]) -> ImportResult:
+    """Await an import, answering rejected imports with 422 or 413 and malformed uploads with 400"""
+    try:
+        return await result
+    except InvalidRowsError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), **e.result.model_dump()})
+    except TooManyRowsError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,9 @@
+"""HTTP side of pre-serialized list pages (see app.services.record_query)."""
+from typing import Optional
+from fastapi import Response
+
+
+def json_page(content: bytes, next_cursor: Optional[str] = None) -> Response:
+    """Send a JSON array encoded by the model cache as-is, with the cursor of the next page"""
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return Response(content=content, media_type="application/json", headers=headers)
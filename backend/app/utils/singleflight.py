@@ -0,0 +1,65 @@
+"""Coalescing of concurrent identical async calls.
+
+A function decorated with @singleflight runs at most once at a time per set
+of arguments: callers arriving while a call with the same arguments is in
+flight await that call's result (or exception) instead of starting their
+own. Nothing is cached once the call completes. Results are shared between
+the callers of one flight, so they must not be modified.
+
+Works on service methods (the instance is part of the key) and on route
+handlers. Calls whose arguments are not hashable are not coalesced.
+"""
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+# Counters per decorated function, reported by get_singleflight_stats()
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _call_key(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Optional[Hashable]:
+    key = (args, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _landed(in_flight: Dict[Hashable, asyncio.Task], key: Hashable, task: asyncio.Task):
+    if in_flight.get(key) is task:
+        del in_flight[key]
+    if not task.cancelled():
+        # Retrieved here too in case every caller was cancelled
+        task.exception()
+
+
+def singleflight(fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Decorator sharing one in-flight call among concurrent identical calls"""
+    name = f"{fn.__module__}.{fn.__qualname__}"
+    stats = _stats.setdefault(name, {"calls": 0, "shared": 0})
+    in_flight: Dict[Hashable, asyncio.Task] = {}
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        stats["calls"] += 1
+        key = _call_key(args, kwargs)
+        if key is None:
+            return await fn(*args, **kwargs)
+
+        task = in_flight.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            in_flight[key] = task
+            task.add_done_callback(functools.partial(_landed, in_flight, key))
+        else:
+            stats["shared"] += 1
+        # A cancelled caller must not cancel the flight the others wait for
+        return await asyncio.shield(task)
+
+    return wrapper
+
+
+def get_singleflight_stats() -> Dict[str, Dict[str, int]]:
+    """Calls and coalesced calls per decorated function"""
+    return {name: dict(counts) for name, counts in _stats.items() if counts["calls"]}
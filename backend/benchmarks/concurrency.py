@@ -0,0 +1,144 @@
+"""Stress check: no update is lost under concurrent writers.
+
+Runs against a temporary data directory, all at the same time:
+
+- `--creates` parallel POST /api/finance/expenses requests (async API, group
+  commit when GROUP_COMMIT_WINDOW_MS is set),
+- `--threads` threads doing read-modify-write increments of a counter in
+  finance.json through the synchronous update() API,
+- `--processes` worker processes inserting expenses into the same file
+  (cross-process fcntl locking, as with several uvicorn workers).
+
+Then reloads finance.json from disk and checks that every created expense is
+present exactly once and that no increment was lost. Exits non-zero if not.
+
+    cd backend
+    python -m benchmarks.concurrency --creates 2000 --threads 4 --processes 2
+    JOURNAL_ENABLED=true python -m benchmarks.concurrency
+    GROUP_COMMIT_WINDOW_MS=5 python -m benchmarks.concurrency
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.health_latency import expense  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--creates", type=int, default=2000, help="parallel POST /api/finance/expenses")
+    parser.add_argument("--threads", type=int, default=4, help="threads incrementing a counter")
+    parser.add_argument("--increments", type=int, default=250, help="increments per thread")
+    parser.add_argument("--processes", type=int, default=2, help="worker processes inserting expenses")
+    parser.add_argument("--process-creates", type=int, default=500, help="inserts per worker process")
+    return parser.parse_args()
+
+
+def process_worker(n: int, count: int, start: multiprocessing.Event):
+    """Insert expenses with known ids from a separate process"""
+    from app.config import settings
+    from app.services.data_manager import data_manager
+
+    start.wait()
+    for i in range(count):
+        record = expense(i)
+        record["id"] = f"process-{n}-{i}"
+        data_manager.insert_record(settings.finance_data_file, "expenses", record)
+    data_manager.close()
+
+
+def increment(txn):
+    txn.set("stress_counter", txn.data.get("stress_counter", 0) + 1)
+
+
+async def run(args) -> bool:
+    import httpx
+    from app.main import app
+    from app.config import settings
+    from app.services.data_manager import data_manager
+
+    filename = settings.finance_data_file
+    data_manager.initialize_file(filename, {"expenses": [], "income": [], "bills": [], "budgets": []})
+
+    context = multiprocessing.get_context("spawn")
+    start = context.Event()
+    processes = [
+        context.Process(target=process_worker, args=(n, args.process_creates, start))
+        for n in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def thread_worker():
+        start.wait()
+        for _ in range(args.increments):
+            data_manager.update(filename, increment)
+
+    threads = [threading.Thread(target=thread_worker) for _ in range(args.threads)]
+    for thread in threads:
+        thread.start()
+
+    created = []
+
+    async def create(client, i):
+        body = expense(i)
+        del body["id"], body["created_at"]
+        response = await client.post("/api/finance/expenses", json=body)
+        response.raise_for_status()
+        created.append(response.json()["id"])
+
+    began = time.perf_counter()
+    start.set()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://stress") as client:
+        await asyncio.gather(*(create(client, i) for i in range(args.creates)))
+    for thread in threads:
+        thread.join()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - began
+    data_manager.close()
+
+    # Read back from disk, bypassing the in-memory cache
+    data = data_manager.backend.load(filename)
+    counts = Counter(record["id"] for record in data.get("expenses", []))
+    expected = set(created) | {
+        f"process-{n}-{i}" for n in range(args.processes) for i in range(args.process_creates)
+    }
+    missing = expected - set(counts)
+    duplicated = [record_id for record_id, count in counts.items() if count > 1]
+    counter = data.get("stress_counter", 0)
+    expected_counter = args.threads * args.increments
+
+    print(f"backend:     {data_manager.backend.name}, group commit {settings.group_commit_window_ms} ms")
+    print(f"writes:      {len(expected)} creates, {expected_counter} increments in {elapsed:.2f}s")
+    print(f"expenses:    {len(counts)} stored, {len(missing)} missing, {len(duplicated)} duplicated")
+    print(f"counter:     {counter} (expected {expected_counter})")
+    failures = [process.exitcode for process in processes if process.exitcode != 0]
+    if failures:
+        print(f"worker processes failed: {failures}")
+    ok = not missing and not duplicated and counter == expected_counter and not failures
+    print("OK" if ok else "FAILED: updates were lost")
+    return ok
+
+
+def main():
+    args = parse_args()
+    data_dir = tempfile.mkdtemp(prefix="console-stress-")
+    os.environ["DATA_DIR"] = data_dir
+    os.environ["BACKUP_ENABLED"] = "false"
+    os.environ.setdefault("STORAGE_BACKEND", "json")
+    if not asyncio.run(run(args)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Benchmark: /api/health latency while large document writes are in flight.
+
+Seeds a temporary data directory with a large finance.json, then keeps
+writers busy inserting expenses (each insert rewrites the whole file with the
+JSON backend) while a probe requests /api/health every few milliseconds.
+
+    cd backend
+    python -m benchmarks.health_latency --expenses 50000 --seconds 10
+
+`--blocking` performs the writes with the synchronous DataManager API on the
+event loop, as the routers did before the async API, for comparison.
+Latency is measured from each probe's scheduled time.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--expenses", type=int, default=50000, help="records in finance.json")
+    parser.add_argument("--seconds", type=float, default=10, help="benchmark duration")
+    parser.add_argument("--writers", type=int, default=4, help="concurrent writers")
+    parser.add_argument("--interval-ms", type=float, default=5, help="delay between probes")
+    parser.add_argument("--blocking", action="store_true", help="write with the sync API on the loop")
+    return parser.parse_args()
+
+
+def expense(i: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "amount": round(10 + i % 500 * 1.37, 2),
+        "currency": "USD",
+        "category": ["food", "transport", "housing", "shopping"][i % 4],
+        "description": f"Benchmark expense {i}",
+        "date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+        "payment_method": "card",
+        "created_at": "2024-01-01T00:00:00",
+    }
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+async def run(args):
+    import httpx
+    from app.main import app
+    from app.config import settings
+    from app.services.data_manager import data_manager
+
+    data = data_manager.read_data(settings.finance_data_file)
+    data["expenses"] = [expense(i) for i in range(args.expenses)]
+    data_manager.write_data(settings.finance_data_file, data, create_backup=False)
+
+    deadline = time.perf_counter() + args.seconds
+    latencies = []
+    writes = 0
+
+    async def writer(n):
+        nonlocal writes
+        i = 0
+        while time.perf_counter() < deadline:
+            record = expense(args.expenses + n * 1000000 + i)
+            if args.blocking:
+                data_manager.insert_record(settings.finance_data_file, "expenses", record)
+                await asyncio.sleep(0)
+            else:
+                await data_manager.ainsert_record(settings.finance_data_file, "expenses", record)
+            writes += 1
+            i += 1
+
+    async def probe(client):
+        interval = args.interval_ms / 1000
+        scheduled = time.perf_counter()
+        while scheduled < deadline:
+            await asyncio.sleep(max(0, scheduled - time.perf_counter()))
+            response = await client.get("/api/health")
+            assert response.status_code == 200
+            now = time.perf_counter()
+            latencies.append((now - scheduled) * 1000)
+            scheduled = max(scheduled + interval, now)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await asyncio.gather(probe(client), *(writer(n) for n in range(args.writers)))
+
+    mode = "blocking (sync API on the loop)" if args.blocking else "async API (thread pool)"
+    print(f"mode:        {mode}")
+    print(f"documents:   {args.expenses} expenses, {writes} writes in {args.seconds:.0f}s")
+    print(f"probes:      {len(latencies)}")
+    print(f"p50:         {statistics.median(latencies):8.2f} ms")
+    print(f"p99:         {percentile(latencies, 99):8.2f} ms")
+    print(f"max:         {max(latencies):8.2f} ms")
+    data_manager.close()
+
+
+def main():
+    args = parse_args()
+    data_dir = tempfile.mkdtemp(prefix="console-bench-")
+    os.environ["DATA_DIR"] = data_dir
+    os.environ["BACKUP_ENABLED"] = "false"
+    os.environ.setdefault("STORAGE_BACKEND", "json")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark: dump/load time and size of a 100k-expense finance.json per format.
+
+    cd backend
+    python -m benchmarks.serializers --expenses 100000
+
+Formats whose optional dependency (orjson, msgpack) is not installed are
+skipped. Load times go through load_document(), i.e. format auto-detection.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.data_manager import load_document, get_serializer, msgpack, orjson  # noqa: E402
+from benchmarks.health_latency import expense  # noqa: E402
+
+
+def best_of(repeat, fn):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--expenses", type=int, default=100000, help="records in finance.json")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is kept)")
+    args = parser.parse_args()
+
+    data = {
+        "expenses": [expense(i) for i in range(args.expenses)],
+        "income": [],
+        "bills": [],
+        "budgets": [],
+    }
+    formats = ["json", "json-compact"]
+    if orjson is not None:
+        formats.append("orjson")
+    if msgpack is not None:
+        formats.append("msgpack")
+
+    print(f"{args.expenses} expenses, best of {args.repeat}")
+    print(f"{'format':<14}{'size (MB)':>10}{'dump (ms)':>12}{'write (ms)':>12}{'load (ms)':>12}")
+    with tempfile.TemporaryDirectory(prefix="console-bench-") as tmp:
+        for name in formats:
+            serializer = get_serializer(name)
+            path = os.path.join(tmp, f"finance-{name}.json")
+            content = serializer.dumps(data)
+
+            def write():
+                with open(path, 'wb') as f:
+                    f.write(serializer.dumps(data))
+
+            def load():
+                with open(path, 'rb') as f:
+                    load_document(f.read())
+
+            dump_ms = best_of(args.repeat, lambda: serializer.dumps(data))
+            write_ms = best_of(args.repeat, write)
+            load_ms = best_of(args.repeat, load)
+            print(f"{name:<14}{len(content) / 1e6:>10.1f}{dump_ms:>12.1f}{write_ms:>12.1f}{load_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Recovery of the journaled JSON backend from a crash in the middle of an append"""
+import pytest
+from app.config import settings
+from app.services.data_manager import DataManager, insert_mutation
+from app.services.journal_storage import JournaledJSONBackend
+
+FILENAME = "finance.json"
+
+
+def expense(expense_id: str) -> dict:
+    return {"id": expense_id, "amount": 10.0, "category": "food", "date": "2024-01-02"}
+
+
+def tear_journal(backend: JournaledJSONBackend):
+    """Leave a half-written last entry, as a crash during write() would"""
+    with open(backend._journal_path(FILENAME), "a", encoding="utf-8") as f:
+        f.write('{"ts": "2024-01-02T00:00:00", "mutations": [{"op": "ins')
+
+
+def expense_ids(data: dict) -> list:
+    return [record["id"] for record in data.get("expenses", [])]
+
+
+@pytest.fixture
+def journaled(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "data_dir", tmp_path)
+    monkeypatch.setattr(settings, "backup_dir", tmp_path / "backups")
+    monkeypatch.setattr(settings, "backup_enabled", False)
+    monkeypatch.setattr(settings, "storage_backend", "json")
+    monkeypatch.setattr(settings, "journal_enabled", True)
+    monkeypatch.setattr(settings, "group_commit_window_ms", 0)
+    return tmp_path
+
+
+def test_append_after_torn_line_survives_reload(journaled):
+    backend = JournaledJSONBackend(journaled)
+    backend.save(FILENAME, {}, [insert_mutation("expenses", expense("a"))])
+    tear_journal(backend)
+    backend.save(FILENAME, {}, [insert_mutation("expenses", expense("b"))])
+
+    assert expense_ids(JournaledJSONBackend(journaled).load(FILENAME)) == ["a", "b"]
+
+
+def test_torn_last_line_is_ignored_on_load(journaled):
+    backend = JournaledJSONBackend(journaled)
+    backend.save(FILENAME, {}, [insert_mutation("expenses", expense("a"))])
+    tear_journal(backend)
+
+    assert expense_ids(JournaledJSONBackend(journaled).load(FILENAME)) == ["a"]
+
+
+def test_entries_after_a_corrupt_line_are_replayed(journaled):
+    backend = JournaledJSONBackend(journaled)
+    backend.save(FILENAME, {}, [insert_mutation("expenses", expense("a"))])
+    # A journal written before torn tails were cut: an entry glued onto the fragment
+    tear_journal(backend)
+    with open(backend._journal_path(FILENAME), "a", encoding="utf-8") as f:
+        f.write('{"ts": "2024-01-02T00:00:01", "mutations": []}\n')
+    backend.save(FILENAME, {}, [insert_mutation("expenses", expense("c"))])
+
+    assert expense_ids(JournaledJSONBackend(journaled).load(FILENAME)) == ["a", "c"]
+
+
+def test_close_compacts_commits_made_after_a_torn_line(journaled):
+    manager = DataManager()
+    manager.insert_record(FILENAME, "expenses", expense("a"))
+    tear_journal(manager.backend)
+    manager.insert_record(FILENAME, "expenses", expense("b"))
+    assert expense_ids(manager.read_data(FILENAME)) == ["a", "b"]
+    manager.close()
+
+    reopened = DataManager()
+    assert not reopened.backend.journaled_files()
+    assert expense_ids(reopened.read_data(FILENAME)) == ["a", "b"]
+    reopened.close()
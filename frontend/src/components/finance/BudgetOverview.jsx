@@ -38,6 +38,8 @@ const BudgetOverview = () => {
   }
 
   const budgetEntries = Object.entries(statistics.budget_status || {});
+  // Totals are null when exchange rates are unavailable
+  const formatTotal = (amount) => (amount == null ? '—' : `$${amount.toFixed(2)}`);
 
   return (
     <div className="space-y-6">
@@ -45,13 +47,13 @@ const BudgetOverview = () => {
         <div className="bg-blue-50 rounded-lg p-4">
           <div className="text-sm text-blue-600 font-medium">Total Income</div>
           <div className="text-2xl font-bold text-blue-900">
-            ${statistics.total_income.toFixed(2)}
+            {formatTotal(statistics.total_income)}
           </div>
         </div>
         <div className="bg-red-50 rounded-lg p-4">
           <div className="text-sm text-red-600 font-medium">Total Expenses</div>
           <div className="text-2xl font-bold text-red-900">
-            ${statistics.total_expenses.toFixed(2)}
+            {formatTotal(statistics.total_expenses)}
           </div>
         </div>
         <div className={`rounded-lg p-4 ${statistics.net_balance >= 0 ? 'bg-green-50' : 'bg-orange-50'}`}>
@@ -59,11 +61,17 @@ const BudgetOverview = () => {
             Net Balance
           </div>
           <div className={`text-2xl font-bold ${statistics.net_balance >= 0 ? 'text-green-900' : 'text-orange-900'}`}>
-            ${statistics.net_balance.toFixed(2)}
+            {formatTotal(statistics.net_balance)}
           </div>
         </div>
       </div>
 
+      {statistics.rates_available === false && (
+        <div className="text-sm text-gray-500">
+          Exchange rates are unavailable, so totals in mixed currencies cannot be shown right now.
+        </div>
+      )}
+
       {budgetEntries.length > 0 ? (
         <div className="space-y-4">
           <h3 className="text-lg font-semibold text-gray-800">Budget Progress</h3>
@@ -4,25 +4,17 @@ import { StatCard } from '../ui/StatCard';
 import { Skeleton } from '../ui/Skeleton';
 import financeApi from '../../services/financeApi';
 
-export default function FinanceStats({ refresh, displayCurrency = 'CNY', currencySymbol = '¥', exchangeRates }) {
+export default function FinanceStats({ refresh, displayCurrency = 'CNY', currencySymbol = '¥' }) {
   const [loading, setLoading] = useState(true);
   const [stats, setStats] = useState(null);
 
-  // 货币转换函数
-  const convertAmount = (amount, fromCurrency = 'USD') => {
-    if (!exchangeRates || !amount) return amount;
-    if (fromCurrency === displayCurrency) return amount;
-    const fromRate = exchangeRates[fromCurrency] || 1;
-    const toRate = exchangeRates[displayCurrency] || 1;
-    return amount * (toRate / fromRate);
-  };
-
   useEffect(() => {
     const fetchStats = async () => {
       try {
         // 仅首次加载时显示 loading 状态
         if (!stats) setLoading(true);
-        const data = await financeApi.getStatistics();
+        // 后端按显示货币换算各币种小计
+        const data = await financeApi.getStatistics({ currency: displayCurrency });
         setStats(data);
       } catch (error) {
         console.error('Failed to fetch finance stats:', error);
@@ -32,7 +24,7 @@ export default function FinanceStats({ refresh, displayCurrency = 'CNY', currenc
     };
 
     fetchStats();
-  }, [refresh]);
+  }, [refresh, displayCurrency]);
 
   if (loading) {
     return (
@@ -45,16 +37,19 @@ export default function FinanceStats({ refresh, displayCurrency = 'CNY', currenc
     );
   }
 
-  const totalExpenses = convertAmount(stats?.total_expenses || 0);
-  const totalIncome = convertAmount(stats?.total_income || 0);
+  // Totals are null when exchange rates are unavailable
+  const converted = stats?.rates_available !== false;
+  const totalExpenses = stats?.total_expenses || 0;
+  const totalIncome = stats?.total_income || 0;
   const balance = totalIncome - totalExpenses;
+  const formatAmount = (amount) => (converted ? `${currencySymbol}${amount.toFixed(2)}` : '—');
   const budgetUsage = stats?.budget_usage || 0;
 
   return (
     <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-4 gap-6 animate-in fade-in duration-300">
       <StatCard
         title="Total Expenses"
-        value={`${currencySymbol}${totalExpenses.toFixed(2)}`}
+        value={formatAmount(totalExpenses)}
         description="This month"
         icon={TrendingDown}
         trend={stats?.expense_trend && {
@@ -64,7 +59,7 @@ export default function FinanceStats({ refresh, displayCurrency = 'CNY', currenc
       />
       <StatCard
         title="Total Income"
-        value={`${currencySymbol}${totalIncome.toFixed(2)}`}
+        value={formatAmount(totalIncome)}
         description="This month"
         icon={TrendingUp}
         trend={stats?.income_trend && {
@@ -74,8 +69,8 @@ export default function FinanceStats({ refresh, displayCurrency = 'CNY', currenc
       />
       <StatCard
         title="Balance"
-        value={`${currencySymbol}${balance.toFixed(2)}`}
-        description={balance >= 0 ? 'Surplus' : 'Deficit'}
+        value={formatAmount(balance)}
+        description={converted ? (balance >= 0 ? 'Surplus' : 'Deficit') : 'Exchange rates unavailable'}
         icon={Wallet}
       />
       <StatCard
@@ -1,5 +1,8 @@
 import { useState, useEffect } from 'react';
-import { PieChart, Pie, Cell, ResponsiveContainer, Legend, Tooltip } from 'recharts';
+import {
+  PieChart, Pie, Cell, ResponsiveContainer, Legend, Tooltip,
+  BarChart, Bar, XAxis, YAxis, CartesianGrid
+} from 'recharts';
 import financeApi from '../../services/financeApi';
 
 const SpendingChart = () => {
@@ -47,6 +50,12 @@ const SpendingChart = () => {
     };
   });
 
+  const trendData = Object.entries(statistics.monthly_trend || {}).map(([month, totals]) => ({
+    month,
+    expenses: totals.expenses,
+    income: totals.income
+  }));
+
   return (
     <div className="space-y-4">
       <h3 className="text-lg font-semibold text-gray-800">Spending by Category</h3>
@@ -88,6 +97,23 @@ const SpendingChart = () => {
           </div>
         ))}
       </div>
+
+      {trendData.length > 0 && (
+        <>
+          <h3 className="text-lg font-semibold text-gray-800">Monthly Trend</h3>
+          <ResponsiveContainer width="100%" height={300}>
+            <BarChart data={trendData}>
+              <CartesianGrid strokeDasharray="3 3" />
+              <XAxis dataKey="month" />
+              <YAxis />
+              <Tooltip formatter={(value) => `$${value.toFixed(2)}`} />
+              <Legend />
+              <Bar dataKey="income" name="Income" fill="#10B981" />
+              <Bar dataKey="expenses" name="Expenses" fill="#EF4444" />
+            </BarChart>
+          </ResponsiveContainer>
+        </>
+      )}
     </div>
   );
 };
@@ -1,7 +1,8 @@
-import { useState, useEffect, useRef } from 'react';
+import { useState, useEffect } from 'react';
 import { Loader2, RefreshCw, Search, Download, LayoutGrid, LayoutList, Sparkles } from 'lucide-react';
 import GameCardV2 from './GameCardV2';
 import gamingApi from '../../services/gamingApi';
+import { subscribeEvents } from '../../services/events';
 import { Button } from '../ui/Button';
 
 export default function GameList({ refresh, onGameSelect }) {
@@ -12,7 +13,6 @@ export default function GameList({ refresh, onGameSelect }) {
   const [sortBy, setSortBy] = useState('playtime');
   const [cacheStatus, setCacheStatus] = useState(null);
   const [viewMode, setViewMode] = useState('masonry'); // 'grid' | 'masonry' | 'compact'
-  const pollRef = useRef(null);
 
   useEffect(() => {
     fetchGames();
@@ -33,13 +33,8 @@ export default function GameList({ refresh, onGameSelect }) {
   const handleSync = async () => {
     try {
       setSyncing(true);
-      const res = await gamingApi.syncGames();
+      await gamingApi.syncGames();
       await fetchGames();
-
-      // Start polling if caching started
-      if (res.data.caching_started) {
-        startCachePolling();
-      }
     } catch (error) {
       console.error('Failed to sync games:', error);
     } finally {
@@ -47,34 +42,19 @@ export default function GameList({ refresh, onGameSelect }) {
     }
   };
 
-  const startCachePolling = () => {
-    if (pollRef.current) clearInterval(pollRef.current);
-    pollRef.current = setInterval(async () => {
-      try {
-        const res = await gamingApi.getCacheSyncStatus();
-        setCacheStatus(res.data);
-        if (!res.data.running) {
-          clearInterval(pollRef.current);
-          pollRef.current = null;
-        }
-      } catch (e) {
-        console.error('Failed to get cache status:', e);
-      }
-    }, 2000);
-  };
-
   useEffect(() => {
     // Check if caching is already running on mount
     gamingApi.getCacheSyncStatus().then(res => {
-      if (res.data.running) {
-        setCacheStatus(res.data);
-        startCachePolling();
-      }
+      if (res.data.running) setCacheStatus(res.data);
     }).catch(() => {});
 
-    return () => {
-      if (pollRef.current) clearInterval(pollRef.current);
-    };
+    // Progress of background caching is pushed by the server
+    const updateStatus = (status) => setCacheStatus(status);
+    return subscribeEvents(['gaming.cache'], {
+      'gaming.cache.started': updateStatus,
+      'gaming.cache.progress': updateStatus,
+      'gaming.cache.completed': updateStatus,
+    });
   }, []);
 
   const filteredGames = games
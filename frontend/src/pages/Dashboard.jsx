@@ -89,7 +89,9 @@ const Dashboard = () => {
             <div className="flex-1">
               <p className="text-sm font-medium text-zinc-600 dark:text-zinc-400">Total Expenses</p>
               <p className="text-2xl font-bold text-zinc-900 dark:text-zinc-100 mt-2">
-                {currencySymbol}{convertAmount(stats.finance?.total_expenses || 0).toFixed(2)}
+                {stats.finance?.rates_available === false
+                  ? '—'
+                  : `${currencySymbol}${convertAmount(stats.finance?.total_expenses || 0).toFixed(2)}`}
               </p>
               <p className="text-sm text-zinc-500 dark:text-zinc-400 mt-1">This month</p>
             </div>
@@ -160,7 +160,6 @@ const FinancePage = () => {
           refresh={refreshKey}
           displayCurrency={displayCurrency}
           currencySymbol={currencySymbol}
-          exchangeRates={exchangeRates}
         />
       </div>
 
@@ -0,0 +1,25 @@
+// Change feed from /api/events (Server-Sent Events).
+// EventSource reconnects on its own and resumes after the last event id.
+
+/**
+ * Subscribe to change events.
+ * @param {string[]} topics - event type prefixes, e.g. ['expense', 'gaming.cache']
+ * @param {Object<string, Function>} handlers - event type -> handler(data, event);
+ *   'stream.reset' is sent when missed events could not be replayed
+ * @returns {Function} unsubscribe
+ */
+export function subscribeEvents(topics, handlers) {
+  const params = topics?.length ? `?topics=${encodeURIComponent(topics.join(','))}` : '';
+  const source = new EventSource(`/api/events${params}`);
+
+  Object.entries(handlers).forEach(([type, handler]) => {
+    source.addEventListener(type, (message) => {
+      const event = JSON.parse(message.data);
+      handler(event.data, event);
+    });
+  });
+
+  return () => source.close();
+}
+
+export default subscribeEvents;
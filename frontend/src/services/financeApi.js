@@ -67,8 +67,13 @@ const financeApi = {
   },
 
   // Statistics
-  getStatistics: async () => {
-    const response = await apiClient.get('/finance/statistics');
+  getStatistics: async (params = {}) => {
+    const response = await apiClient.get('/finance/statistics', { params });
+    return response.data;
+  },
+
+  getTrends: async (params = {}) => {
+    const response = await apiClient.get('/finance/trends', { params });
     return response.data;
   },
 